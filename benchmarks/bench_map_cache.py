@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Benchmark: how long a level start spends loading the map.
+
+Loads every level three ways:
+
+    text     no caching: read, parse and evaluate the text
+    disk     from the compiled map in levels/__pycache__
+             (what a fresh start of the game does)
+    memory   the same map again (restarting a level with F5)
+
+and then times the whole of load_level() from a cold and a warm
+cache.  The levels are copied to a temporary directory first, so
+the real cache isn't touched.
+
+    % python3 benchmarks/bench_map_cache.py
+"""
+
+import os.path
+import shutil
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from dynamite import maploader
+from dynamite.sim import LEGEND_NAMESPACE, LEVEL_DIR, load_level, level_names
+
+
+def best_time(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+
+def main():
+    number = 50
+    with tempfile.TemporaryDirectory() as directory:
+        for path in LEVEL_DIR.glob('*.txt'):
+            shutil.copy(path, directory)
+        names = level_names(directory)
+
+        def text(name):
+            maploader.load_map(name, LEGEND_NAMESPACE, directory=directory, cache=False)
+
+        def disk(name):
+            maploader.clear_cache()
+            maploader.load_map(name, LEGEND_NAMESPACE, directory=directory)
+
+        def memory(name):
+            maploader.load_map(name, LEGEND_NAMESPACE, directory=directory)
+
+        def level_cold(name):
+            maploader.clear_cache()
+            load_level(name, directory=directory)
+
+        def level_warm(name):
+            load_level(name, directory=directory)
+
+        columns = [
+            ('text', text),
+            ('disk', disk),
+            ('memory', memory),
+            ('level cold', level_cold),
+            ('level warm', level_warm),
+        ]
+        print(f"{'level':<12}" + ''.join(f"{label + ' (us)':>17}" for label, _ in columns))
+        totals = [0.0] * len(columns)
+        for name in names:
+            # fill the caches
+            memory(name)
+            row = f"{name:<12}"
+            for i, (_, fn) in enumerate(columns):
+                t = best_time(lambda: fn(name), number)
+                totals[i] += t
+                row += f"{t * 1e6:17.1f}"
+            print(row)
+        print(f"{'mean':<12}" + ''.join(f"{t / len(names) * 1e6:17.1f}" for t in totals))
+        saved = (totals[3] - totals[4]) / len(names)
+        print(f"\nreloading a level saves {saved * 1e6:.0f}us per start "
+              f"({totals[3] / totals[4]:.1f}x faster); "
+              f"a cold start from the disk cache is {totals[0] / totals[1]:.1f}x faster than parsing")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Microbenchmark: dynamite.vec2d.Vec2D against the old slots class.
+
+Times the operations the simulation does most--construction,
+adding an offset, hashing for a dict lookup and unpacking--and
+prints how many times faster the current Vec2D is.
+
+    % python3 benchmarks/bench_vec2d.py
+"""
+
+import os.path
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from dynamite.vec2d import Vec2D
+
+
+class OldVec2D:
+    """Vec2D as it was, for comparison."""
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x, y=None):
+        if x is None:
+            raise ValueError("can't make Vec2D from None")
+        if y is None:
+            x, y = x
+        self.x = x
+        self.y = y
+
+    def __add__(self, o):
+        x, y = OldVec2D(o)
+        return type(self)(self.x + x, self.y + y)
+
+    def __sub__(self, o):
+        x, y = OldVec2D(o)
+        return type(self)(self.x - x, self.y - y)
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+
+    def __eq__(self, o):
+        try:
+            ox, oy = o
+        except Exception:
+            return False
+        x, y = self
+        return ox == x and oy == y
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+
+BENCHMARKS = [
+    ('construct', 'V(3, 4)'),
+    ('add', 'a + b'),
+    ('sub', 'a - b'),
+    ('hash', 'hash(a)'),
+    ('dict lookup', 'd[a]'),
+    ('equality', 'a == c'),
+    ('unpack', 'x, y = a'),
+    ('attribute', 'a.x + a.y'),
+    ('blast offsets', 'for delta in offsets: p + delta'),
+]
+
+
+def setup(cls):
+    a = cls(3, 4)
+    return {
+        'V': cls,
+        'a': a,
+        'b': cls(1, -1),
+        'c': cls(3, 4),
+        'p': cls(6, 6),
+        'd': {a: True},
+        'offsets': [cls(x, y) for x in range(-2, 3) for y in range(-2, 3)],
+    }
+
+
+def best_time(statement, namespace, number):
+    timer = timeit.Timer(statement, globals=namespace)
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+def main():
+    number = 200_000
+    old = setup(OldVec2D)
+    new = setup(Vec2D)
+    print(f"{'operation':<16} {'old (ns)':>10} {'new (ns)':>10} {'speedup':>8}")
+    for name, statement in BENCHMARKS:
+        n = number // 25 if 'for' in statement else number
+        t_old = best_time(statement, old, n)
+        t_new = best_time(statement, new, n)
+        print(f"{name:<16} {t_old * 1e9:10.1f} {t_new * 1e9:10.1f} {t_old / t_new:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
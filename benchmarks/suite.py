@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""Benchmark suite: time the game's hot paths, and catch regressions.
+
+    % python3 benchmarks/suite.py
+
+runs every benchmark and prints how long each one takes.  Name
+benchmarks to run just those:
+
+    % python3 benchmarks/suite.py clock_advance vec2d
+
+Options:
+
+    --output=FILE       write the results to FILE, as JSON
+    --save-baseline     write them to the baseline (benchmarks/baseline.json),
+                        rather than comparing with it
+    --baseline=FILE     compare with FILE rather than the baseline
+    --threshold=F       how much slower than the baseline counts as a
+                        regression, as a fraction (default 0.25)
+    --quick             fewer repeats; noisier, but quicker
+
+The stress_* benchmarks run the same workload on levels made up
+by dynamite.sim.stress, at one, two and four screens across (and
+down); so if it's all linear, each takes four times as long as the
+last.  The suite says how much each one grows per tile.
+
+If there's a baseline, every result is compared with it, and if
+anything's slower by more than the threshold (or its own threshold,
+for the noisier benchmarks) the suite says so and exits with status
+1.  Timings only compare on the same machine, so the baseline isn't
+checked in (it's ignored by git); make your own from the code you're
+starting from, before you change anything:
+
+    % git stash
+    % python3 benchmarks/suite.py --save-baseline
+    % git stash pop
+    % python3 benchmarks/suite.py
+
+(or check out the commit you want to compare with, rather than
+stashing).  Save it with the machine as quiet as you can make it,
+and save it again whenever you pull in someone else's changes.
+
+The benchmarks that draw use a stub OpenGL, and images are loaded
+without being decoded (see dynamite.drawstats), so this runs with
+no display; they time our code, not the driver's or the PNG
+decoder's.
+"""
+
+import json
+import os.path
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from dynamite import drawstats
+drawstats.use_stub_gl()
+drawstats.use_stub_images()
+
+import numpy as np
+import pyglet.resource
+
+from dynamite import maploader
+from dynamite import sim
+from dynamite.coords import TILES_W, TILES_H
+from dynamite.level_renderer import LevelRenderer
+from dynamite.particles import FlowParticles
+from dynamite.sim import stress
+from dynamite.vec2d import Vec2D
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+RESULTS_VERSION = 1
+
+# how much slower than the baseline is a regression
+THRESHOLD = 0.25
+
+REPEAT = 7
+QUICK_REPEAT = 3
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+pyglet.resource.path = [os.path.join(SRC_DIR, 'images')]
+pyglet.resource.reindex()
+
+# the level most benchmarks use
+LEVEL = 'level1'
+
+# how many screens across (and down) the stress levels are
+STRESS_SCALES = (1, 2, 4)
+
+
+# name -> (function, number, threshold)
+BENCHMARKS = {}
+
+# stress benchmark -> [(tiles, name)], smallest first
+STRESS_FAMILIES = {}
+
+
+def benchmark(number, threshold=THRESHOLD, name=None):
+    """Register a benchmark.
+
+    The function sets it up, and returns (setup, run): run() is
+    what's timed, number times per repeat.  setup() (which can be
+    None) is called before every repeat, and isn't timed.  It's
+    registered as name, or its own name.
+    """
+    def register(f):
+        BENCHMARKS[name or f.__name__] = f, number, threshold
+        return f
+    return register
+
+
+@benchmark(number=20)
+def load_map():
+    """Parse and evaluate a level's text, with no caching."""
+    def run():
+        maploader.load_map(LEVEL, sim.LEGEND_NAMESPACE, directory=str(sim.LEVEL_DIR), cache=False)
+    return None, run
+
+
+@benchmark(number=50)
+def load_level():
+    """Load a whole level headless, from the cached map."""
+    def run():
+        sim.load_level(LEVEL)
+    return None, run
+
+
+@benchmark(number=50)
+def level_renderer_rebuild():
+    """Rebuild the tile map's vertex list."""
+    LevelRenderer.load()
+    renderer = LevelRenderer(sim.load_level(LEVEL))
+    return None, renderer.rebuild
+
+
+@benchmark(number=200)
+def flow_particles_update():
+    """One frame of the ripples on the water."""
+    FlowParticles.load()
+    flow = FlowParticles(sim.load_level(LEVEL), rng=np.random.default_rng(0))
+    # let the ripples build up to their usual number
+    for _ in range(120):
+        flow.update(1 / 60)
+    return None, lambda: flow.update(1 / 60)
+
+
+@benchmark(number=20)
+def clock_advance():
+    """A second of logic ticks, with a thousand timers running."""
+    rng = np.random.default_rng(0)
+    clock = sim.Clock('benchmark', sim.logic_interval)
+
+    def restart(interval):
+        sim.Timer('benchmark', clock, interval, lambda: restart(interval))
+
+    # (from 2 ticks: a one-tick timer restarted from its own callback
+    # goes off again in the same tick, forever)
+    for interval in rng.integers(2, 240, 1000):
+        restart(int(interval))
+    return None, lambda: clock.advance(1.0)
+
+
+@benchmark(number=100_000, threshold=0.4)
+def vec2d():
+    """A little Vec2D arithmetic: an add, a subtract and a multiply."""
+    a = Vec2D(3, 4)
+    b = Vec2D(1, -1)
+    return None, lambda: (a + b) - b * 2
+
+
+@benchmark(number=2000)
+def blast_pattern():
+    """Parse the big blast pattern."""
+    pattern = """
+  X
+ XXX
+XXOXX
+ XXX
+  X
+"""
+    return None, lambda: sim.BlastPattern(3, pattern)
+
+
+@benchmark(number=1)
+def bomb_chain():
+    """Set off a field of 132 contact bombs, and run until they've all gone off."""
+    # (removed when it's garbage collected, so setup() keeps it)
+    directory = tempfile.TemporaryDirectory()
+    shutil.copy(sim.LEVEL_DIR / 'legend.txt', directory.name)
+    rows = ['S' + '#' * 11, '#' * 12] + ['!' * 12] * 11
+    with open(os.path.join(directory.name, 'chain.txt'), 'w') as f:
+        f.write('\n'.join(rows))
+        f.write('\n\nLegend\n! MapGrass + ContactBomb\n\n:next: finished\n')
+
+    bombs = []
+
+    def setup():
+        level = sim.load_level('chain', directory=directory.name)
+        bombs[:] = [e for e in level.tile_occupant.values() if isinstance(e, sim.ContactBomb)]
+
+    def run():
+        game = sim.world.game
+        bombs[-1].detonate()
+        while not all(b.detonated for b in bombs):
+            game.step()
+
+    return setup, run
+
+
+_stress_directory = None
+
+
+def stress_level(width, height):
+    """Write a width x height stress level (once), and return its name and directory."""
+    global _stress_directory
+    if _stress_directory is None:
+        # (removed when the suite exits)
+        _stress_directory = tempfile.TemporaryDirectory()
+    name = f'stress{width}x{height}'
+    path = os.path.join(_stress_directory.name, f'{name}.txt')
+    if not os.path.exists(path):
+        stress.write_level(_stress_directory.name, name, width, height)
+    return name, _stress_directory.name
+
+
+def stress_benchmarks(width, height):
+    """Register the stress benchmarks for a width x height level."""
+    size = f'{width}x{height}'
+
+    def register(family, number):
+        def register(f):
+            name = f'{family}_{size}'
+            STRESS_FAMILIES.setdefault(family, []).append((width * height, name))
+            return benchmark(number=number, threshold=0.4, name=name)(f)
+        return register
+
+    @register('stress_load', number=3)
+    def load():
+        """Load a stress level headless, from the cached map."""
+        name, directory = stress_level(width, height)
+        sim.load_level(name, directory=directory, any_size=True)
+        return None, lambda: sim.load_level(name, directory=directory, any_size=True)
+
+    @register('stress_step', number=1)
+    def step():
+        """A second of logic ticks on a stress level, logs drifting round."""
+        name, directory = stress_level(width, height)
+
+        def setup():
+            sim.load_level(name, directory=directory, any_size=True)
+
+        return setup, lambda: sim.world.game.step(sim.logics_per_second)
+
+    @register('stress_flow', number=20)
+    def flow():
+        """One frame of the ripples on a stress level."""
+        name, directory = stress_level(width, height)
+        FlowParticles.load()
+        flow = FlowParticles(
+            sim.load_level(name, directory=directory, any_size=True),
+            rng=np.random.default_rng(0),
+        )
+        for _ in range(120):
+            flow.update(1 / 60)
+        return None, lambda: flow.update(1 / 60)
+
+
+for scale in STRESS_SCALES:
+    stress_benchmarks(TILES_W * scale, TILES_H * scale)
+
+
+def run_benchmark(name, repeat):
+    """Time the benchmark called name.
+
+    Returns the best time per run, in seconds.
+    """
+    f, number, _ = BENCHMARKS[name]
+    setup, run = f()
+    best = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t = timeit.timeit(run, number=number) / number
+        if (best is None) or (t < best):
+            best = t
+    return best
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e3), ('us', 1e6)):
+        if seconds >= 1 / scale:
+            return f"{seconds * scale:.2f}{unit}"
+    return f"{seconds * 1e9:.0f}ns"
+
+
+def main(argv):
+    output = None
+    baseline_path = BASELINE
+    save_baseline = False
+    threshold = None
+    repeat = REPEAT
+    names = []
+    for arg in argv:
+        option, _, value = arg.partition('=')
+        if option == '--output':
+            output = value
+        elif option == '--save-baseline':
+            save_baseline = True
+        elif option == '--baseline':
+            baseline_path = value
+        elif option == '--threshold':
+            threshold = float(value)
+        elif option == '--quick':
+            repeat = QUICK_REPEAT
+        elif arg.startswith('--'):
+            sys.exit(__doc__)
+        elif arg not in BENCHMARKS:
+            sys.exit(f"no benchmark called {arg!r}; there's {', '.join(BENCHMARKS)}")
+        else:
+            names.append(arg)
+    names = names or list(BENCHMARKS)
+
+    try:
+        with open(baseline_path) as f:
+            baseline = json.load(f)['results']
+    except FileNotFoundError:
+        baseline = {}
+
+    results = {}
+    regressions = []
+    print(f"{'benchmark':<24} {'time':>10} {'baseline':>10} {'change':>8}")
+    for name in names:
+        t = run_benchmark(name, repeat)
+        results[name] = t
+        row = f"{name:<24} {format_time(t):>10}"
+        if (name in baseline) and not save_baseline:
+            base = baseline[name]
+            change = t / base - 1
+            row += f" {format_time(base):>10} {change:+8.1%}"
+            limit = BENCHMARKS[name][2] if threshold is None else threshold
+            if change > limit:
+                row += "  REGRESSION"
+                regressions.append(name)
+        print(row)
+
+    # how each stress benchmark grows, per tile: 1.0 is linear
+    growth = []
+    for family, sizes in STRESS_FAMILIES.items():
+        sizes = [(tiles, name) for tiles, name in sizes if name in results]
+        steps = [
+            (results[name] / results[last]) / (tiles / last_tiles)
+            for (last_tiles, last), (tiles, name) in zip(sizes, sizes[1:])
+        ]
+        if steps:
+            growth.append(f"{family:<24} " + ' '.join(f"{step:>6.2f}" for step in steps))
+    if growth:
+        print("\ngrowth per tile, from each size to the next (1.00 is linear)")
+        print('\n'.join(growth))
+
+    data = {
+        'version': RESULTS_VERSION,
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'results': results,
+    }
+    if save_baseline:
+        # (keeping the baseline for any benchmarks we didn't run)
+        data['results'] = {**baseline, **results}
+        output = baseline_path
+    if output:
+        with open(output, 'w') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+            f.write('\n')
+        print(f"\nwrote {output}")
+
+    if regressions:
+        sys.exit(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -6,17 +6,82 @@
 
 from math import sin, pow, pi
 
+import numpy as np
 import pyglet.clock
 import pyglet.sprite
 
+from .vec2d import Vec2D
+
 TWEEN_FUNCTIONS = {}
 
+# tween name -> its row in lookup_tables
+_tween_ids = {}
+
+# Every tween function, sampled at LUT_RESOLUTION + 1 evenly spaced
+# points from 0 to 1, one row per function; or None, to call the
+# functions themselves.  See use_lookup_tables().
+lookup_tables = None
+
+LUT_RESOLUTION = 256
+
 
 def tweener(f):
     TWEEN_FUNCTIONS[f.__name__] = f
+    _tween_ids.setdefault(f.__name__, len(_tween_ids))
+    if lookup_tables is not None:
+        use_lookup_tables(lookup_tables.shape[1] - 1)
     return f
 
 
+def use_lookup_tables(resolution=LUT_RESOLUTION):
+    """Look the tween functions up in tables, rather than calling them.
+
+    Each function is sampled at resolution steps, once, and
+    interpolated linearly between them; so a bounce or an elastic
+    costs the same as a linear tween, and a whole array of them
+    can be worked out at once (see ease()).  The values are off by
+    up to about 1/resolution of the function's steepest slope.
+
+    use_lookup_tables(None) goes back to calling the functions.
+    """
+    global lookup_tables
+    if not resolution:
+        lookup_tables = None
+        return
+    n = np.linspace(0.0, 1.0, resolution + 1)
+    tables = np.empty((len(_tween_ids), resolution + 1))
+    for name, row in _tween_ids.items():
+        f = TWEEN_FUNCTIONS[name]
+        tables[row] = [f(x) for x in n]
+    lookup_tables = tables
+
+
+def _look_up(ids, n):
+    """Interpolate lookup_tables at n, for the tweens in rows ids.
+
+    ids and n are arrays (or one of them can be a number).
+    """
+    resolution = lookup_tables.shape[1] - 1
+    x = np.clip(n, 0.0, 1.0) * resolution
+    i = np.minimum(x.astype(int), resolution - 1)
+    frac = x - i
+    return lookup_tables[ids, i] * (1.0 - frac) + lookup_tables[ids, i + 1] * frac
+
+
+def ease(tween, n):
+    """Evaluate the tween function called tween at every value in n.
+
+    n is an array (or anything np.asarray() takes) of values from
+    0 to 1.  Returns an array of the same shape, from the lookup
+    tables if they're in use.
+    """
+    n = np.asarray(n, dtype=float)
+    if lookup_tables is not None:
+        return _look_up(_tween_ids[tween], n)
+    f = TWEEN_FUNCTIONS[tween]
+    return np.array([f(x) for x in n.ravel()]).reshape(n.shape)
+
+
 @tweener
 def linear(n):
     return n
@@ -127,7 +192,10 @@ def tween(n, start, end):
 
 
 def tween_attr(n, start, end):
-    if isinstance(start, tuple):
+    if isinstance(start, Vec2D):
+        # keep it a Vec2D
+        return tween(n, start, end)
+    elif isinstance(start, tuple):
         return tuple(tween(n, a, b) for a,b in zip(start, end))
     elif isinstance(start, list):
         return [tween(n, a, b) for a,b in zip(start, end)]
@@ -135,6 +203,117 @@ def tween_attr(n, start, end):
         return tween(n, start, end)
 
 
+def _attr_tweener(start, end):
+    """Return a function of n that does tween_attr(n, start, end).
+
+    Works out once what sort of value it's tweening, and the
+    differences, rather than every update.
+    """
+    if isinstance(start, Vec2D):
+        # keep it a Vec2D
+        delta = end - start
+        return lambda n: start + delta * n
+    elif isinstance(start, tuple):
+        pairs = [(a, b - a) for a, b in zip(start, end)]
+        return lambda n: tuple(a + d * n for a, d in pairs)
+    elif isinstance(start, list):
+        pairs = [(a, b - a) for a, b in zip(start, end)]
+        return lambda n: [a + d * n for a, d in pairs]
+    else:
+        delta = end - start
+        return lambda n: start + delta * n
+
+
+class TweenManager:
+    """Runs every animation on one clock, from one scheduled function.
+
+    The animations sit in slots; how long each has run, and how long
+    it runs for, are kept in arrays indexed by slot, so an update
+    works out everybody's progress at once.  A finished animation's
+    slot goes to the next one started.
+
+    The manager is only scheduled while it has animations to run.
+    Get the one for a clock with for_clock().
+
+    With lookup tables in use, the tween functions are worked out
+    for every animation at once, too.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        # slot -> Animation, or None if the slot is free
+        self.animations = []
+        self.free = []
+        self.elapsed = np.zeros(16)
+        self.duration = np.ones(16)
+        # each slot's row in lookup_tables
+        self.tween_ids = np.zeros(16, dtype=int)
+        self.running = 0
+        self.scheduled = False
+
+    @classmethod
+    def for_clock(cls, clock=None):
+        """Get the manager for clock (pyglet's default clock if None)."""
+        clock = clock or pyglet.clock.get_default()
+        try:
+            return clock._tween_manager
+        except AttributeError:
+            manager = clock._tween_manager = cls(clock)
+            return manager
+
+    def __len__(self):
+        return self.running
+
+    def add(self, animation):
+        """Start running animation.  Returns its slot."""
+        if self.free:
+            slot = self.free.pop()
+            self.animations[slot] = animation
+        else:
+            slot = len(self.animations)
+            if slot == len(self.elapsed):
+                self.elapsed = np.concatenate((self.elapsed, np.zeros(slot)))
+                self.duration = np.concatenate((self.duration, np.ones(slot)))
+                self.tween_ids = np.concatenate((self.tween_ids, np.zeros(slot, dtype=int)))
+            self.animations.append(animation)
+        self.elapsed[slot] = 0
+        # (a zero duration finishes on the next update)
+        self.duration[slot] = max(animation.duration, 1e-9)
+        self.tween_ids[slot] = _tween_ids[animation.tween]
+        self.running += 1
+        if not self.scheduled:
+            self.clock.schedule(self.update)
+            self.scheduled = True
+        return slot
+
+    def remove(self, slot):
+        """Stop running the animation in slot."""
+        self.animations[slot] = None
+        self.free.append(slot)
+        self.running -= 1
+
+    def update(self, dt):
+        count = len(self.animations)
+        elapsed = self.elapsed[:count]
+        elapsed += dt
+        progress = elapsed / self.duration[:count]
+        if lookup_tables is not None:
+            eased = _look_up(self.tween_ids[:count], progress).tolist()
+        else:
+            eased = [None] * count
+        progress = progress.tolist()
+
+        # animations started by on_finished callbacks start
+        # on the next update, so step the ones we have now
+        for slot, animation in enumerate(self.animations[:count]):
+            if animation is not None and self.animations[slot] is animation:
+                animation.step(progress[slot], eased[slot])
+
+        if not self.running:
+            self.clock.unschedule(self.update)
+            self.scheduled = False
+
+
 class Animation:
     """An animation manager for object attribute animations.
 
@@ -145,11 +324,10 @@ class Animation:
     If the value is a list or tuple, then each value inside that will
     be tweened.
 
-    The update() method is automatically scheduled with the clock for
-    the duration of the animation.
+    The animation runs on the clock's TweenManager for the duration
+    of the animation.
 
     """
-    animations = []
 
     # Animations are stored in _animation_dict under (object id, target
     # attribute) keys. Objects may not be hashable, so the id, rather than
@@ -165,12 +343,13 @@ class Animation:
                 clock=None,
                  **targets):
         self.targets = targets
+        self.tween = tween
         self.function = TWEEN_FUNCTIONS[tween]
         self.duration = duration
         self.on_finished = on_finished
-        self.t = 0
         self.object = object
         self.initial = {}
+        self.tweeners = {}
         self.running = True
         for k in self.targets:
             try:
@@ -178,35 +357,44 @@ class Animation:
             except AttributeError:
                 raise ValueError('object %r has no attribute %s to animate' % (object, k))
             self.initial[k] = a
+            self.tweeners[k] = _attr_tweener(a, self.targets[k])
             key = id(object), k
             previous_animation = self._animation_dict.get(key)
             if previous_animation is not None:
                 previous_animation._remove_target(k)
             self._animation_dict[key] = self
 
-        clock = clock or pyglet.clock
-        clock.schedule(self.update)
-        self.clock = clock
-        self.animations.append(self)
+        self.manager = TweenManager.for_clock(clock)
+        self.slot = self.manager.add(self)
 
-    def update(self, dt):
+    @property
+    def t(self):
+        """How long the animation has been running."""
+        if not self.running:
+            return self.duration
+        return float(self.manager.elapsed[self.slot])
+
+    def step(self, n, eased=None):
+        """Update the object, n of the way through the animation.
+
+        TweenManager calls this.  eased is the tween function
+        of n, if it's already been worked out.
+        """
         if isinstance(self.object, pyglet.sprite.Sprite):
             if self.object.image is None:
-                self.clock.unschedule(self.update)
-                self.animations.remove(self)
+                # the sprite's been deleted
+                self.stop()
                 return
-        self.t += dt
-        n = self.t / self.duration
-        if n > 1:
-            n = 1
+        if n >= 1:
             self.stop(complete=True)
             if self.on_finished is not None:
                 self.on_finished()
             return
-        n = self.function(n)
-        for k in self.targets:
-            v = tween_attr(n, self.initial[k], self.targets[k])
-            setattr(self.object, k, v)
+        if eased is None:
+            eased = self.function(n)
+        object = self.object
+        for k, tweener in self.tweeners.items():
+            setattr(object, k, tweener(eased))
 
     def stop(self, complete=False):
         """Stop the animation, optionally completing the transition to the final
@@ -217,17 +405,19 @@ class Animation:
             targets will be set to some value between the start and
             end values.
         """
+        if not self.running:
+            return
         self.running = False
         if complete:
             for k in self.targets:
                 setattr(self.object, k, self.targets[k])
         for k in list(self.targets):
             self._remove_target(k, stop=False)
-        self.clock.unschedule(self.update)
-        self.animations.remove(self)
+        self.manager.remove(self.slot)
 
     def _remove_target(self, target, stop=True):
         del self.targets[target]
+        del self.tweeners[target]
         del self._animation_dict[id(self.object), target]
         if not self.targets and stop:
             self.stop()
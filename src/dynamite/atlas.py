@@ -0,0 +1,246 @@
+"""The game's sprites, packed into a few big textures.
+
+The game builds the atlas the first time it needs an image, and
+again whenever images/ has changed since; or build it yourself,
+from the "src" directory, with
+
+    % python3 -m dynamite.atlas
+
+That packs the PNGs in images/ into pages in images/atlas/, and
+writes a manifest, atlas.json, saying where each image went.
+Sprite loaders then get their images from image(), which serves
+them as regions of the pages, so the scene batch can draw sprites
+from one texture rather than dozens.
+
+Anchors and animation frame grids still come from the sprite
+definitions (AnchoredImg, ImageSequence); each sheet is packed
+whole, so an ImageGrid over its region works as it always did.
+
+Images that aren't in the atlas (they're too big) come from
+pyglet.resource.image() as before; so does everything, if the atlas
+can't be built (say images/ can't be written to).
+"""
+
+import array
+import json
+import os
+from pathlib import Path
+import sys
+import time
+
+import numpy as np
+import pyglet.resource
+from pyglet.extlibs import png
+
+
+IMAGE_DIR = Path(__file__).parent.parent / 'images'
+ATLAS_DIR = IMAGE_DIR / 'atlas'
+MANIFEST_FILENAME = 'atlas.json'
+MANIFEST_VERSION = 2
+
+PAGE_SIZE = 2048
+# bigger images than this get a texture of their own
+MAX_IMAGE_SIZE = 1024
+# transparent pixels around every image, so texture
+# filtering doesn't pick up its neighbours
+PADDING = 2
+
+
+def _read_png(path, max_size):
+    """The pixels of the PNG at path, or None if it's bigger than max_size."""
+    width, height, rows, info = png.Reader(filename=str(path)).asRGBA8()
+    # (rows are decoded as we go, so we can say no before that)
+    if max(width, height) > max_size:
+        return None
+    return np.vstack([np.frombuffer(bytes(row), dtype=np.uint8) for row in rows]).reshape(height, width, 4)
+
+
+def _sources(image_dir):
+    """{filename: [mtime, size]} for the PNGs in image_dir."""
+    sources = {}
+    for path in sorted(Path(image_dir).glob('*.png')):
+        stat = path.stat()
+        sources[path.name] = [stat.st_mtime_ns, stat.st_size]
+    return sources
+
+
+def _pack(sizes, page_size):
+    """Pack rectangles into pages, on shelves.
+
+    sizes is {name: (width, height)}, including padding.
+    Returns {name: (page, x, y)}, with y counting down from the
+    top of the page, and the number of pages.
+    """
+    placed = {}
+    page = 0
+    x = y = shelf_height = 0
+    # tallest first, so each shelf wastes as little as possible
+    for name in sorted(sizes, key=lambda n: (-sizes[n][1], -sizes[n][0], n)):
+        w, h = sizes[name]
+        if x + w > page_size:
+            x = 0
+            y += shelf_height
+            shelf_height = 0
+        if y + h > page_size:
+            page += 1
+            x = y = shelf_height = 0
+        placed[name] = page, x, y
+        x += w
+        shelf_height = max(shelf_height, h)
+    return placed, page + 1 if placed else 0
+
+
+def build(image_dir=IMAGE_DIR, atlas_dir=ATLAS_DIR, page_size=PAGE_SIZE):
+    """Pack the images in image_dir into an atlas in atlas_dir.
+
+    Returns the manifest.
+    """
+    image_dir = Path(image_dir)
+    atlas_dir = Path(atlas_dir)
+    sources = _sources(image_dir)
+    images = {}
+    for name in sources:
+        pixels = _read_png(image_dir / name, min(MAX_IMAGE_SIZE, page_size - 2 * PADDING))
+        if pixels is not None:
+            images[name] = pixels
+
+    sizes = {
+        name: (pixels.shape[1] + 2 * PADDING, pixels.shape[0] + 2 * PADDING)
+        for name, pixels in images.items()
+    }
+    placed, page_count = _pack(sizes, page_size)
+
+    pages = [np.zeros((page_size, page_size, 4), dtype=np.uint8) for _ in range(page_count)]
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'pages': [f'page-{i}.png' for i in range(page_count)],
+        'images': {},
+        # every PNG we looked at, packed or not, to tell when to build again
+        'sources': sources,
+    }
+    for name, (page, x, top) in placed.items():
+        pixels = images[name]
+        height, width, _ = pixels.shape
+        x += PADDING
+        top += PADDING
+        pages[page][top:top + height, x:x + width] = pixels
+        mtime, size = sources[name]
+        manifest['images'][name] = {
+            'page': page,
+            # pyglet counts y up from the bottom
+            'x': x,
+            'y': page_size - top - height,
+            'width': width,
+            'height': height,
+            'mtime': mtime,
+            'size': size,
+        }
+
+    atlas_dir.mkdir(exist_ok=True)
+    writer = png.Writer(page_size, page_size, alpha=True)
+    for filename, pixels in zip(manifest['pages'], pages):
+        with open(atlas_dir / filename, 'wb') as f:
+            # (pypng is much quicker with arrays than with NumPy rows)
+            writer.write(f, (array.array('B', row.tobytes()) for row in pixels))
+    # the manifest goes last: until it's there, nothing uses the pages
+    tmp = atlas_dir / (MANIFEST_FILENAME + '.tmp')
+    tmp.write_text(json.dumps(manifest, indent=1, sort_keys=True))
+    os.replace(tmp, atlas_dir / MANIFEST_FILENAME)
+    return manifest
+
+
+def _read_manifest(atlas_dir):
+    """The atlas's manifest, or None if there isn't one we can use."""
+    try:
+        manifest = json.loads((Path(atlas_dir) / MANIFEST_FILENAME).read_text())
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def up_to_date(image_dir=IMAGE_DIR, atlas_dir=ATLAS_DIR):
+    """Has the atlas been built from the images as they are now?"""
+    manifest = _read_manifest(atlas_dir)
+    return bool(manifest) and (manifest['sources'] == _sources(image_dir))
+
+
+# image name -> region of a page, once the atlas is loaded
+_regions = None
+
+
+def load(image_dir=IMAGE_DIR, atlas_dir=ATLAS_DIR, build_if_needed=True):
+    """Load the atlas.
+
+    If it's never been built, or images have been added, removed
+    or changed since, it's built first (unless build_if_needed is
+    false); that takes a few seconds.  image() does all this the
+    first time it's called.
+    """
+    global _regions
+    # (imported here: pyglet.image wants a display, and building
+    # an atlas doesn't)
+    import pyglet.image
+
+    _regions = {}
+    if build_if_needed and not up_to_date(image_dir, atlas_dir):
+        print("Packing the images into a texture atlas...")
+        try:
+            build(image_dir, atlas_dir)
+        except OSError as e:
+            print(f"Couldn't build the texture atlas: {e}")
+    manifest = _read_manifest(atlas_dir)
+    if not manifest:
+        return
+
+    pages = {}
+    for name, entry in manifest['images'].items():
+        try:
+            stat = os.stat(Path(image_dir) / name)
+        except OSError:
+            continue
+        if (stat.st_mtime_ns, stat.st_size) != (entry['mtime'], entry['size']):
+            continue
+        page = entry['page']
+        if page not in pages:
+            path = Path(atlas_dir) / manifest['pages'][page]
+            pages[page] = pyglet.image.load(str(path)).get_texture()
+        _regions[name] = pages[page].get_region(
+            entry['x'], entry['y'], entry['width'], entry['height']
+        )
+
+
+def image(name):
+    """Get the image called name, like pyglet.resource.image(name).
+
+    Like pyglet.resource.image(), this returns the same object
+    every time for the same name.
+    """
+    if _regions is None:
+        load()
+    region = _regions.get(name)
+    if region is None:
+        return pyglet.resource.image(name)
+    return region
+
+
+def main(argv):
+    page_size = PAGE_SIZE
+    while argv and argv[0].startswith('--'):
+        option, _, value = argv.pop(0).partition('=')
+        if option == '--page-size':
+            page_size = int(value)
+        else:
+            sys.exit("usage: python -m dynamite.atlas [--page-size=N]")
+    start = time.perf_counter()
+    manifest = build(page_size=page_size)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{len(manifest['images'])} images in {len(manifest['pages'])} "
+        f"{page_size}x{page_size} page(s), in {elapsed:.2f}s"
+    )
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
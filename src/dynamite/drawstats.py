@@ -0,0 +1,312 @@
+"""Counting what drawing a frame costs.
+
+install() wraps pyglet's drawing so that every batch drawn, group
+state change, texture bind, draw call and vertex is counted.  The
+counts go to whichever part of the game is drawing; call section()
+with its name before drawing it:
+
+    drawstats.begin_frame()
+    drawstats.section('flow')
+    scene.flow.draw()
+    drawstats.section('scene')
+    scene.draw()
+
+and last_frame has the counts for the last whole frame, by section.
+Until install() is called, begin_frame() and section() cost next to
+nothing.
+
+For machines with no display, use_stub_gl() replaces OpenGL with a
+stub that does nothing, but lets pyglet make textures, batches and
+sprites; so the counts can be collected with no window at all.
+Call it before importing anything else that uses pyglet.gl.
+use_stub_images() goes with it: it loads images without decoding
+them, so they're the right size but blank.
+"""
+
+import ctypes
+import itertools
+import struct
+import sys
+
+import pyglet
+
+
+class Counts:
+    """What one section of one frame drew."""
+    __slots__ = ('batches', 'state_changes', 'texture_binds', 'draw_calls', 'vertices')
+
+    def __init__(self):
+        self.batches = self.state_changes = self.texture_binds = 0
+        self.draw_calls = self.vertices = 0
+
+    def __repr__(self):
+        return (
+            f"<Counts {self.batches} batches, {self.state_changes} state changes, "
+            f"{self.texture_binds} texture binds, {self.draw_calls} draw calls, "
+            f"{self.vertices} vertices>"
+        )
+
+
+installed = False
+
+# section name -> Counts, for the frame being drawn
+frame = {}
+# ...and for the last whole frame
+last_frame = {}
+_current = None
+
+
+def begin_frame():
+    """Start counting a new frame."""
+    global frame, last_frame
+    if not installed:
+        return
+    last_frame = frame
+    frame = {}
+    section('other')
+
+
+def section(name):
+    """Count what's drawn from now on against name."""
+    global _current
+    if not installed:
+        return
+    _current = frame.get(name)
+    if _current is None:
+        _current = frame[name] = Counts()
+
+
+def format_frame(counts=None):
+    """A table of counts (last_frame by default), with totals."""
+    if counts is None:
+        counts = last_frame
+    fields = Counts.__slots__
+    lines = [f"{'':12}" + ''.join(f"{f.replace('_', ' '):>15}" for f in fields)]
+    total = Counts()
+    for name, c in counts.items():
+        lines.append(f"{name:12}" + ''.join(f"{getattr(c, f):15}" for f in fields))
+        for f in fields:
+            setattr(total, f, getattr(total, f) + getattr(c, f))
+    lines.append(f"{'total':12}" + ''.join(f"{getattr(total, f):15}" for f in fields))
+    return '\n'.join(lines)
+
+
+def _replace(replacements):
+    """Replace GL functions wherever they've been imported.
+
+    replacements is a list of (original, replacement) pairs.
+    pyglet's modules (and ours) mostly do "from pyglet.gl import *",
+    so every module has its own names for the functions; this
+    changes them all.
+    """
+    # (ctypes functions can't be hashed, so go by id)
+    by_id = {id(original): (original, replacement) for original, replacement in replacements}
+    for module in list(sys.modules.values()):
+        namespace = getattr(module, '__dict__', None)
+        if not namespace:
+            continue
+        for name, value in list(namespace.items()):
+            pair = by_id.get(id(value))
+            if pair and pair[0] is value:
+                namespace[name] = pair[1]
+
+
+def install():
+    """Start counting."""
+    global installed
+    if installed:
+        return
+    import pyglet.gl as gl
+    import pyglet.graphics
+    import pyglet.sprite
+    # (these import the GL functions too, so they need patching)
+    import pyglet.graphics.vertexdomain
+    import pyglet.image
+    import pyglet.text.layout
+
+    bind_texture = gl.glBindTexture
+    draw_arrays = gl.glDrawArrays
+    multi_draw_arrays = gl.glMultiDrawArrays
+    draw_elements = gl.glDrawElements
+    multi_draw_elements = gl.glMultiDrawElements
+
+    def glBindTexture(target, texture):
+        _current.texture_binds += 1
+        bind_texture(target, texture)
+
+    def glDrawArrays(mode, first, count):
+        _current.draw_calls += 1
+        _current.vertices += count
+        draw_arrays(mode, first, count)
+
+    def glMultiDrawArrays(mode, first, count, primcount):
+        _current.draw_calls += 1
+        _current.vertices += sum(count[:primcount])
+        multi_draw_arrays(mode, first, count, primcount)
+
+    def glDrawElements(mode, count, type, indices):
+        _current.draw_calls += 1
+        _current.vertices += count
+        draw_elements(mode, count, type, indices)
+
+    def glMultiDrawElements(mode, count, type, indices, primcount):
+        _current.draw_calls += 1
+        _current.vertices += sum(count[:primcount])
+        multi_draw_elements(mode, count, type, indices, primcount)
+
+    _replace([
+        (bind_texture, glBindTexture),
+        (draw_arrays, glDrawArrays),
+        (multi_draw_arrays, glMultiDrawArrays),
+        (draw_elements, glDrawElements),
+        (multi_draw_elements, glMultiDrawElements),
+    ])
+
+    # Batch.draw(), counting the batch and its state changes.
+    # (the draw list is group.set_state, group.unset_state,
+    # and closures that draw a domain.)
+    def draw(self):
+        _current.batches += 1
+        if self._draw_list_dirty:
+            self._update_draw_list()
+        for func in self._draw_list:
+            if getattr(func, '__name__', None) == 'set_state':
+                _current.state_changes += 1
+            func()
+    pyglet.graphics.Batch.draw = draw
+
+    # a sprite drawn by itself sets the state of all its groups
+    sprite_draw = pyglet.sprite.Sprite.draw
+
+    def draw(self):
+        group = self._group
+        while group:
+            _current.state_changes += 1
+            group = group.parent
+        sprite_draw(self)
+    pyglet.sprite.Sprite.draw = draw
+
+    installed = True
+    begin_frame()
+
+
+class _StubContext:
+    """Stands in for the GL context, for use_stub_gl()."""
+    _workaround_unpack_row_length = False
+    _workaround_vbo = False
+    _workaround_vbo_finish = False
+
+    def __init__(self):
+        from pyglet.gl.base import ObjectSpace
+        self.object_space = ObjectSpace()
+
+    def delete_texture(self, texture_id):
+        pass
+
+    def delete_buffer(self, buffer_id):
+        pass
+
+
+# the GL functions that hand back values we have to fake
+_GENERATORS = ('glGenTextures', 'glGenBuffers', 'glGenFramebuffersEXT', 'glGenLists')
+
+stubbed = False
+
+
+def use_stub_gl(version='2.1', max_texture_size=4096):
+    """Replace OpenGL with a stub that draws nothing.
+
+    Every GL function does nothing and returns 0, except that
+    the glGen* functions hand out new names, and
+    glGetIntegerv(GL_MAX_TEXTURE_SIZE) says max_texture_size.
+    There's a stand-in for the current context, too, which says
+    it's OpenGL version (so pyglet draws the same way it would
+    on a real one).  Don't open a window after this.
+
+    Calling it again does nothing (stubbing the functions a second
+    time would stub out install()'s counting, too).
+    """
+    global stubbed
+    if stubbed:
+        return
+    stubbed = True
+    # no context: no shadow window
+    pyglet.options['shadow_window'] = False
+    import pyglet.gl as gl
+    names = itertools.count(1)
+
+    def stub(name):
+        # (a function of its own for every name, so install()
+        # can tell them apart)
+        def stub(*args):
+            return 0
+        stub.__name__ = name
+        return stub
+
+    def generate(n, ids):
+        # ids is byref(GLuint), or an array of them
+        ids = getattr(ids, '_obj', ids)
+        if isinstance(ids, ctypes.Array):
+            for i in range(n):
+                ids[i] = next(names)
+        else:
+            ids.value = next(names)
+
+    def glGetIntegerv(pname, params):
+        params = getattr(params, '_obj', params)
+        if pname == gl.GL_MAX_TEXTURE_SIZE:
+            params.value = max_texture_size
+
+    replacements = []
+    for name, value in vars(gl).items():
+        if name.startswith('gl') and callable(value) and not isinstance(value, type):
+            if name in _GENERATORS:
+                replacement = generate
+            elif name == 'glGetIntegerv':
+                replacement = glGetIntegerv
+            else:
+                replacement = stub(name)
+            replacements.append((value, replacement))
+    _replace(replacements)
+    gl.current_context = _StubContext()
+    info = gl.gl_info._gl_info
+    info.have_context = info._have_info = True
+    info.vendor = info.renderer = 'dynamite.drawstats stub'
+    info.version = version
+    info.extensions = set()
+
+
+stubbed_images = False
+
+
+def use_stub_images():
+    """Load PNGs as blank images of the right size, without decoding them.
+
+    Only the header's read, for the width and height, so loading
+    costs next to nothing and doesn't depend on pyglet's decoders
+    (pyglet 1.3's own PNG decoder doesn't run on Python 3.9 and
+    later).  Textures and sprites come out the right size, but
+    transparent.  Call it before loading any images.
+    """
+    global stubbed_images
+    if stubbed_images:
+        return
+    stubbed_images = True
+    from pyglet.image import ImageData
+    from pyglet.image import codecs
+
+    class StubPNGDecoder(codecs.ImageDecoder):
+        def get_file_extensions(self):
+            return ['.png']
+
+        def decode(self, file, filename):
+            header = file.read(24)
+            if (header[:8] != b'\x89PNG\r\n\x1a\n') or (header[12:16] != b'IHDR'):
+                raise codecs.ImageDecodeException(f"{filename or file!r} isn't a PNG")
+            width, height = struct.unpack('>II', header[16:24])
+            return ImageData(width, height, 'RGBA', bytes(width * height * 4))
+
+    # ahead of the real ones
+    decoder = StubPNGDecoder()
+    codecs._decoders.insert(0, decoder)
+    codecs._decoder_extensions.setdefault('.png', []).insert(0, decoder)
@@ -0,0 +1,123 @@
+"""The game loop: logic at a fixed rate, drawing as often as allowed.
+
+pyglet's own event loop draws every time any scheduled function
+runs, which (with anything scheduled every frame) is as often as
+it possibly can.  GameLoop replaces it.  Each frame it:
+
+    * runs pyglet's scheduled functions (tweens, particles...),
+    * runs however many logic ticks are due, at logic_interval each,
+    * draws every window.
+
+and then sleeps until the next frame is due, if there's a frame
+cap.  The logic and the drawing don't wait for each other: a slow
+machine draws fewer frames, not fewer logic ticks.  If the logic
+itself falls more than max_ticks behind, the rest is dropped and
+the game runs slow for a moment, rather than spending longer and
+longer catching up.
+
+Between ticks, alpha says how far we are towards the next one, so
+whatever's drawn can be interpolated between the last two logic
+states.
+
+Install it with
+
+    pyglet.app.event_loop = GameLoop(tick)
+    pyglet.app.run()
+"""
+
+import time
+
+import pyglet.app
+
+from . import profiler
+from .sim.constants import logic_interval
+
+
+# most logic ticks one frame may run to catch up
+MAX_TICKS_PER_FRAME = 12
+
+
+class GameLoop(pyglet.app.EventLoop):
+    def __init__(self, tick, fps=60, interval=logic_interval, max_ticks=MAX_TICKS_PER_FRAME):
+        """
+        tick is called, with no arguments, once per logic tick.
+
+        fps is the frame cap; None (or 0) draws as fast as
+        possible, for benchmarking.  (Turn off the window's vsync
+        too, or that caps it anyway.)
+        """
+        super().__init__()
+        self.tick = tick
+        self.fps = fps
+        self.interval = interval
+        self.max_ticks = max_ticks
+
+        self.accumulator = 0.0
+        self.alpha = 0.0
+        self.next_frame = 0.0
+
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats_start = time.perf_counter()
+        self.frames = self.ticks = self.dropped_ticks = 0
+        self.logic_time = self.draw_time = 0.0
+
+    def idle(self):
+        now = time.perf_counter()
+        if self.fps:
+            if now < self.next_frame:
+                return self.next_frame - now
+            # if we're running late, don't try to make the frames up
+            self.next_frame = max(self.next_frame + 1 / self.fps, now)
+
+        dt = self.clock.update_time()
+        self.clock.call_scheduled_functions(dt)
+        self.run_logic(dt)
+
+        start = time.perf_counter()
+        for window in pyglet.app.windows:
+            window.switch_to()
+            window.dispatch_event('on_draw')
+            window.flip()
+        self.draw_time += time.perf_counter() - start
+        self.frames += 1
+
+        if not self.fps:
+            return 0
+        return max(self.next_frame - time.perf_counter(), 0)
+
+    def run_logic(self, dt):
+        """Run the logic ticks that are due after dt more seconds."""
+        self.accumulator += dt
+        ticks = int(self.accumulator / self.interval)
+        if ticks > self.max_ticks:
+            self.dropped_ticks += ticks - self.max_ticks
+            ticks = self.max_ticks
+            self.accumulator %= self.interval
+        else:
+            self.accumulator -= ticks * self.interval
+
+        start = time.perf_counter()
+        for _ in range(ticks):
+            self.tick()
+        elapsed = time.perf_counter() - start
+        self.logic_time += elapsed
+        profiler.add('logic', elapsed)
+        self.ticks += ticks
+        self.alpha = min(self.accumulator / self.interval, 1.0)
+        return ticks
+
+    def report(self):
+        """How we've done since the last report, as a string."""
+        elapsed = time.perf_counter() - self.stats_start
+        frames = self.frames or 1
+        report = (
+            f"{self.frames / elapsed:6.1f} fps, "
+            f"{self.ticks / elapsed:6.1f} ticks/s "
+            f"({self.dropped_ticks} dropped), "
+            f"logic {1000 * self.logic_time / frames:.2f}ms/frame, "
+            f"draw {1000 * self.draw_time / frames:.2f}ms/frame"
+        )
+        self.reset_stats()
+        return report
@@ -39,35 +39,85 @@ class LevelRenderer:
     }
 
     def __init__(self, level):
+        self.level = None
+        self.batch = None
+        self.set_level(level)
+
+    def set_level(self, level):
+        """
+        Show level instead.
+
+        Restarting a level loads the very same map (maploader
+        caches it), so there's nothing to do.  Otherwise, if it's
+        the same size as the level we were showing, we read which
+        of its tiles are water, and only the corners around tiles
+        that changed between water and grass are updated; so
+        reloading a level that's been edited costs one pass over
+        the map, not a new sprite for every corner.
+
+        (The terrain never changes while a level's being played:
+        dams and everything else on it are entities.)
+        """
+        old = self.level
         self.level = level
-        self.rebuild()
+        if (old is None) or ((old.width, old.height) != (level.width, level.height)):
+            self.rebuild()
+        elif level.map_data is not old.map_data:
+            self._update(self._read_water())
+
+    def _read_water(self):
+        """A bitmap of the level: 1 for water, 0 for grass, row by row."""
+        get_xy = self.level.get_xy
+        return bytearray(
+            get_xy(x, y).water
+            for y in range(self.level.height)
+            for x in range(self.level.width)
+        )
+
+    def _corner(self, x, y):
+        """
+        The tilemap key for the corner at x, y:
+        the four tiles around it, each 'w' or 'g'.
+        """
+        water = self.water
+        width = self.width
+        height = self.height
 
-    def rebuild(self):
-        """Rebuild the batch based on the current contents of the level."""
-        batch = pyglet.graphics.Batch()
-        sprites = []
         def q(x, y):
             if x < 0:
                 x = 0
-            elif x >= self.level.width:
-                x = self.level.width - 1
+            elif x >= width:
+                x = width - 1
             if y < 0:
                 return 'w'
-            elif y >= self.level.height:
-                y = self.level.height - 1
-            t = self.level.get(Vec2D(x, y))
-            return 'w' if t.water else 'g'
+            elif y >= height:
+                y = height - 1
+            return 'w' if water[y * width + x] else 'g'
+
+        return q(x + 1, y) + q(x + 1, y - 1) + q(x, y - 1) + q(x, y)
+
+    def _index(self, x, y):
+        # the corners run from -1 to width and -1 to height,
+        # column by column
+        return (x + 1) * (self.height + 2) + (y + 1)
+
+    def rebuild(self):
+        """Rebuild the batch based on the current contents of the level."""
+        self.width = self.level.width
+        self.height = self.level.height
+        self.water = self._read_water()
+        if self.batch:
+            for sprite in self.sprites:
+                sprite.delete()
+        batch = pyglet.graphics.Batch()
+        sprites = []
+        corners = []
         coords = product(
-            range(-1, self.level.width + 1),
-            range(-1, self.level.height + 1)
+            range(-1, self.width + 1),
+            range(-1, self.height + 1)
         )
         for x, y in coords:
-            bitv = (
-                q(x + 1, y) +
-                q(x + 1, y - 1) +
-                q(x, y - 1) +
-                q(x, y)
-            )
+            bitv = self._corner(x, y)
             screenx, screeny = map_to_screen(Vec2D(x, y))
             tx, ty = self.tilemap[bitv]
             sprites.append(
@@ -78,8 +128,38 @@ class LevelRenderer:
                     batch=batch,
                 )
             )
+            corners.append(bitv)
         self.batch = batch
         self.sprites = sprites
+        # the tilemap key each sprite is showing
+        self.corners = corners
+
+    def _update(self, water):
+        """Switch to the water bitmap water, fixing up the corners that changed."""
+        old = self.water
+        self.water = water
+        if water == old:
+            return
+        width = self.width
+        dirty = set()
+        for i, (was, now) in enumerate(zip(old, water)):
+            if was == now:
+                continue
+            y, x = divmod(i, width)
+            # the corners that look at tile x, y.
+            # (corners off the right edge look at the last column.)
+            xs = (x - 1, x, x + 1) if x == width - 1 else (x - 1, x)
+            for cx in xs:
+                dirty.add((cx, y))
+                dirty.add((cx, y + 1))
+
+        for x, y in dirty:
+            i = self._index(x, y)
+            bitv = self._corner(x, y)
+            if bitv != self.corners[i]:
+                self.corners[i] = bitv
+                tx, ty = self.tilemap[bitv]
+                self.sprites[i].image = self.tiles[ty, tx]
 
     def draw(self):
         """Draw the level."""
@@ -1,15 +1,33 @@
 from collections import namedtuple
+import importlib.util
+import marshal
 import os
 import re
 
-import pyglet.resource
-
 from .vec2d import Vec2D
 from .coords import TILES_W, TILES_H
 
 
 Map = namedtuple('Map', 'name next width height tiles mtime legend_mtime metadata')
 
+# a map file, parsed and checked, with the legend entries
+# it uses compiled (but not evaluated).
+# rows is the map's lines of symbols; legend maps symbol -> code.
+CompiledMap = namedtuple('CompiledMap', 'name next width height rows legend mtime legend_mtime metadata')
+
+LEGEND_FILENAME = "legend.txt"
+
+# compiled maps are cached on disk in CACHE_DIR, next to the map files.
+# they hold code objects, so they're only good for this version
+# of Python; bump CACHE_VERSION if CompiledMap changes.
+CACHE_DIR = '__pycache__'
+CACHE_SUFFIX = '.dvmap'
+CACHE_VERSION = 1
+CACHE_MAGIC = b'DVMC' + bytes([CACHE_VERSION]) + importlib.util.MAGIC_NUMBER
+
+# (directory, filename) -> (mtime, legend_mtime, globals_, Map)
+_map_cache = {}
+
 # list of strings, separated by spaces
 required_level_metadata = "next"
 
@@ -51,25 +69,32 @@ def load_legend(filename, lines):
 
     return legend
 
-def load_map(filename, globals_=globals()):
-    """Load a map from a text file.
+def _open_level_file(filename, directory):
+    if directory is None:
+        import pyglet.resource
+        return pyglet.resource.file(filename, 'rt')
+    return open(os.path.join(directory, filename), 'rt')
+
+
+def _compile_legend_entry(filename, sym, expr):
+    return compile(expr, f"<{filename} legend {sym!r}>", 'eval')
 
-    The text file should have a 2D grid of symbols at the top,
-    and a legend at the bottom.
 
+def _parse_map(filename, directory):
+    """Read and check a map file, and compile the legend entries it uses.
+
+    Returns a CompiledMap, which has nothing in it that depends
+    on the namespace the legend is evaluated in.
     """
 
     def enumerated_text(s):
         return iter(enumerate(s.strip().splitlines(), start=1))
 
-    legend_filename = "legend.txt"
-    with pyglet.resource.file(legend_filename, 'rt') as f:
+    with _open_level_file(LEGEND_FILENAME, directory) as f:
         legend_mtime = os.fstat(f.fileno()).st_mtime
-        legend = load_legend(legend_filename, enumerated_text(f.read()))
+        legend = load_legend(LEGEND_FILENAME, enumerated_text(f.read()))
 
-    if not filename.endswith(".txt"):
-        filename += ".txt"
-    with pyglet.resource.file(filename, 'rt') as f:
+    with _open_level_file(filename, directory) as f:
         mtime = os.fstat(f.fileno()).st_mtime
         map_text = f.read()
 
@@ -103,21 +128,9 @@ def load_map(filename, globals_=globals()):
         if s not in metadata:
             raise MapFormatError(f"Required metadata key {s!r} not found")
 
-    # the map is currently map[y][x].
-    # now rotate map so x is first instead of y.
-    # and index by tuple rather than nested list.
-    # so that we get map[x, y]
-    # (which is what tmx gives us)
     map_width = len(map_lines[0])
     map_height = len(map_lines)
 
-    dims = (map_width, map_height)
-    expected_dims = (TILES_W, TILES_H)
-    if dims != expected_dims:
-        raise MapFormatError(
-            f"The dimensions of the map must be {expected_dims} (not {dims})."
-        )
-
     for lineno, ln in enumerate(map_lines[1:], start=2):
         if len(ln) != map_width:
             raise MapFormatError(
@@ -125,24 +138,180 @@ def load_map(filename, globals_=globals()):
                 f"{map_width} columns at {lineno}, found {len(ln)})."
             )
 
-    new_map = {}
-    for y, line in enumerate(map_lines):
-        for x, tile in enumerate(line):
+    # only the symbols that are actually used get compiled
+    # (and later evaluated), once each.
+    used = {}
+    for line in map_lines:
+        for tile in line:
+            if tile in used:
+                continue
             try:
                 exp = legend[tile]
             except KeyError:
                 raise MapFormatError(
                     f"The symbol {tile!r} does not appear in the legend."
                 ) from None
-            new_map[Vec2D(x, y)] = eval(exp, globals_)
+            used[tile] = _compile_legend_entry(filename, tile, exp)
 
-    return Map(
+    return CompiledMap(
         name=filename.replace('.txt', ''),
         next=metadata['next'],
         width=map_width,
         height=map_height,
-        tiles=new_map,
+        rows=map_lines,
+        legend=used,
         mtime=mtime,
         legend_mtime=legend_mtime,
         metadata=metadata,
     )
+
+
+def _check_size(compiled):
+    dims = (compiled.width, compiled.height)
+    expected_dims = (TILES_W, TILES_H)
+    if dims != expected_dims:
+        raise MapFormatError(
+            f"The dimensions of the map must be {expected_dims} (not {dims})."
+        )
+
+
+def _build_map(compiled, globals_):
+    """Evaluate a CompiledMap's legend in globals_, and make the Map."""
+    # every square with the same symbol shares the same tile.
+    # (tiles don't change once they're made, so that's fine.)
+    tile_for = {
+        sym: eval(code, globals_)
+        for sym, code in compiled.legend.items()
+    }
+
+    # the map is currently map[y][x].
+    # now rotate map so x is first instead of y.
+    # and index by tuple rather than nested list.
+    # so that we get map[x, y]
+    # (which is what tmx gives us)
+    new_map = {}
+    for y, line in enumerate(compiled.rows):
+        for x, tile in enumerate(line):
+            new_map[Vec2D(x, y)] = tile_for[tile]
+
+    return Map(
+        name=compiled.name,
+        next=compiled.next,
+        width=compiled.width,
+        height=compiled.height,
+        tiles=new_map,
+        mtime=compiled.mtime,
+        legend_mtime=compiled.legend_mtime,
+        metadata=compiled.metadata,
+    )
+
+
+def _cache_path(directory, filename):
+    return os.path.join(directory, CACHE_DIR, filename.replace('.txt', CACHE_SUFFIX))
+
+
+def _read_compiled(directory, filename, mtime, legend_mtime):
+    """
+    Load the compiled map from the on-disk cache.
+    Returns None if it isn't there, or it's out of date.
+    """
+    try:
+        with open(_cache_path(directory, filename), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if not data.startswith(CACHE_MAGIC):
+        return None
+    try:
+        compiled = CompiledMap(*marshal.loads(data[len(CACHE_MAGIC):]))
+    except (EOFError, ValueError, TypeError):
+        return None
+    if (compiled.mtime, compiled.legend_mtime) != (mtime, legend_mtime):
+        return None
+    return compiled
+
+
+def _write_compiled(directory, filename, compiled):
+    """
+    Save the compiled map to the on-disk cache, if we can.
+    (Like Python's own __pycache__, it's fine if we can't.)
+    """
+    path = _cache_path(directory, filename)
+    temp = f'{path}.{os.getpid()}'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp, 'wb') as f:
+            f.write(CACHE_MAGIC)
+            f.write(marshal.dumps(tuple(compiled)))
+        os.replace(temp, path)
+    except OSError:
+        try:
+            os.unlink(temp)
+        except OSError:
+            pass
+
+
+def clear_cache():
+    """Forget the maps cached in memory.  (The ones on disk stay.)"""
+    _map_cache.clear()
+
+
+def load_map(filename, globals_=globals(), directory=None, cache=True, any_size=False):
+    """Load a map from a text file.
+
+    The text file should have a 2D grid of symbols at the top,
+    and a legend at the bottom.
+
+    Files are found through pyglet.resource, unless you pass
+    the directory to read them from.
+
+    If you pass the directory, loaded maps are cached, keyed by
+    the modification times of the map file and the legend (the
+    mtime and legend_mtime Map records).  In memory, so loading
+    the same map again (restarting a level, say) is just two
+    stat() calls; and on disk, in directory/__pycache__, so a
+    fresh start skips reading and parsing the text and evaluates
+    each legend symbol just once.  Editing either file makes it
+    read the text again.  Pass cache=False to skip the caches.
+
+    Maps have to be the size of the screen (TILES_W x TILES_H),
+    unless you pass any_size=True: "stress mode", for the huge
+    maps dynamite.sim.stress makes.  The game can't show those,
+    but the simulation runs them fine.
+    """
+    if not filename.endswith(".txt"):
+        filename += ".txt"
+    if (directory is None) or not cache:
+        compiled = _parse_map(filename, directory)
+        if not any_size:
+            _check_size(compiled)
+        return _build_map(compiled, globals_)
+
+    try:
+        mtime = os.stat(os.path.join(directory, filename)).st_mtime
+        legend_mtime = os.stat(os.path.join(directory, LEGEND_FILENAME)).st_mtime
+    except OSError:
+        # let _parse_map() complain about it
+        mtime = legend_mtime = None
+
+    key = (directory, filename)
+    cached = _map_cache.get(key)
+    if (cached
+        and (cached[0], cached[1]) == (mtime, legend_mtime)
+        and cached[2] is globals_):
+        map = cached[3]
+        if not any_size:
+            _check_size(map)
+        return map
+
+    compiled = _read_compiled(directory, filename, mtime, legend_mtime)
+    if compiled is None:
+        compiled = _parse_map(filename, directory)
+        _write_compiled(directory, filename, compiled)
+    # (checked here, not when parsing, so a map cached in stress
+    # mode is still checked when it's loaded without it)
+    if not any_size:
+        _check_size(compiled)
+    map = _build_map(compiled, globals_)
+    _map_cache[key] = (compiled.mtime, compiled.legend_mtime, globals_, map)
+    return map
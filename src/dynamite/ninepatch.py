@@ -28,25 +28,15 @@ http://developer.android.com/guide/topics/graphics/2d-graphics.html#nine-patch.
 __all__ = ["NinePatch"]
 
 from pyglet.gl import *
-
-class PixelData(object):
-    def __init__(self, image):
-        image_data = image.get_image_data()
-        self.has_alpha = 'A' in image_data.format
-        self.data = image_data.get_data("RGBA", image.width * 4)
-        self.width = image.width
-        self.height = image.height
-
-    def is_black(self, x, y):
-        p = (y * self.width + x) * 4
-        if self.has_alpha:
-            if self.data[p+3] == '\x00':
-                return False # Fully transparent
-
-        return self.data[p:p+3] == '\x00\x00\x00'
+import pyglet.graphics
+import pyglet.sprite
 
 class NinePatch(object):
     """A scalable 9-patch image.
+
+    Like a sprite, it lives in a batch, as one vertex list; place()
+    puts it where it's wanted, and only touches the vertices if
+    that's somewhere new.
     """
 
     # Content area of the image, in pixels from the edge.
@@ -61,17 +51,19 @@ class NinePatch(object):
     border_right = 6
     border_bottom = 6
 
-    def __init__(self, image, border_size=6):
+    def __init__(self, image, border_size=6, batch=None, group=None):
         """Create NinePatch cuts of an image
 
         Arguments:
             image - an ImageData (Texture, TextureRegion, etc)
-            texture - force cut ImageDatas to be Textures (or Regions)
+            border_size - the size of the corners, in pixels
+            batch - the batch to draw in (it gets one of its own
+                    if this is None; draw it with draw())
+            group - the parent group to draw in
         """
 
-        data = PixelData(image)
-        width = data.width
-        height = data.height
+        width = image.width
+        height = image.height
 
         # Texture dimensions after removing the 9patch outline.
         self.width = width
@@ -80,6 +72,16 @@ class NinePatch(object):
         # Only need to retain the texture for drawing
         self.texture = image.get_texture()
 
+        self.batch = batch or pyglet.graphics.Batch()
+        self.group = pyglet.sprite.SpriteGroup(
+            self.texture,
+            GL_SRC_ALPHA,
+            GL_ONE_MINUS_SRC_ALPHA,
+            group
+        )
+        self.vertex_list = None
+        self.rect = None
+
         self.border_left = self.border_right = self.border_top = self.border_bottom = border_size
 
         # Texture coordinates, in pixels
@@ -171,50 +173,70 @@ class NinePatch(object):
             x4, y4,
         )
 
-    def draw(self, x, y, width, height):
-        """Draw the nine-patch at the given image dimensions."""
+    def place(self, x, y, width, height):
+        """Put the nine-patch at the given image dimensions."""
         width = max(width, self.width + 2)
         height = max(height, self.height + 2)
-        vertices = self.get_vertices(x, y, width, height)
-
-        glPushAttrib(GL_ENABLE_BIT)
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-        glEnable(self.texture.target)
-        glBindTexture(self.texture.target, self.texture.id)
-        pyglet.graphics.draw_indexed(
-            16, GL_QUADS, self.indices,
-            ('v2i', vertices),
-            ('t2f', self.tex_coords))
-        glPopAttrib()
-
-    def draw_around(self, x, y, width, height):
-        """Draw the nine-patch around the given content area"""
-        self.draw(x - self.padding_left,
-                  y - self.padding_bottom,
-                  width + self.padding_left + self.padding_right,
-                  height + self.padding_bottom + self.padding_top)
+        rect = (x, y, width, height)
+        if rect == self.rect:
+            return
+        self.rect = rect
+        vertices = self.get_vertices(*rect)
+
+        if self.vertex_list is None:
+            self.vertex_list = self.batch.add_indexed(
+                16, GL_QUADS, self.group, self.indices,
+                ('v2i', vertices),
+                ('t2f/static', self.tex_coords))
+        else:
+            self.vertex_list.vertices[:] = vertices
+
+    def place_around(self, x, y, width, height):
+        """Put the nine-patch around the given content area"""
+        self.place(x - self.padding_left,
+                   y - self.padding_bottom,
+                   width + self.padding_left + self.padding_right,
+                   height + self.padding_bottom + self.padding_top)
+
+    def draw(self):
+        """Draw the nine-patch's batch.
+
+        (If it's in someone else's batch, draw that instead.)
+        """
+        self.batch.draw()
+
+    def delete(self):
+        if self.vertex_list is not None:
+            self.vertex_list.delete()
+            self.vertex_list = None
+            self.rect = None
 
 if __name__ == '__main__':
     import sys
     image = pyglet.image.load(sys.argv[1])
-    ninepatch = NinePatch(image)
 
     window = pyglet.window.Window(resizable=True)
+    batch = pyglet.graphics.Batch()
+    ninepatch = NinePatch(image, batch=batch, group=pyglet.graphics.OrderedGroup(0))
     label = pyglet.text.Label('Hello, NinePatch',
                               font_size=16,
                               anchor_y='bottom',
-                              color=(0,0,0,255))
+                              color=(0,0,0,255),
+                              batch=batch,
+                              group=pyglet.graphics.OrderedGroup(1))
+
+    @window.event
+    def on_resize(width, height):
+        label_width = label.content_width
+        label_height = label.content_height
+        label.x = width // 2 - label_width // 2
+        label.y = height // 2 - label_height // 2
+        ninepatch.place_around(label.x, label.y, label_width, label_height)
 
     @window.event
     def on_draw():
         glClearColor(.7, .7, .7, 1.)
         window.clear()
-        width = label.content_width
-        height = label.content_height
-        label.x = window.width / 2 - width / 2
-        label.y = window.height / 2 - height / 2
-        ninepatch.draw_around(label.x, label.y, width, height)
-        label.draw()
+        batch.draw()
 
     pyglet.app.run()
@@ -1,103 +1,180 @@
-import random
+import numpy as np
+import pyglet.graphics
 import pyglet.resource
+import pyglet.sprite
+from pyglet import gl
 
 from .coords import map_to_screen
 
 
 class FlowParticles:
-    """Particles that indicate the flow of water."""
+    """Particles that indicate the flow of water.
+
+    The ripples are stored as a struct of NumPy arrays, one entry
+    per ripple, and drawn as quads in a single vertex list, so an
+    update is a handful of array operations however many ripples
+    there are, rather than a loop over sprites.
+    """
 
     SPEED = 0.6
     DRAGY = 0.3
     DRAGX = 0.4
 
+    # a ripple fades in for a second, then out for a second
+    LIFETIME = 2
+
     @classmethod
     def load(cls):
         cls.ripple = pyglet.resource.image('ripple.png')
         cls.ripple.anchor_x = cls.ripple.width * 0.5
         cls.ripple.anchor_y = 0
 
-    def __init__(self, level):
+    def __init__(self, level, rng=None):
         self.level = level
+        self.random = rng or np.random.default_rng()
         self.batch = pyglet.graphics.Batch()
-        self.particles = []
+        self.texture = self.ripple.get_texture()
+        self.group = pyglet.sprite.SpriteGroup(
+            self.texture,
+            gl.GL_SRC_ALPHA,
+            gl.GL_ONE_MINUS_SRC_ALPHA,
+        )
+        self.vertex_list = None
+        self.capacity = 0
+
+        # the map never changes once it's loaded,
+        # so work out the current field just once:
+        # whether each tile is water, and which way it flows.
+        self.water = np.zeros((level.height, level.width), dtype=bool)
+        self.field = np.zeros((level.height, level.width, 2))
+        for y in range(level.height):
+            for x in range(level.width):
+                t = level.get_xy(x, y)
+                if t.water:
+                    self.water[y, x] = True
+                    self.field[y, x] = t.current
+        ys, xs = np.nonzero(self.water)
+        self.water_tiles = np.column_stack((xs, ys)).astype(float)
+        self.water_currents = self.field[ys, xs]
+        # still water spawns ripples half as often
+        self.spawn_range = np.where(self.water_currents.any(axis=1), 1.0, 2.0)
+
+        # the ripples.  positions are in map coordinates.
+        self.position = np.empty((0, 2))
+        self.velocity = np.empty((0, 2))
+        self.age = np.empty(0)
+        self.bright = np.empty(0)
+        self.max_scale = np.empty(0)
+        self.opacity = np.empty(0)
+        self.scale_y = np.empty(0)
+
         for _ in range(5):
             self.update(0.3)
 
+    def __len__(self):
+        return len(self.age)
+
     def update(self, dt):
-        water_tiles = {}
-        for pos in self.level.coords():
-            t = self.level.get(pos)
-            if t.water:
-                water_tiles[pos] = t.current
-
-        new_particles = []
-        for p in self.particles:
-            p.age += dt
-            if p.age > 2:
-                continue
-
-            if p.age < 1:
-                p.opacity = p.age * p.bright
-                p.scale_y = p.age * p.max_scale * 0.8 + 0.2
-            elif p.age > 1:
-                p.opacity = (2 - p.age) * p.bright
-                p.scale_y = (2 - p.age) * 0.8 * p.max_scale + 0.2
-
-            x, y = p.map_pos
-            current = water_tiles.get((round(x), round(y)))
-            if current is None:
-                continue
-            curx, cury = current
-
-            vx, vy = p.v
-
-            frac = self.DRAGX ** dt
-            invfrac = 1.0 - frac
-            vx = frac * vx + invfrac * curx
-            frac = self.DRAGY ** dt
-            invfrac = 1.0 - frac
-            vy = frac * vy + invfrac * cury
-
-            p.v = vx, vy
-            spd = dt * self.SPEED
-            x += vx * spd
-            y += vy * spd
-            p.map_pos = x, y
-            p.position = map_to_screen(p.map_pos)
-            new_particles.append(p)
-
-        for (tx, ty), current in water_tiles.items():
-            cx, cy = current
-            f = cx + cy
-
-            if random.uniform(0, 1 if f else 2) > dt:
-                continue
-            x = random.uniform(tx - 0.5, tx + 0.5)
-            y = random.uniform(ty - 0.5, ty + 0.5)
-
-            map_pos = x, y
-            sx, sy = map_to_screen(map_pos)
-            p = pyglet.sprite.Sprite(
-                self.ripple,
-                sx,
-                sy,
-                batch=self.batch
-            )
-            p.age = 0
-            p.bright = random.uniform(128, 255)
-            cx, cy = current
-            p.v = (
-                cx + random.uniform(-0.5, 0.5),
-                cy + random.uniform(-0.2, 0.2)
-            )
-            p.opacity = 0
-            p.max_scale = random.uniform(0.3, 0.6)
-            p.scale_x = p.max_scale
-            p.scale_y = 0.2
-            p.map_pos = map_pos
-            new_particles.append(p)
-        self.particles = new_particles
+        self._move(dt)
+        self._spawn(dt)
+        self._write_vertices()
+
+    def _move(self, dt):
+        age = self.age + dt
+        position = self.position
+
+        # ripples die of old age, or when they leave the water
+        height, width = self.water.shape
+        ix = np.rint(position[:, 0]).astype(int)
+        iy = np.rint(position[:, 1]).astype(int)
+        keep = (age <= self.LIFETIME) & (ix >= 0) & (ix < width) & (iy >= 0) & (iy < height)
+        keep[keep] = self.water[iy[keep], ix[keep]]
+
+        age = age[keep]
+        bright = self.bright[keep]
+        max_scale = self.max_scale[keep]
+        current = self.field[iy[keep], ix[keep]]
+
+        # up to full size and brightness at one second, and back down
+        t = np.where(age < 1, age, 2 - age)
+        self.opacity = t * bright
+        self.scale_y = t * 0.8 * max_scale + 0.2
+
+        # drift towards the current
+        frac = np.array([self.DRAGX ** dt, self.DRAGY ** dt])
+        velocity = frac * self.velocity[keep] + (1.0 - frac) * current
+        self.position = position[keep] + velocity * (dt * self.SPEED)
+        self.velocity = velocity
+        self.age = age
+        self.bright = bright
+        self.max_scale = max_scale
+
+    def _spawn(self, dt):
+        random = self.random
+        spawn = random.random(len(self.spawn_range)) * self.spawn_range <= dt
+        n = int(spawn.sum())
+        if not n:
+            return
+        position = self.water_tiles[spawn] + random.uniform(-0.5, 0.5, (n, 2))
+        velocity = self.water_currents[spawn] + np.column_stack((
+            random.uniform(-0.5, 0.5, n),
+            random.uniform(-0.2, 0.2, n),
+        ))
+        self.position = np.concatenate((self.position, position))
+        self.velocity = np.concatenate((self.velocity, velocity))
+        self.age = np.concatenate((self.age, np.zeros(n)))
+        self.bright = np.concatenate((self.bright, random.uniform(128, 255, n)))
+        self.max_scale = np.concatenate((self.max_scale, random.uniform(0.3, 0.6, n)))
+        self.opacity = np.concatenate((self.opacity, np.zeros(n)))
+        self.scale_y = np.concatenate((self.scale_y, np.full(n, 0.2)))
+
+    def _reserve(self, n):
+        """Make sure the vertex list has room for n ripples."""
+        if n <= self.capacity:
+            return
+        capacity = max(n, self.capacity * 2, 64)
+        if self.vertex_list:
+            self.vertex_list.delete()
+        self.vertex_list = self.batch.add(
+            capacity * 4,
+            gl.GL_QUADS,
+            self.group,
+            'v2f/stream',
+            'c4B/stream',
+            ('t3f/static', self.texture.tex_coords * capacity),
+        )
+        self.capacity = capacity
+        # white, and the alpha is set per ripple
+        np.ctypeslib.as_array(self.vertex_list.colors)[:] = 255
+
+    def _write_vertices(self):
+        """Write every ripple into the vertex list, as a quad like a Sprite's."""
+        n = len(self.age)
+        self._reserve(n)
+        image = self.texture
+        sx, sy = map_to_screen(self.position.T)
+        scale_x = self.max_scale
+        x1 = sx - image.anchor_x * scale_x
+        x2 = x1 + image.width * scale_x
+        y1 = sy - image.anchor_y * self.scale_y
+        y2 = y1 + image.height * self.scale_y
+
+        # (the properties hand back the buffer's memory afresh,
+        # and mark it as needing to be uploaded.)
+        vertices = np.ctypeslib.as_array(self.vertex_list.vertices).reshape(self.capacity, 4, 2)
+        vertices[:n, 0, 0] = x1
+        vertices[:n, 0, 1] = y1
+        vertices[:n, 1, 0] = x2
+        vertices[:n, 1, 1] = y1
+        vertices[:n, 2, 0] = x2
+        vertices[:n, 2, 1] = y2
+        vertices[:n, 3, 0] = x1
+        vertices[:n, 3, 1] = y2
+        # the spare quads have no area, so they draw nothing
+        vertices[n:] = 0
+
+        colors = np.ctypeslib.as_array(self.vertex_list.colors).reshape(self.capacity, 4, 4)
+        colors[:n, :, 3] = self.opacity.astype(np.uint8)[:, None]
 
     def draw(self):
         self.batch.draw()
@@ -0,0 +1,279 @@
+"""Where each frame's time goes, and an overlay to show it.
+
+Mark the parts of a frame the way drawstats does:
+
+    profiler.begin_frame()
+    profiler.section('flow')
+    scene.flow.draw()
+    profiler.section('scene')
+    scene.draw()
+    profiler.end_frame()
+
+(section() marks them for drawstats too), and add costs measured
+anywhere else with add(), or timing():
+
+    with profiler.timing('flow update'):
+        scene.flow.update(dt)
+
+A frame's time runs from one begin_frame() to the next, so it takes
+in the logic ticks and scheduled functions that run before the next
+frame's drawn; costs added between the two are counted against it.
+
+The last HISTORY frames are kept, for the Overlay to show.  Until
+enable() is called, all of this costs next to nothing.
+"""
+
+import contextlib
+import time
+
+import numpy as np
+import pyglet.graphics
+from pyglet import gl
+from pyglet.text import Label
+
+from . import drawstats
+
+
+# how many frames to keep
+HISTORY = 300
+
+enabled = False
+
+# seconds from the start of each frame to the start of the next,
+# in a ring; frames is how many have been recorded
+frame_times = np.zeros(HISTORY)
+frames = 0
+# cost name -> seconds spent on it in each frame, in the same ring
+costs = {}
+
+_index = 0
+_frame_start = None
+_section = None
+_section_start = 0.0
+
+
+def enable(on=True):
+    """Start (or with on=False, stop) profiling, from scratch."""
+    global enabled, frame_times, frames, costs, _index, _frame_start, _section
+    enabled = on
+    frame_times = np.zeros(HISTORY)
+    frames = _index = 0
+    costs = {}
+    _frame_start = _section = None
+
+
+def add(name, seconds):
+    """Count seconds against name, in this frame."""
+    if not enabled:
+        return
+    ring = costs.get(name)
+    if ring is None:
+        ring = costs[name] = np.zeros(HISTORY)
+    ring[_index] += seconds
+
+
+@contextlib.contextmanager
+def timing(name):
+    """Count the time spent in the with block against name."""
+    if not enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, time.perf_counter() - start)
+
+
+def _end_section(now):
+    global _section
+    if _section:
+        add(_section, now - _section_start)
+        _section = None
+
+
+def begin_frame():
+    """Start a new frame."""
+    global _index, frames, _frame_start
+    drawstats.begin_frame()
+    if not enabled:
+        return
+    now = time.perf_counter()
+    _end_section(now)
+    if _frame_start is not None:
+        frame_times[_index] = now - _frame_start
+        frames += 1
+        _index = frames % HISTORY
+        for ring in costs.values():
+            ring[_index] = 0.0
+    _frame_start = now
+
+
+def section(name):
+    """Count the time from now until the next section() (or end_frame()) against name."""
+    global _section, _section_start
+    drawstats.section(name)
+    if not enabled:
+        return
+    now = time.perf_counter()
+    _end_section(now)
+    _section = name
+    _section_start = now
+
+
+def end_frame():
+    """Stop counting against the current section."""
+    if enabled:
+        _end_section(time.perf_counter())
+
+
+def recorded():
+    """The indices of the whole frames recorded, oldest first."""
+    if frames < HISTORY:
+        return np.arange(frames)
+    # (all but the one in progress)
+    return (np.arange(1, HISTORY) + _index) % HISTORY
+
+
+class _BlendGroup(pyglet.graphics.Group):
+    def set_state(self):
+        gl.glEnable(gl.GL_BLEND)
+        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+
+    def unset_state(self):
+        gl.glDisable(gl.GL_BLEND)
+
+
+class Overlay:
+    """Shows the profile: a graph of the frame times, and a table.
+
+    The graph has a bar per frame, green if it made the frame
+    budget, yellow if it took up to twice that and red if longer,
+    with lines at one and two budgets.  The table has the frame
+    time percentiles; the mean and worst cost of each section; and
+    whatever counts update() is given.  It's laid out again only
+    every REFRESH seconds, since laying text out isn't cheap.
+    """
+    WIDTH = HISTORY
+    GRAPH_HEIGHT = 100
+    HEIGHT = 330
+    # the top of the graph, in seconds
+    GRAPH_SCALE = 0.05
+    REFRESH = 0.25
+
+    FONT = ['DejaVu Sans Mono', 'Consolas', 'Courier New', 'Courier']
+    COLORS = np.array([
+        (80, 220, 80),
+        (240, 220, 60),
+        (240, 60, 60),
+    ], dtype=np.uint8)
+
+    def __init__(self, x, y, budget=1 / 60):
+        """x and y are the bottom left corner; budget is the time a frame should take."""
+        self.x = x
+        self.y = y
+        self.budget = budget
+        self.batch = pyglet.graphics.Batch()
+        background = _BlendGroup(pyglet.graphics.OrderedGroup(0))
+        self.batch.add(
+            4, gl.GL_QUADS, background,
+            ('v2f/static', (
+                x - 5, y - 5,
+                x + self.WIDTH + 5, y - 5,
+                x + self.WIDTH + 5, y + self.HEIGHT,
+                x - 5, y + self.HEIGHT,
+            )),
+            ('c4B/static', (0, 0, 0, 160) * 4),
+        )
+        self.bars = self.batch.add(
+            HISTORY * 4, gl.GL_QUADS, pyglet.graphics.OrderedGroup(1),
+            'v2f/stream',
+            'c3B/stream',
+        )
+        lines = []
+        for budgets in (1, 2):
+            h = y + min(budgets * budget / self.GRAPH_SCALE, 1) * self.GRAPH_HEIGHT
+            lines += [x, h, x + self.WIDTH, h]
+        self.batch.add(
+            4, gl.GL_LINES, pyglet.graphics.OrderedGroup(2),
+            ('v2f/static', lines),
+            ('c3B/static', (255, 255, 255) * 4),
+        )
+        self.label = Label(
+            '',
+            x=x,
+            y=y + self.HEIGHT - 5,
+            width=self.WIDTH,
+            anchor_y='top',
+            multiline=True,
+            font_name=self.FONT,
+            font_size=9,
+            color=(255, 255, 255, 255),
+            batch=self.batch,
+            group=pyglet.graphics.OrderedGroup(2),
+        )
+        self.refreshed = 0.0
+
+    def update(self, counts=None):
+        """Show the profile as it is now.
+
+        counts is a dict of other things to show, like
+        {'actors': 25}.  Call this every frame.
+        """
+        self._update_graph()
+        now = time.perf_counter()
+        if now - self.refreshed >= self.REFRESH:
+            self.refreshed = now
+            self.label.text = self.text(counts or {})
+
+    def _update_graph(self):
+        order = recorded()
+        times = np.zeros(HISTORY)
+        # newest at the right
+        times[HISTORY - len(order):] = frame_times[order]
+        heights = np.minimum(times / self.GRAPH_SCALE, 1.0) * self.GRAPH_HEIGHT
+        x1 = self.x + np.arange(HISTORY, dtype=float)
+        x2 = x1 + 1
+        y1 = np.full(HISTORY, float(self.y))
+        y2 = y1 + heights
+
+        vertices = np.ctypeslib.as_array(self.bars.vertices).reshape(HISTORY, 4, 2)
+        vertices[:, 0, 0] = x1
+        vertices[:, 0, 1] = y1
+        vertices[:, 1, 0] = x2
+        vertices[:, 1, 1] = y1
+        vertices[:, 2, 0] = x2
+        vertices[:, 2, 1] = y2
+        vertices[:, 3, 0] = x1
+        vertices[:, 3, 1] = y2
+
+        level = (times > self.budget).astype(int) + (times > 2 * self.budget)
+        colors = np.ctypeslib.as_array(self.bars.colors).reshape(HISTORY, 4, 3)
+        colors[:] = self.COLORS[level][:, None, :]
+
+    def text(self, counts):
+        order = recorded()
+        if not len(order):
+            return 'no frames yet'
+        times = frame_times[order] * 1000
+        p50, p95, p99 = np.percentile(times, (50, 95, 99))
+        lines = [
+            f'{len(order)} frames, ms',
+            f'p50 {p50:.1f}  p95 {p95:.1f}  p99 {p99:.1f}  max {times.max():.1f}',
+            '',
+            f"{'':12}{'mean':>8}{'max':>8}",
+        ]
+        for name, ring in costs.items():
+            spent = ring[order] * 1000
+            lines.append(f'{name:12}{spent.mean():8.2f}{spent.max():8.2f}')
+        lines.append('')
+        for name, count in counts.items():
+            lines.append(f'{name:16}{count:8}')
+        return '\n'.join(lines)
+
+    def draw(self):
+        self.batch.draw()
+
+    def delete(self):
+        self.label.delete()
+        self.batch = None
@@ -2,12 +2,14 @@ import math
 import random
 import copy
 
+import numpy as np
 from pyglet import gl
 from pyglet import clock
 import pyglet.resource
 import pyglet.graphics
 import pyglet.sprite
 
+from . import atlas
 from .coords import map_to_screen
 from .vec2d import Vec2D
 
@@ -15,21 +17,55 @@ from .vec2d import Vec2D
 class Scene:
     def __init__(self):
         self.objects = set()
+        # actor -> its position at the last logic tick, for
+        # every actor that's moved since the tick before that
+        self.moving = {}
+        # actors that have stopped since the last draw
+        self.stopped = []
         self.batch = pyglet.graphics.Batch()
+        self.depth = DepthLayer()
         self.clock = clock
 
         Static.load()
         Bomb.load()
         Player.load()
         Explosion.load()
-        Particle.load()
+        ParticleSystem.load()
+        self.particles = ParticleSystem(self)
 
     def clear(self):
         self.objects.clear()
+        self.moving.clear()
+        self.stopped.clear()
+        self.particles.delete()
         self.batch = pyglet.graphics.Batch()
-
-    def draw(self):
-        self.batch.invalidate()
+        self.depth = DepthLayer()
+        self.particles = ParticleSystem(self)
+
+    def begin_tick(self):
+        """Call before every logic tick.
+
+        Where the actors are now is where draw() interpolates
+        from, until the next tick.  This doesn't touch the sprites;
+        only draw() does that.
+        """
+        moving = self.moving
+        for actor, previous in list(moving.items()):
+            position = actor.position
+            if position == previous:
+                del moving[actor]
+                self.stopped.append(actor)
+            else:
+                moving[actor] = position
+
+    def draw(self, alpha=1.0):
+        """Draw the scene, alpha of the way from the last logic tick to this one."""
+        for actor in self.stopped:
+            if actor.scene:
+                actor.place(actor.position)
+        self.stopped.clear()
+        for actor, previous in self.moving.items():
+            actor.place(previous + (actor.position - previous) * alpha)
         self.batch.draw()
 
     def spawn_static(self, position, sprite):
@@ -57,31 +93,7 @@ class Scene:
             )
 
     def spawn_particles(self, num, sprite_name, position, zrange, speed, vzrange, va, drag=1.0, gravity=-100):
-        for _ in range(num):
-            # Choose a random angle anywhere in the circle
-            angle = random.uniform(0, math.tau)
-            # Choose a random radius using a controllable distribution
-            radius = math.sqrt(random.uniform(0, 1))
-
-            # Convert angle/radius to a cartesian vector
-            vx = speed * radius * math.sin(angle)
-            vy = speed * radius * math.cos(angle)
-            z = random.uniform(*zrange)
-            vz = random.uniform(*vzrange)
-            if random.randint(0, 1) == 1:
-                va = -va
-
-            Particle(
-                self,
-                position,
-                sprite_name,
-                (vx, vy),
-                z,
-                vz,
-                va,
-                drag,
-                gravity
-            )
+        self.particles.spawn(num, sprite_name, position, zrange, speed, vzrange, va, drag, gravity)
 
 
 class AnchoredImg:
@@ -102,7 +114,7 @@ class AnchoredImg:
             img.anchor_y = self.anchor_y
 
     def load(self):
-        img = pyglet.resource.image(f'{self.image_filename}.png')
+        img = atlas.image(f'{self.image_filename}.png')
         img = copy.copy(img)  # resources are cached - get a unique copy
         self._set_anchor(img)
         return img
@@ -128,7 +140,7 @@ class ImageSequence(AnchoredImg):
             self.image_filename = flip_x_from
 
     def load(self):
-        img = pyglet.resource.image(f'{self.image_filename}.png')
+        img = atlas.image(f'{self.image_filename}.png')
         grid = pyglet.image.ImageGrid(
             img,
             rows=1,
@@ -149,12 +161,140 @@ class ImageSequence(AnchoredImg):
         return anim
 
 
-class ActorGroup(pyglet.graphics.OrderedGroup):
-    def __hash__(self):
-        return id(self)
+def depth_key(position, z):
+    """Where something at position, z high, sorts in a DepthLayer.
+
+    Rows further down the map draw later.  Something between two
+    rows (because it's moving) draws after the row above it and
+    before the row below.  Within a row, things on the ground draw
+    first, then things at the player's height, then anything
+    higher up.
+    """
+    y = position[1]
+    row = math.floor(y)
+    return 2 * row + (y != row), min(math.ceil(z), 2)
+
+
+class DepthLayer:
+    """Sorts actors back to front.
+
+    There's one group per depth_key(), made when it's first
+    wanted, rather than one per actor.  The actors at the same
+    depth with the same texture share a vertex domain, so they're
+    drawn together, and the batch only has to re-sort its groups
+    when a new depth turns up, not every frame.  An actor that
+    moves to a different depth is migrated to that depth's group.
+
+    Every sprite in the layer is drawn with a LayerSpriteGroup,
+    which only binds its texture if it isn't bound already; with
+    the atlas, the depths are nearly all on the same page, so
+    drawing them takes one bind rather than one per depth.
+    """
+
+    def __init__(self):
+        # the texture bound last, as (target, id); forgotten
+        # whenever the layer starts drawing
+        self.bound = None
+        self.root = LayerGroup(self)
+        self.groups = {}
+        # (pyglet's SpriteGroup hashes its parent by id, so
+        # sprites only share a domain if their parents are the
+        # very same group object: these are made once per key.)
+        self.sprite_groups = {}
+        self.attachment_groups = {}
+        self.particle_groups = {}
+
+    def group(self, key):
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = pyglet.graphics.OrderedGroup(key, self.root)
+        return group
+
+    def sprites(self, key):
+        """The group for actors' sprites at depth key."""
+        group = self.sprite_groups.get(key)
+        if group is None:
+            group = self.sprite_groups[key] = pyglet.graphics.OrderedGroup(0, self.group(key))
+        return group
+
+    def attachments(self, key):
+        """The group for sprites attached to actors at depth key."""
+        group = self.attachment_groups.get(key)
+        if group is None:
+            group = self.attachment_groups[key] = pyglet.graphics.OrderedGroup(1, self.group(key))
+        return group
+
+    def particles(self, key):
+        """The group for particles at depth key, drawn after its actors."""
+        group = self.particle_groups.get(key)
+        if group is None:
+            group = self.particle_groups[key] = pyglet.graphics.OrderedGroup(2, self.group(key))
+        return group
+
+
+class LayerGroup(pyglet.graphics.Group):
+    """The root of a DepthLayer's groups."""
+
+    def __init__(self, layer):
+        super().__init__()
+        self.layer = layer
+
+    def set_state(self):
+        # (whatever was drawn since last time may have bound anything)
+        self.layer.bound = None
+
+
+class LayerSpriteGroup(pyglet.sprite.SpriteGroup):
+    """A SpriteGroup that doesn't bind its texture if the layer just did.
+
+    Blends the way a Sprite does by default.
+    """
+
+    def __init__(self, layer, texture, parent):
+        super().__init__(texture, gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA, parent)
+        self.layer = layer
+
+    def set_state(self):
+        texture = self.texture
+        gl.glEnable(texture.target)
+        bound = texture.target, texture.id
+        if self.layer.bound != bound:
+            gl.glBindTexture(texture.target, texture.id)
+            self.layer.bound = bound
+        gl.glPushAttrib(gl.GL_COLOR_BUFFER_BIT)
+        gl.glEnable(gl.GL_BLEND)
+        gl.glBlendFunc(self.blend_src, self.blend_dest)
+
+
+class LayerSprite(pyglet.sprite.Sprite):
+    """A Sprite in a DepthLayer, drawn with a LayerSpriteGroup."""
+
+    def __init__(self, layer, img, x=0, y=0, group=None, batch=None):
+        self.layer = layer
+        # (made outside the batch, so its vertex list only
+        # goes in once it's got the right group)
+        super().__init__(img, x, y)
+        self._group = LayerSpriteGroup(layer, self._texture, group)
+        self.batch = batch
+
+    @property
+    def group(self):
+        return self._group.parent
+
+    @group.setter
+    def group(self, group):
+        if self._group.parent is group:
+            return
+        self._group = LayerSpriteGroup(self.layer, self._texture, group)
+        self._batch.migrate(self._vertex_list, gl.GL_QUADS, self._group, self._batch)
 
-    def __eq__(self, ano):
-        return self is ano
+    def _set_texture(self, texture):
+        new = texture.id != self._texture.id
+        super()._set_texture(texture)
+        if new:
+            # (pyglet's put it in a plain SpriteGroup)
+            self._group = LayerSpriteGroup(self.layer, texture, self._group.parent)
+            self._batch.migrate(self._vertex_list, gl.GL_QUADS, self._group, self._batch)
 
 
 class AttachmentGroup(pyglet.graphics.Group):
@@ -188,7 +328,7 @@ class Actor:
             if isinstance(spr, AnchoredImg):
                 s = cls.sprites[spr.name] = spr.load()
             else:
-                s = cls.sprites[spr] = pyglet.resource.image(f'{spr}.png')
+                s = cls.sprites[spr] = atlas.image(f'{spr}.png')
                 s.anchor_x = s.width // 2
                 s.anchor_y = 10
 
@@ -196,26 +336,23 @@ class Actor:
         """Do not use this constructor - use methods of Scene."""
         self._pos = position
         self._z = self.DEFAULT_Z
-
-        self.group = ActorGroup(self.z_order())
+        self.depth = depth_key(position, self._z)
 
         x, y = map_to_screen(position)
-        self.sprite = pyglet.sprite.Sprite(
+        self.sprite = LayerSprite(
+            scene.depth,
             self.sprites[sprite_name],
             x, y,
-            group=pyglet.graphics.OrderedGroup(0, self.group),
+            group=scene.depth.sprites(self.depth),
             batch=scene.batch,
         )
-        self.attach_group = AttachmentGroup(self.sprite, self.group)
+        self.attach_group = AttachmentGroup(self.sprite, scene.depth.attachments(self.depth))
         self.anim = sprite_name
 
         self.scene = scene
         self.scene.objects.add(self)
         self.attached = []
 
-    def z_order(self):
-        return (self._pos[1], self._z)
-
     def play(self, name):
         if not self.scene:
             return
@@ -229,12 +366,36 @@ class Actor:
 
     @position.setter
     def position(self, v):
-        x, y = map_to_screen(v)
+        """Move to v.
+
+        The sprite moves (and changes depth) when the scene's
+        drawn, so moving every logic tick costs next to nothing.
+        """
+        if self.scene:
+            moving = self.scene.moving
+            if self not in moving:
+                moving[self] = self._pos
         self._pos = v
-        if not self.scene:
-            return
+
+    def set_depth(self, depth):
+        """Move to another depth in the scene's DepthLayer."""
+        self.depth = depth
+        layer = self.scene.depth
+        self.sprite.group = layer.sprites(depth)
+        self.attach_group = AttachmentGroup(self.sprite, layer.attachments(depth))
+        for spr in self.attached:
+            spr.group = self.attach_group
+
+    def place(self, position):
+        """Put the sprite at position (which needn't be where we are).
+
+        It goes at the depth for where we are, though.
+        """
+        depth = depth_key(self._pos, self._z)
+        if depth != self.depth:
+            self.set_depth(depth)
+        x, y = map_to_screen(position)
         self.sprite.position = x, y + self._z
-        self.group.order = self.z_order()
 
     @property
     def z(self):
@@ -249,6 +410,7 @@ class Actor:
         if not self.scene:
             return
         self.scene.objects.remove(self)
+        self.scene.moving.pop(self, None)
         self.sprite.delete()
         for spr in self.attached:
             spr.delete()
@@ -256,7 +418,8 @@ class Actor:
 
     def attach(self, img, x, y):
         """Attach another sprite on top of this."""
-        sprite = pyglet.sprite.Sprite(
+        sprite = LayerSprite(
+            self.scene.depth,
             img,
             x=x,
             y=y,
@@ -466,8 +629,19 @@ class Static(Actor):
     ]
 
 
-class Particle(Actor):
-    """3D-ish particle effects."""
+class ParticleSystem:
+    """
+    3D-ish particle effects: leaves, twigs, snowflakes and
+    flying bombs.
+
+    Every particle in the scene lives in one set of NumPy arrays,
+    and they're all updated by one clock callback, which is only
+    scheduled while there are particles.  Particles sort among
+    the actors by depth_key(), as actors do: each kind of particle
+    at each depth is drawn as quads in one vertex list, in that
+    depth's group.  A depth's list goes once it has no particles
+    of that kind.
+    """
     SPRITES = [
         AnchoredImg('timed-bomb', anchor_x=21, anchor_y=21),
         AnchoredImg('freeze-bomb', anchor_x=21, anchor_y=21),
@@ -478,44 +652,178 @@ class Particle(Actor):
         'snowflake',
     ]
 
-    def __init__(
-            self,
-            scene,
-            position,
-            sprite_name,
-            vxy,
-            z,
-            vz,
-            va,
-            drag=1.0,
-            gravity=-100):
-        super().__init__(scene, position, sprite_name)
-        self.vxy = Vec2D(vxy)
-        self.sprite.rotation = random.randrange(360)
-        self.z = z
-        self.vz = vz
-        self.va = va
-        self.drag = drag
-        self.gravity = gravity
-        self.scene.clock.schedule(self.update)
+    load = classmethod(Actor.load.__func__)
 
-    def update(self, dt):
-        self.vz = self.vz * self.drag ** dt + self.gravity * dt
-        self.z += self.vz * dt
-
-        if self.z < 0:
-            if 'bomb' in self.anim:
-                self.scene.spawn_explosion(
-                    self.position,
-                    'freeze' in self.anim
-                )
-            self.delete()
-            return
+    def __init__(self, scene):
+        self.scene = scene
+        self.random = np.random.default_rng()
+        self.names = [
+            spr.name if isinstance(spr, AnchoredImg) else spr
+            for spr in self.SPRITES
+        ]
+        self.kinds = {name: i for i, name in enumerate(self.names)}
+        # each kind's image, as (left, bottom, right, top) around its anchor
+        self.extents = np.array([
+            (-image.anchor_x, -image.anchor_y, image.width - image.anchor_x, image.height - image.anchor_y)
+            for image in (self.sprites[name] for name in self.names)
+        ], dtype=float)
+        # (kind, depth key) -> LayerSpriteGroup
+        self.groups = {}
+        # (kind, depth key) -> [vertex list, how many quads it has room for]
+        self.vertex_lists = {}
+        self.scheduled = False
+
+        # the particles.  positions are in map coordinates.
+        self.kind = np.empty(0, dtype=int)
+        self.position = np.empty((0, 2))
+        self.velocity = np.empty((0, 2))
+        self.z = np.empty(0)
+        self.vz = np.empty(0)
+        self.va = np.empty(0)
+        self.rotation = np.empty(0)
+        self.drag = np.empty(0)
+        self.gravity = np.empty(0)
+
+    def __len__(self):
+        return len(self.kind)
+
+    def spawn(self, num, sprite_name, position, zrange, speed, vzrange, va, drag=1.0, gravity=-100):
+        random = self.random
+        # Choose a random angle anywhere in the circle
+        angle = random.uniform(0, math.tau, num)
+        # Choose a random radius using a controllable distribution
+        radius = np.sqrt(random.uniform(0, 1, num))
+
+        # Convert angle/radius to a cartesian vector
+        velocity = speed * radius[:, None] * np.column_stack((np.sin(angle), np.cos(angle)))
+
+        self._append(
+            kind=np.full(num, self.kinds[sprite_name]),
+            position=np.tile(np.asarray(position, dtype=float), (num, 1)),
+            velocity=velocity,
+            z=random.uniform(*zrange, num),
+            vz=random.uniform(*vzrange, num),
+            va=va * random.choice((-1, 1), num),
+            rotation=random.integers(0, 360, num).astype(float),
+            drag=np.full(num, float(drag)),
+            gravity=np.full(num, float(gravity)),
+        )
+        if not self.scheduled:
+            self.scene.clock.schedule(self.update)
+            self.scheduled = True
 
-        self.vxy *= self.drag ** dt
-        self.position += self.vxy * dt
-        self.sprite.rotation += self.va * dt
+    def _append(self, **arrays):
+        for name, a in arrays.items():
+            setattr(self, name, np.concatenate((getattr(self, name), a)))
+
+    def _keep(self, keep):
+        for name in ('kind', 'position', 'velocity', 'z', 'vz', 'va', 'rotation', 'drag', 'gravity'):
+            setattr(self, name, getattr(self, name)[keep])
+
+    def update(self, dt):
+        drag = self.drag ** dt
+        self.vz = self.vz * drag + self.gravity * dt
+        self.z = self.z + self.vz * dt
+
+        # particles that hit the ground are gone; bombs go off
+        landed = self.z < 0
+        landed_bombs = [
+            (Vec2D(*self.position[i]), self.names[self.kind[i]])
+            for i in np.nonzero(landed)[0]
+            if 'bomb' in self.names[self.kind[i]]
+        ]
+        if landed.any():
+            keep = ~landed
+            self._keep(keep)
+            drag = drag[keep]
+
+        self.velocity *= drag[:, None]
+        self.position += self.velocity * dt
+        self.rotation += self.va * dt
+
+        # (after the update: freeze explosions spawn particles of their own)
+        for position, name in landed_bombs:
+            self.scene.spawn_explosion(position, 'freeze' in name)
+
+        if not len(self):
+            self.scene.clock.unschedule(self.update)
+            self.scheduled = False
+        self._write_vertices()
+
+    def _reserve(self, kind, key, n):
+        """The vertex list for kind at depth key, with room for n particles."""
+        entry = self.vertex_lists.get((kind, key))
+        if entry and (n <= entry[1]):
+            return entry[0]
+        capacity = max(n, entry[1] * 2 if entry else 0, 4)
+        if entry:
+            entry[0].delete()
+        texture = self.sprites[self.names[kind]].get_texture()
+        group = self.groups.get((kind, key))
+        if group is None:
+            layer = self.scene.depth
+            group = self.groups[kind, key] = LayerSpriteGroup(layer, texture, layer.particles(key))
+        vertex_list = self.scene.batch.add(
+            capacity * 4,
+            gl.GL_QUADS,
+            group,
+            'v2f/stream',
+            ('c4B/static', (255,) * (capacity * 16)),
+            ('t3f/static', texture.tex_coords * capacity),
+        )
+        self.vertex_lists[kind, key] = [vertex_list, capacity]
+        return vertex_list
+
+    def _write_vertices(self):
+        """Write every particle into the vertex list for its kind and depth, as a rotated quad like a Sprite's."""
+        sx, sy = map_to_screen(self.position.T)
+        sy = sy + self.z
+        r = -np.radians(self.rotation)
+        c = np.cos(r)[:, None]
+        s = np.sin(r)[:, None]
+        # the corners of each particle's image, around its anchor
+        extents = self.extents[self.kind]
+        cx = extents[:, [0, 2, 2, 0]]
+        cy = extents[:, [1, 1, 3, 3]]
+        quads = np.empty((len(self), 4, 2))
+        quads[:, :, 0] = cx * c - cy * s + sx[:, None]
+        quads[:, :, 1] = cx * s + cy * c + sy[:, None]
+
+        # depth_key() for every particle, as (row, height); then
+        # sort them by kind and depth, and write each run of them
+        # into its own vertex list
+        y = self.position[:, 1]
+        row = np.floor(y)
+        rows = (2 * row + (y != row)).astype(int)
+        heights = np.minimum(np.ceil(self.z), 2).astype(int)
+        kinds = len(self.names)
+        bucket = ((rows - rows.min(initial=0)) * 3 + heights) * kinds + self.kind
+        order = np.argsort(bucket, kind='stable')
+        bucket = bucket[order]
+        starts = np.flatnonzero(np.diff(bucket, prepend=-1))
+        ends = np.append(starts[1:], len(bucket))
+
+        drawn = set()
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            first = order[start]
+            kind = int(self.kind[first])
+            key = int(rows[first]), int(heights[first])
+            drawn.add((kind, key))
+            n = end - start
+            vertex_list = self._reserve(kind, key, n)
+            vertices = np.ctypeslib.as_array(vertex_list.vertices).reshape(-1, 4, 2)
+            vertices[:n] = quads[order[start:end]]
+            # the spare quads have no area, so they draw nothing
+            vertices[n:] = 0
+
+        for bucket in list(self.vertex_lists):
+            if bucket not in drawn:
+                self.vertex_lists.pop(bucket)[0].delete()
 
     def delete(self):
-        self.scene.clock.unschedule(self.update)
-        super().delete()
+        if self.scheduled:
+            self.scene.clock.unschedule(self.update)
+            self.scheduled = False
+        for vertex_list, capacity in self.vertex_lists.values():
+            vertex_list.delete()
+        self.vertex_lists = {}
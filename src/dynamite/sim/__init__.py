@@ -0,0 +1,28 @@
+"""The rules of Dynamite Valley, without a window, audio or GL.
+
+Load a level with load_level() and drive it with Game.step() (or
+Game.timer() with real elapsed time).  Pass a scene and a Hooks
+subclass to load_level() to show it on screen; leave them out
+and the simulation runs headless, as fast as Python allows.
+"""
+
+from .constants import *
+from .clock import Clock, Timer
+from .hooks import Hooks, NullScene, NullActor
+from .level import Game, Level, load_level, level_names, LEGEND_NAMESPACE, LEVEL_DIR
+from .log import channel, configure, recent, set_level, set_logfile, DEBUG, INFO, WARNING, OFF
+from .tiles import (
+    OCCUPIABLE_BY_PLAYER, OCCUPIABLE_BY_BOMB,
+    MapTile, MapOOB, MapWater, MapMovingWater,
+    MapWaterCurrentUp, MapWaterCurrentLeft,
+    MapWaterCurrentRight, MapWaterCurrentDown,
+    MapGrass, LandSpawn, MapScenery,
+)
+from .entities import (
+    Animator, Entity, Claim, Dam, Player, Orientation,
+    BlastPattern, FloatingPlatform, Log, DrowningPC,
+    Bomb, TimedBomb, FreezeBomb, ContactBomb, RemoteControlBomb,
+    Scenery, Dispenser, Bush,
+)
+from . import keys
+from . import world
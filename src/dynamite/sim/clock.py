@@ -0,0 +1,446 @@
+import heapq
+import math
+
+from .log import channel
+
+
+_log = channel('clock')
+
+
+class Clock:
+    """
+    A discrete clock based on an external time source.
+    Used, for example, as the "game logic" clock--you feed
+    in time, and it tells you when it's time to calculate
+    the next logical positions.
+
+    (Want to pause?  Just temporarily stop feeding in time.)
+    """
+    def __init__(self, name, interval, callback=None, *, delay=0):
+        """
+        interval is how often to tick expressed in seconds.
+        fractional seconds are allowed (as floats).
+
+        delay is how long to wait before the first tick, if not the
+        same as interval.
+
+        examples:
+        Clock(interval=0.25)
+          Ticks four times a second.
+
+        Clock(interval=0.5, delay=0.8)
+          Ticks twice a second.  The first tick is at 0.8 seconds,
+          the second at 1.3 seconds, the third at 1.8 seconds, etc.
+
+        Clocks are not automatic.  You must explicitly call advance()
+        to tell them that time has elapsed.
+
+        Note that Clock doesn't actually care what units the times
+        are expressed in.  I called 'em seconds but they could just as
+        easily be anything else (milliseconds, years, frames).
+        """
+        assert isinstance(interval, (int, float)) and interval, "must supply a valid (nonzero) interval!  got " + repr(interval)
+        self.counter = self.elapsed = self.next = 0
+        self.name = name
+        self.interval = interval
+        self.callback = callback
+        # initial delay
+        self.delay = delay
+        self.reset()
+
+    def __repr__(self):
+        return f"Clock({self.name}, {self.counter}, {self.elapsed} / {self.next})"
+
+    # dt is fractional seconds e.g. 0.001357
+    def advance(self, dt):
+        if self.paused:
+            _log.debug and _log.debug("{} {} PAUSED", self, dt)
+            return
+
+        self.accumulator += dt
+        self.elapsed += dt
+        callbacks = 0
+        while self.accumulator >= self.next:
+            self.counter += 1
+            callbacks += 1
+            self.accumulator -= self.next
+            self.next = self.interval
+            self._tick()
+        return callbacks
+
+    def _tick(self):
+        self.ticking = True
+        # no timer has had its turn yet
+        self.turn = 0
+        self.work = []
+        try:
+            if self.callback:
+                self.callback()
+            self._run_timers()
+        finally:
+            self.ticking = False
+
+    def next_due(self):
+        """
+        The next tick on which anything happens, or None if nothing
+        is waiting.
+
+        If there's a callback, or a timer with an on_tick callback,
+        that's always the very next tick.
+        """
+        if self.callback or self.tickers:
+            return self.counter + 1
+        return self.wheel.next_due()
+
+    def run(self, ticks):
+        """
+        Advance by ticks whole ticks, skipping straight over the
+        ones where nothing would happen.
+
+        This gives exactly the same results as calling advance()
+        with interval, ticks times; it's just faster when the clock
+        is mostly idle.  Stops early if the clock gets paused.
+        Returns the number of ticks it ran.
+        """
+        start = self.counter
+        target = start + ticks
+        while self.counter < target and not self.paused:
+            if not (self.callback or self.tickers):
+                due = self.wheel.next_due()
+                if (due is None) or (due > target):
+                    due = target
+                if due > self.counter + 1:
+                    self.counter = due - 1
+                    self.wheel.skip_to(self.counter)
+            self.counter += 1
+            self._tick()
+        self.next = self.interval
+        ran = self.counter - start
+        self.elapsed += ran * self.interval
+        return ran
+
+    def _run_timers(self):
+        """
+        Give every running timer its tick.
+
+        Only two kinds of timer need looking at: the ones that
+        are due this tick, and the ones with an on_tick callback
+        (which want to hear about every tick).  Everything else
+        sits in the wheel untouched until it's due.
+
+        They're run in the order they were started (by serial), just
+        as the old list of timers was walked; turn is the serial of
+        the one whose turn it is.  A timer started while we're doing
+        this counts this tick too: it has the newest serial, so it's
+        run at the end.  One unpaused before its turn comes is run
+        in its turn; one unpaused after has missed this tick.
+        """
+        work = self.work
+        work.extend((t.serial, t) for t in self.tickers)
+        due = self.wheel.collect()
+        if due:
+            work.extend((t.serial, t) for t in due)
+        heapq.heapify(work)
+
+        last = None
+        while work:
+            serial, t = heapq.heappop(work)
+            # a ticker that's also due shows up twice; and a
+            # timer restarted since it was queued has a new serial
+            if (t is last) or (serial != t.serial):
+                continue
+            last = t
+            self.turn = serial
+            t._tick()
+        self.work = None
+
+    def schedule(self, timer, due):
+        """
+        Arrange for timer to finish on tick due.
+        (Timer does this for itself; you shouldn't need to.)
+        """
+        if self.ticking and (timer.serial > self.turn) and (due <= self.counter or timer.on_tick):
+            # it wants this tick, and its turn hasn't come yet
+            heapq.heappush(self.work, (timer.serial, timer))
+            if due <= self.counter:
+                timer.due = due
+                return
+        self.wheel.insert(timer, due)
+
+    def unschedule(self, timer):
+        self.wheel.remove(timer)
+
+    @property
+    def timers(self):
+        """All the timers currently waiting on this clock, in no particular order."""
+        return list(self.wheel)
+
+    def reset(self):
+        self.counter = 0
+        self.elapsed = self.accumulator = 0.0
+        self.next = self.delay or self.interval
+        self.paused = False
+        self.ticking = False
+        # while ticking: the serial of the timer whose turn it is,
+        # and a heap of (serial, timer) still to be run
+        self.turn = 0
+        self.work = None
+        self.wheel = TimingWheel()
+        # timers with an on_tick callback, in the order they were started.
+        # (a dict rather than a set so it stays ordered.)
+        self.tickers = {}
+        self.timer_serial = 0
+
+
+class TimingWheel:
+    """
+    A hierarchical timing wheel: timers filed by the tick they're due on.
+
+    The first wheel has a slot per tick for the next 256 ticks.  The
+    next one has a slot per 256 ticks, and so on; as time passes,
+    slots from the outer wheels get poured into the inner ones.
+    Inserting and removing a timer is O(1), and each tick we only
+    look at the timers that are actually due.
+
+    Each wheel is a dict of slot index -> set, holding only the
+    slots in use, so copying a wheel (for a replay keyframe, say)
+    is cheap.
+    """
+    SLOT_BITS = 8
+    SLOTS = 1 << SLOT_BITS
+    MASK = SLOTS - 1
+    LEVELS = 3
+
+    def __init__(self):
+        # the last tick we collected
+        self.now = 0
+        self.wheels = [{} for _ in range(self.LEVELS)]
+        # for anything more than SLOTS ** LEVELS ticks away
+        self.overflow = set()
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for wheel in self.wheels:
+            for slot in wheel.values():
+                yield from slot
+        yield from self.overflow
+
+    def _slot_for(self, due):
+        delta = due - self.now
+        shift = 0
+        for wheel in self.wheels:
+            if delta < (self.SLOTS << shift):
+                index = (due >> shift) & self.MASK
+                slot = wheel.get(index)
+                if slot is None:
+                    slot = wheel[index] = set()
+                return slot
+            shift += self.SLOT_BITS
+        return self.overflow
+
+    def insert(self, timer, due):
+        timer.due = due
+        slot = timer.slot = self._slot_for(due)
+        slot.add(timer)
+        self.count += 1
+
+    def remove(self, timer):
+        slot = timer.slot
+        if slot is not None:
+            slot.discard(timer)
+            timer.slot = None
+            self.count -= 1
+
+    def _cascade(self, timers):
+        for timer in timers:
+            timer.slot = slot = self._slot_for(timer.due)
+            slot.add(timer)
+
+    def next_due(self):
+        """The tick the next timer is due on, or None if it's empty."""
+        if not self.count:
+            return None
+        now = self.now
+        soonest = math.inf
+        wheel = self.wheels[0]
+        for delta in range(1, self.SLOTS):
+            if wheel.get((now + delta) & self.MASK):
+                soonest = now + delta
+                break
+        # a timer in an outer wheel may be due sooner still.
+        # the first full slot after the current one holds
+        # that wheel's soonest timer.
+        shift = self.SLOT_BITS
+        for wheel in self.wheels[1:]:
+            block = now >> shift
+            for delta in range(1, self.SLOTS + 1):
+                if ((block + delta) << shift) >= soonest:
+                    break
+                slot = wheel.get((block + delta) & self.MASK)
+                if slot:
+                    soonest = min(soonest, min(t.due for t in slot))
+                    break
+            shift += self.SLOT_BITS
+        if self.overflow:
+            soonest = min(soonest, min(t.due for t in self.overflow))
+        return soonest
+
+    def skip_to(self, tick):
+        """
+        Jump straight to tick, which must be before next_due().
+        """
+        now = self.now
+        self.now = tick
+        if (now >> self.SLOT_BITS) != (tick >> self.SLOT_BITS):
+            # we've passed the points where outer slots would
+            # have been poured in.  just file everything again.
+            timers = list(self)
+            self.__init__()
+            self.now = tick
+            for timer in timers:
+                self.insert(timer, timer.due)
+
+    def collect(self):
+        """Move on to the next tick, and return the timers due on it."""
+        self.now = now = self.now + 1
+        if not (now & self.MASK):
+            shift = self.SLOT_BITS
+            for wheel in self.wheels[1:]:
+                index = (now >> shift) & self.MASK
+                self._cascade(wheel.pop(index, ()))
+                if index:
+                    break
+                shift += self.SLOT_BITS
+            else:
+                overflow = self.overflow
+                self.overflow = set()
+                self._cascade(overflow)
+
+        due = self.wheels[0].pop(now & self.MASK, None)
+        if not due:
+            return None
+        for timer in due:
+            timer.slot = None
+        self.count -= len(due)
+        return due
+
+
+class Timer:
+    """
+    Calls end_callback after interval ticks of clock.
+    If you pass on_tick, that gets called on every tick as well.
+
+    A timer started while its clock is in the middle of a tick
+    counts that tick, so a one-tick timer started from another
+    timer's callback goes off straight away.  Within a tick, a
+    timer's elapsed only counts the tick once its turn has come
+    (see Clock._run_timers).
+    """
+    def __init__(self, name, clock, interval, end_callback=None, on_tick=None):
+        self.name = name
+        self.clock = clock
+        self.interval = interval
+        self.callback = end_callback
+        self.on_tick = on_tick
+        self.slot = None
+        self.reset()
+
+    def __repr__(self):
+        return f"Timer({self.name}, {self.clock}, {self.interval}, callback={self.callback}, on_tick={self.on_tick})"
+
+    def reset(self):
+        clock = self.clock
+        # if we're still running, we're filed under the old due tick
+        clock.unschedule(self)
+        clock.timer_serial += 1
+        self.serial = clock.timer_serial
+        self.slot = self.due = None
+        self.finished = False
+        self.paused = False
+        self._paused_at = None
+        self._elapsed = 0
+        self._start()
+
+    def _turn_to_come(self):
+        """Is the clock in the middle of a tick, and our turn in it still to come?"""
+        clock = self.clock
+        return clock.ticking and (self.serial > clock.turn)
+
+    def _start(self):
+        # elapsed is worked out from the clock's counter:
+        # it's _elapsed plus the ticks since _base_tick,
+        # less this one if our turn in it hasn't come yet.
+        clock = self.clock
+        counter = clock.counter
+        if self._turn_to_come():
+            # we'll get the tick that's happening now
+            counter -= 1
+        self._base_tick = counter
+        if self.on_tick:
+            clock.tickers[self] = None
+        ticks = max(1, math.ceil(self.interval - self._elapsed))
+        clock.schedule(self, counter + ticks)
+
+    def _stop(self):
+        self._elapsed = self.elapsed
+        self._base_tick = None
+        self.clock.unschedule(self)
+        self.clock.tickers.pop(self, None)
+
+    @property
+    def running(self):
+        return self._base_tick is not None
+
+    @property
+    def elapsed(self):
+        if self._base_tick is None:
+            return self._elapsed
+        elapsed = self._elapsed + self.clock.counter - self._base_tick
+        if self._turn_to_come():
+            elapsed -= 1
+        return min(elapsed, self.interval)
+
+    def _tick(self):
+        if not self.running:
+            # cancelled or paused earlier this tick
+            return
+        if self.on_tick:
+            self.on_tick()
+        if self.due > self.clock.counter:
+            return
+        self._stop()
+        self._elapsed = self.interval
+        self.finished = True
+        if self.callback:
+            self.callback()
+
+    def cancel(self):
+        if self.running:
+            self._stop()
+        # (so unpause() doesn't start it again)
+        self._paused_at = None
+        # else:
+        #     print(f"[{game.logics.counter:05} warning: couldn't find timer for {self.name}")
+
+    def pause(self):
+        if self.paused or self.finished:
+            return
+        self.paused = True
+        if self.running:
+            self._stop()
+            self._paused_at = self.clock.counter
+
+    def unpause(self):
+        if not self.paused:
+            return
+        self.paused = False
+        if self._paused_at is not None:
+            self._start()
+            self._paused_at = None
+
+    @property
+    def ratio(self):
+        return self.elapsed / self.interval
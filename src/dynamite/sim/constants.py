@@ -0,0 +1,24 @@
+# please ensure all the other intervals
+# are evenly divisible into this interval
+logics_per_second = 120
+logic_interval = 1 / logics_per_second
+
+typematic_start = 0.15
+typematic_interval = 1/4
+typematic_delay = 1
+
+timed_bomb_interval = 5 * logics_per_second
+exploding_bomb_interval = (1/10) * logics_per_second
+contact_bomb_detonation_interval = (2/10) * logics_per_second
+
+callback_interval = logic_interval
+
+
+player_movement_logics = typematic_interval * logics_per_second
+player_movement_delay_logics = typematic_start * logics_per_second
+
+water_speed_logics = 1 * logics_per_second
+explosion_push_logics = logics_per_second / 10
+fling_movement_logics = logics_per_second / 10
+freeze_detonation_interval = 2 * logics_per_second
+freeze_timer_logics = 5 * logics_per_second
@@ -0,0 +1,1633 @@
+import math
+from enum import Enum, IntEnum
+
+from ..vec2d import Vec2D
+from . import keys as key
+from . import world
+from .clock import Timer
+from .constants import (
+    player_movement_logics, player_movement_delay_logics,
+    water_speed_logics, fling_movement_logics,
+    freeze_timer_logics, timed_bomb_interval,
+    freeze_detonation_interval, contact_bomb_detonation_interval,
+    logics_per_second, typematic_interval,
+)
+from .keys import key_repr
+from .log import channel
+from .tiles import TileMeta, OCCUPIABLE_BY_PLAYER, OCCUPIABLE_BY_BOMB
+
+
+_entity_log = channel('entity')
+_animation_log = channel('animation')
+_player_log = channel('player')
+_water_log = channel('water')
+_bomb_log = channel('bomb')
+
+
+class Animator:
+    def __init__(self, clock):
+        """
+        clock should be a Clock.
+        """
+        self.clock = clock
+        self.timer = self.halfway_timer = None
+        self.obj = self.start = self.end = None
+
+    def __repr__(self):
+        return f"Animator({self.obj}, {self.start}, {self.end}, {self.ratio})"
+
+    def animate(self, obj, property, end, interval, callback=None, halfway_callback=None, tick_callback=None):
+        self.cancel()
+
+        self.obj = obj
+        self.property = property
+        start = self.start = getattr(obj, property)
+        self.end = end
+
+        self.interval = interval
+        self.callback = callback
+        self.halfway_callback = halfway_callback
+        self.tick_callback = tick_callback
+        self.ratio_offset = 0
+
+        self.timer = Timer("animator", self.clock, interval, self._complete, on_tick=self._on_tick)
+        if halfway_callback:
+            self.halfway_timer = Timer("animator halfway", self.clock, interval / 4, self._halfway)
+
+        self.finished = False
+
+    def cancel(self):
+        if self.halfway_timer:
+            self.halfway_timer.cancel()
+            self.halfway_timer = None
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        self.obj = self.property = None
+        self.occupant = None
+
+    def reroute(self, destination):
+        """
+        Change our animation to smoothly animate to a new position.
+        Don't start the timer over.  Instead, recalculate so that
+        we start at the exact current (animated) spot, end up
+        at the new position, and finish at the same time we would
+        have if we hadn't been rerouted.
+        """
+        _animation_log.debug and _animation_log.debug("{} rerouting to {}", self, destination)
+        current_position = self.position
+        ratio_offset = self.ratio
+
+        self.start = current_position
+        self.end = destination
+        self.ratio_offset = self.ratio
+
+    def pause(self):
+        self.timer.pause()
+        if self.halfway_timer:
+            self.halfway_timer.pause()
+
+    def unpause(self):
+        self.timer.unpause()
+        if self.halfway_timer:
+            self.halfway_timer.unpause()
+
+    @property
+    def ratio(self):
+        if not self.timer:
+            return 0
+        return self.timer.ratio
+
+    def _halfway(self):
+        self.halfway_timer = None
+        self.halfway_callback()
+
+    def _on_tick(self):
+        setattr(self.obj, self.property, self.position)
+        if self.tick_callback:
+            self.tick_callback()
+
+    def _complete(self):
+        self.finished = True
+        if self.callback:
+            self.callback()
+
+    @property
+    def position(self):
+        if self.end is None:
+            return self.start
+        if self.start is None:
+            return self.end
+        ratio = self.ratio
+        if self.ratio_offset:
+            range = 1 - self.ratio_offset
+            ratio = (ratio - self.ratio_offset) / range
+        return self.start + ((self.end - self.start) * ratio)
+
+def walk_vec2d_back_to_zero(v):
+    yield v
+    delta_x = Vec2D(-1 if v.x > 0 else 1, 0)
+    delta_y = Vec2D(0, -1 if v.y > 0 else 1)
+    while v:
+        if abs(v.y) > abs(v.x):
+            v += delta_y
+        else:
+            v += delta_x
+        yield v
+
+class Fling:
+    def __init__(self, entity, original_delta, delta):
+        self.entity = entity
+        self.original_delta = original_delta
+        self.delta = delta
+        self.destination = self.entity.position + delta
+
+
+entity_serial_numbers = 0
+class Entity:
+    # are we a platform that other things can go on?
+    is_platform = False
+
+    # the entity we're currently standing on (if any).
+    # managed automatically for us by the "position" property.
+    standing_on = None
+
+    # the entity that's standing on us (if any).
+    occupant = None
+
+    # a proxy you use to claim a tile that
+    # you're not on right now, but which you
+    # want to animate to.
+    claim = None
+
+    # a tile we're animating to but is currently occupied.
+    queued_tile = None
+
+    # are we moving?
+    moving = False
+
+    # if we're moving, where are we moving to?
+    moving_to = None
+
+    # we've been flung across the map!
+    _fling = None
+
+    # are we a floating object?
+    floating = False
+
+    freeze_timer = None
+
+    @classmethod
+    def factory(cls, *args, **kwargs):
+        """Create a factory for entities of this type."""
+        return lambda position: cls(position, *args, **kwargs)
+
+    def __init__(self, position):
+        global entity_serial_numbers
+        entity_serial_numbers += 1
+        self.serial_number = entity_serial_numbers
+        _entity_log.debug and _entity_log.debug("{!r}", self)
+
+        self.position = position
+        if not isinstance(self, Claim):
+            self.claim = Claim(self)
+
+    def on_level_loaded(self):
+        pass
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} #{self.serial_number} {self.position}>'
+
+    def queue_for_tile(self, coord):
+        assert self.queued_tile == None, f"{self} queued_tile is {self.queued_tile}, should be None"
+        _entity_log.debug and _entity_log.debug("{} queueing for {}", self, coord)
+        self.queued_tile = coord
+        world.level.tile_queue.setdefault(coord).append(self)
+        _entity_log.debug and _entity_log.debug("world.level.tile_queue[{}] is now {}", coord, world.level.tile_queue[coord])
+
+    def unqueue_for_tile(self):
+        if self.queued_tile:
+            _entity_log.debug and _entity_log.debug("{} unqueueing for {}", self, self.queued_tile)
+            _entity_log.debug and _entity_log.debug("world.level.tile_queue[{}] is currently {}", self.queued_tile, world.level.tile_queue[self.queued_tile])
+            world.level.tile_queue[self.queued_tile].remove(self)
+            self.queued_tile = None
+
+    def on_tile_available(self, entity, coord):
+        """
+        entity was on the tile at coord.
+        but it has just left.
+        """
+        pass
+
+    _position = None
+    @property
+    def position(self):
+        return self._position
+
+    @position.setter
+    def position(self, position):
+        if (position is not None) and (not isinstance(position, Vec2D)):
+            position = Vec2D(position)
+
+        if self._position == position:
+            return
+
+        old_position = self._position
+        self._position = position
+
+        departed_tile = None
+
+        if position is not None:
+            new_occupant = world.level.tile_occupant.get(position)
+        else:
+            new_occupant = None
+
+        if old_position is not None:
+            old_occupant = world.level.tile_occupant[old_position]
+            if old_occupant == self:
+                _entity_log.debug and _entity_log.debug("{} departing {}, clearing world.level.tile_occupant.", self, old_position)
+                world.level.tile_occupant[old_position] = None
+                departed_tile = old_position
+            elif self.standing_on and (self.standing_on == old_occupant):
+                _entity_log.debug and _entity_log.debug("{} departing {}, stepping off {}.", self, old_position, old_occupant)
+                old_occupant.on_stepped_on(None)
+                self.standing_on = None
+            elif self.standing_on and (self.standing_on == new_occupant):
+                # if what we're standing on moved to this new position,
+                # guess what! the platform moved! we're not stepping off!
+                _entity_log.debug and _entity_log.debug("{} departing {}, apparently riding on {}.", self, old_position, new_occupant)
+                pass
+            elif self._fling:
+                # we're being flung.  our old position was a mystery for the ages.
+                # hopefully our final destination will be less so.
+                _entity_log.debug and _entity_log.debug("{} departing {}, being flung.", self, old_position)
+            else:
+                _entity_log.warning and _entity_log.warning("{} departing {}, but I don't understand how. old_occupant {} new_occupant {} standing_on {} _fling {}.", self, old_position, old_occupant, new_occupant, self.standing_on, self._fling)
+                if self.standing_on:
+                    # we were standing on something, but we've moved.
+                    # the thing we were standing on isn't in the old tile.
+                    # it isn't in the new tile either.
+                    # you know what?  just don't be standing on that thing anymore.
+                    self.standing_on.on_stepped_on(None)
+                    self.standing_on = None
+
+        if position is not None:
+            if new_occupant and (new_occupant == self.claim):
+                _entity_log.debug and _entity_log.debug("{} clearing our claim on this tile.", self)
+                # moving to our claimed tile
+                new_occupant = None
+                # MILD HACK don't use descriptor to assign here
+                # the claim will think it's departing the tile
+                # and call on_tile_available() on the next queued guy
+                self.claim._position = None
+            if new_occupant == None:
+                _entity_log.debug and _entity_log.debug("{} moving to {}, tile is not occupied by anyone.", self, position)
+                world.level.tile_occupant[position] = self
+            elif new_occupant.is_platform:
+                assert new_occupant.occupant in (None, self, self.claim), f"we can't step on {new_occupant}, it's occupied by {new_occupant.occupant}"
+                _entity_log.debug and _entity_log.debug("{} moving to {}, stepping onto existing tile occupant {}", self, position, new_occupant)
+                self.standing_on = new_occupant
+                new_occupant.on_stepped_on(self)
+            else:
+                _entity_log.warning and _entity_log.warning("{} moving to {}, but I don't understand how, it's occupied by {} and we can't step on it.", self, position, new_occupant)
+                #     assert False, f"{self}: I don't understand how we can move to {position}"
+
+        if departed_tile:
+            # tell the next entity in the queue
+            # that they can have our old tile
+            tq = world.level.tile_queue[old_position]
+            if tq:
+                # DON'T remove e from tile_queue here
+                # let the entity do that itself!
+                e = tq[0]
+                assert e.position != old_position
+                _entity_log.debug and _entity_log.debug("{} departing tile {}.  hey, {}! you can have it!", self, departed_tile, e)
+                e.on_tile_available(self, old_position)
+                new_occupant = world.level.tile_occupant[old_position]
+                assert (new_occupant == e) or (e.claim and new_occupant == e.claim), f"(new_occupant {new_occupant} == e {e}) or (e.claim {e.claim} and new_occupant {new_occupant} == e.claim {e.claim})"
+
+        self.on_position_changed()
+
+    def fling(self, delta):
+        """
+        This pawn has been flung across the map!
+        Move it rapidly (animated) by delta.
+
+        While being flung, we are _not_ occupying the tiles
+        we fly over.
+
+        When the fling is over, we occupy the destination tile.
+            * This means we "claim" it.
+            * If the fling is over more than one space (e.g. delta is (-2, 0)),
+              and we can't occupy the destination space, try the closer spaces
+              (e.g. try delta (-1, 0)).  if we can claim one of those, fling to that.
+            * if we can't claim any of the spaces, the fling fails.
+              * Bombs that attempt to be flung and fail explode.
+
+        Note that the rules are a little different for some flung objects.
+        If you fling a log, and it wants to land on a space currently occupied
+        by a dam, the fling fails.
+
+        **But!**
+
+        If you fling a bomb, and it wants to land on a space currently occupied
+        by a dam, and the dam itself is unoccupied, the fling succeeds!  Because
+        we want the bomb to skip along platforms like that.  So: we have to ask
+        the entity "is it okay for you to be flung onto this entity?".  That's
+        what fling_destination_is_okay() is for.  And when the fling is over,
+        and the bomb is landing on a platform where we want to re-fling, that's
+        what on_fling_completed() is for.
+        """
+        occupant_is_a_claim = False
+        for v in walk_vec2d_back_to_zero(delta):
+            _entity_log.debug and _entity_log.debug("trying delta {}", v)
+            if not v:
+                _entity_log.debug and _entity_log.debug("fling failed, we walked back to zero without finding any viable spot.")
+                self.on_fling_failed(fling)
+                return False
+            fling = Fling(self, delta, v)
+            occupant = world.level.tile_occupant[fling.destination]
+            occupant_is_a_claim = isinstance(occupant, Claim)
+            if ((not occupant)
+                or occupant_is_a_claim
+                or self.fling_destination_is_okay(fling, occupant)):
+                break
+            _entity_log.debug and _entity_log.debug("tile wasn't okay, occupant is {}", occupant)
+
+        # fling is okay!
+        _entity_log.debug and _entity_log.debug("{} being flung to {}!", self, fling.destination)
+        self._fling = fling
+        if self.animator:
+            _entity_log.debug and _entity_log.debug("{} being animated to new position.", self)
+            if occupant_is_a_claim:
+                occupant.superceded()
+            self.claim.position = fling.destination
+            self.animator.cancel()
+            self.animator.animate(
+                self.actor, 'position',
+                fling.destination,
+                fling_movement_logics,
+                self.on_fling_completed)
+            self.position = None
+            self.moving = True
+            self.moving_to = fling.destination
+        else:
+            # jump there immediately
+            _entity_log.debug and _entity_log.debug("{} has no animator, so we'll just jump to the flung spot.", self)
+            assert not occupant, f"{self} wanted to be flung to {fling.destination} but we have no animator and the tile is occupied by {occupant}!"
+            self.on_fling_completed()
+        return True
+
+    def fling_destination_is_okay(self, fling, occupant):
+        return False
+
+    def on_fling_failed(self, fling):
+        pass
+
+    def on_fling_completed(self):
+        assert self._fling
+        position = self._fling.destination
+        self._fling = None
+        if self.queued_tile == position:
+            # our claim was superceded mid-flight, but we've
+            # landed here anyway; don't wait for the tile too.
+            self.unqueue_for_tile()
+        _entity_log.debug and _entity_log.debug("setting {} position to {}", self, position)
+        self.position = position
+        self.moving = False
+        self.moving_to = None
+
+    def interact(self, player):
+        """Called when player interacts with this entity."""
+        _entity_log.debug and _entity_log.debug("{} interacted with {} at {}", player, type(self), self.position)
+
+    def on_blasted(self, bomb, position):
+        _entity_log.debug and _entity_log.debug("{} has been blasted!", self)
+        if self.occupant:
+            if self.position != None:
+                position = self.position
+            else:
+                position = self.actor.position
+            _entity_log.debug and _entity_log.debug("{} occupant {}, by transitivity, has also been blasted. (at position {})", self, self.occupant, position)
+            self.occupant.on_blasted(bomb, position)
+
+    def on_frozen(self, bomb, position):
+        _entity_log.debug and _entity_log.debug("{} has been frozen!  I personally don't care.", self)
+        if self.occupant:
+            if self.position != None:
+                position = self.position
+            else:
+                position = self.actor.position
+            _entity_log.debug and _entity_log.debug("{} occupant {}, by transitivity, has also been frozen. (at position {})", self, self.occupant, position)
+            self.occupant.on_frozen(bomb, position)
+
+    def set_freeze_timer(self, callback):
+        if self.freeze_timer:
+            self.freeze_timer.cancel()
+        self.freeze_timer = Timer(f"{self} freeze timer", world.game.logics, freeze_timer_logics, callback)
+
+    def on_stepped_on(self, occupier):
+        self.occupant = occupier
+
+    def remove(self):
+        self.unqueue_for_tile()
+        self.position = None
+
+    def on_position_changed(self):
+        pass
+
+    def on_platform_animated(self, position):
+        pass
+
+    def on_platform_moved(self, position):
+        pass
+
+    def on_pushed_into_something(self, other):
+        pass
+
+    def on_something_pushed_into_us(self, other):
+        pass
+
+
+class Claim(Entity):
+    """
+    A "claim" is a token owned by an entity.
+    When the entity wants to animate from its
+    old position to a new position,
+    if the new position is unoccupied,
+    the entity will put its claim on that coordinate:
+        self.claim.position = coord
+    (since Claim inherits from Entity, simply assigning
+    its coordinate makes it occupy the tile)
+    """
+    def __init__(self, owner):
+        self.owner = owner
+        super().__init__(None)
+
+    def __repr__(self):
+        return f'Claim({self.owner!r})'
+
+    def superceded(self):
+        """
+        Someone has superceded our claim!
+        They are more important!
+        Since our owner wanted to move here,
+        and now we can't,
+        register our desire to move there.
+        """
+        position = self.position
+        _entity_log.debug and _entity_log.debug("{} withdrawing claim on {}!", self, position)
+        assert world.level.tile_occupant[position] == self
+        world.level.tile_occupant[position] = None
+        self._position = None
+        self.owner.queue_for_tile(position)
+
+
+
+class Dam(Entity):
+    floating = True
+    is_platform = True
+
+    def __init__(self, position):
+        super().__init__(position)
+        self.actor = world.scene.spawn_static(self.position, 'beaver-dam')
+        world.level.on_dam_spawned(self)
+
+    def on_blasted(self, bomb, position):
+        if self.occupant:
+            self.occupant.on_platform_moved(None)
+            self.occupant.on_blasted(bomb, position)
+        super().on_blasted(bomb, position)
+        self.actor.delete()
+        pos = self.position
+        self.position = None
+        world.level.on_dam_destroyed(self)
+        world.scene.spawn_particles(
+            3,
+            sprite_name='leaf1',
+            position=pos,
+            speed=2,
+            zrange=(5, 20),
+            vzrange=(5, 100),
+            va=200,
+            drag=0.5
+        )
+        world.scene.spawn_particles(
+            2,
+            sprite_name='leaf2',
+            position=pos,
+            speed=2,
+            zrange=(5, 20),
+            vzrange=(5, 100),
+            va=100,
+            drag=0.7
+        )
+        world.scene.spawn_particles(
+            8,
+            sprite_name='twig',
+            position=pos,
+            speed=0.8,
+            zrange=(5, 10),
+            vzrange=(15, 20),
+            va=300,
+            drag=0.8
+        )
+
+
+class Orientation(Enum):
+    RIGHT = 0
+    UP = 1
+    LEFT = 2
+    DOWN = 3
+
+    def get_sprite(self):
+        return ('right', 'up', 'left', 'down')[self.value]
+
+    def to_vec(self):
+        return orientation_to_position_delta[self]
+
+
+class MovementAction(Enum):
+    MOVE = 0
+    EMBARK = 1
+    DISEMBARK = 2
+
+
+class PlayerAnimationState(IntEnum):
+    STATIONARY = 0
+    MOVING_ABORTABLE = 1
+    MOVING_COMMITTED = 2
+
+
+key_to_movement_delta = {
+    key.UP:    Vec2D( 0, -1),
+    key.DOWN:  Vec2D( 0, +1),
+    key.LEFT:  Vec2D(-1,  0),
+    key.RIGHT: Vec2D(+1,  0),
+    }
+
+key_to_opposite = {
+    key.UP:    key.DOWN,
+    key.DOWN:  key.UP,
+    key.LEFT:  key.RIGHT,
+    key.RIGHT: key.LEFT,
+    }
+
+orientation_to_position_delta = {
+    Orientation.RIGHT: Vec2D(+1,  0),
+    Orientation.UP:    Vec2D( 0, -1),
+    Orientation.LEFT:  Vec2D(-1,  0),
+    Orientation.DOWN:  Vec2D( 0, +1),
+    }
+
+key_to_orientation = {
+    key.RIGHT: Orientation.RIGHT,
+    key.UP:    Orientation.UP,
+    key.LEFT:  Orientation.LEFT,
+    key.DOWN:  Orientation.DOWN,
+    }
+
+
+
+class Player(Entity):
+    MAX_BOMBS = 2
+    dead = False
+
+    def __init__(self, position):
+        super().__init__(position)
+
+        world.game.key_handler = self
+
+        self.actor = world.scene.spawn_player(position)
+
+        # what should be the player's initial orientation?
+        # it doesn't really matter.  let's pick something cromulent.
+        #
+        # divide up the screen into three sections as such,
+        # and have the player face Down, Right, or Left as follows.
+        #
+        # +-----------+
+        # |     D     |
+        # |-----------|
+        # |  R  |  L  |
+        # +-----------+
+        if position.y <= world.level.height // 2:
+            self.orientation = Orientation.DOWN
+        elif position.x <= world.level.width // 2:
+            self.orientation = Orientation.RIGHT
+        else:
+            self.orientation = Orientation.LEFT
+
+        self.animator = Animator(world.game.logics)
+        self.halfway_timer = None
+        self.moving = PlayerAnimationState.STATIONARY
+        self.move_action = None
+        self.start_moving_timer = None
+        self.queued_key = self.held_key = None
+
+        self.bombs = []
+        self.remote_control_bombs = []
+
+        self.new_position = self.new_platform = None
+        self.halfway = False
+        self.select_anim()
+
+    def on_died(self):
+        if not self.dead:
+            self.dead = True
+            world.hooks.player_killed(self)
+            world.level.player_died()
+
+    def on_frozen(self, bomb, position):
+        if not self.dead:
+            if self.standing_on is bomb:
+                self.drown(frozen=True)
+            else:
+                self.actor.play('pc-frozen')
+                self.on_died()
+
+    def on_blasted(self, bomb, position):
+        if not self.dead:
+            if self.standing_on is bomb:
+                self.drown()
+            else:
+                self.actor.play('pc-smouldering')
+                self.on_died()
+
+    def drown(self, frozen=False):
+        if not self.dead:
+            position = self.position
+            self.on_died()
+            self.actor.delete()
+            self.remove()
+            DrowningPC(position, frozen=frozen)
+
+    def push_bomb(self, bomb):
+        """Pick up a bomb."""
+        if len(self.bombs) == self.MAX_BOMBS:
+            return False
+        self.bombs.append(bomb)
+        world.hooks.bomb_picked_up(self, bomb)
+        self.select_anim()
+        return True
+
+    def pop_bomb(self):
+        """Drop a bomb."""
+        if not self.bombs:
+            return None
+        world.hooks.bomb_dropped(self)
+        bomb = self.bombs.pop()
+        self.select_anim()
+        return bomb
+
+    def facing_pos(self):
+        """Get the position the player is facing."""
+        return self.position + self.orientation.to_vec()
+
+    def on_platform_moved(self, platform):
+        # if platform stops existing, it calls us with None
+        # but! it's an exploding bomb! so we're about to die anyway.
+        if platform is None:
+            self.drown()
+            return
+
+        assert platform == self.standing_on
+
+        if self.moving == PlayerAnimationState.STATIONARY:
+            self.position = platform.position
+            return
+
+        # okay, we're moving.  are we not halfway yet?
+        # if we're not halfway, then we're stepping *off* this
+        # platform.  we should ignore movement updates.
+        if not self.halfway:
+            _player_log.debug and _player_log.debug("{} we're not halfway.  stepping off.  ignoring platform location update.", self)
+            return
+
+        # okay, we're halfway. which means we're stepping
+        # *onto* this platform.  reroute to new position.
+        assert self.moving == PlayerAnimationState.MOVING_COMMITTED
+        new_position = platform.position
+        self.animator.reroute(new_position)
+
+    def on_platform_animated(self, position):
+        if self.moving != PlayerAnimationState.STATIONARY:
+            return
+        if self.move_action is MovementAction.DISEMBARK:
+            return
+
+        if ((self.moving != PlayerAnimationState.STATIONARY)
+            and self.animator):
+            # FIXME: this updates the animator even if we're hopping off
+            self.animator.end = position
+        elif self.actor:
+            self.actor.position = position
+
+    def _animation_halfway(self):
+        self.moving = PlayerAnimationState.MOVING_COMMITTED
+        self.halfway = True
+        new_position = self.new_position
+        if (not self.new_platform) or (self.new_platform.position == self.new_position):
+            _player_log.debug and _player_log.debug("{} everything's fine, just move to {}.", self, self.new_position)
+        else:
+            # we're moving to a platform.  if it moved
+            # out from underneath us, animate smoothly to
+            # its new location.
+            _player_log.debug and _player_log.debug("{} platform moved out from underneath us from {} to {}.  update position and reroute animation.", self, self.new_position, self.new_platform.position)
+            new_position = self.new_platform.position
+            self.animator.reroute(self.new_platform.position)
+        self.position = new_position
+        self.new_position = self.new_platform = None
+
+    def _animation_finished(self):
+        _player_log.debug and _player_log.debug("{} finished animating", self)
+        self.halfway = False
+        self.moving = PlayerAnimationState.STATIONARY
+        self.move_action = None
+        self.moving_to = None
+        if self.queued_key:
+            if self.held_key:
+                assert self.held_key == self.queued_key, f"{key_repr(self.held_key)} != {key_repr(self.queued_key)} !!!"
+            k = self.queued_key
+            self.queued_key = None
+            self.on_key(k)
+        if self.held_key:
+            self.on_key(self.held_key)
+        self.select_anim()
+
+    def select_anim(self):
+        """Set the standard animations (standing/walk, holding?, direction)."""
+        if self.dead:
+            # Don't trample the death animations
+            return
+        animset = 'pc-holding' if self.bombs else 'pc'
+        if self.moving is not PlayerAnimationState.STATIONARY:
+            animset += '-walk'
+        self.actor.play(f'{animset}-{self.orientation.get_sprite()}')
+
+    def cancel_start_moving(self):
+        if self.start_moving_timer:
+            _player_log.debug and _player_log.debug("{} canceling start_moving_timer", self)
+            self.start_moving_timer.cancel()
+            self.start_moving_timer = None
+        else:
+            _player_log.debug and _player_log.debug("{} no start_moving_timer to cancel", self)
+
+    def on_key_press(self, k):
+        if key_to_movement_delta.get(k):
+            _player_log.debug and _player_log.debug("{} key press {}", self, key_repr(k))
+            self.cancel_start_moving()
+            self.held_key = k
+            self.start_moving_timer = Timer("start moving " + key_repr(k), world.game.logics, player_movement_delay_logics, self._start_moving)
+
+    def on_key_release(self, k):
+        if k == self.held_key:
+            _player_log.debug and _player_log.debug("{} key release {}", self, key_repr(k))
+            self.cancel_start_moving()
+            self.held_key = None
+
+    def can_move_to(self, new_position, navigability_mask=OCCUPIABLE_BY_PLAYER, verb="move to"):
+        x, y = new_position
+        level = world.level
+        occupant = level.tile_occupant.get_xy(x, y)
+        if occupant and occupant != self.claim:
+            if not occupant.is_platform:
+                _player_log.debug and _player_log.debug("{} can't {} space, it's occupied by {} which isn't a platform.", self, verb, occupant)
+                return False
+            if occupant.occupant:
+                _player_log.debug and _player_log.debug("{} can't {} space, it's occupied by {}, which *is* a platform, but already has {} on it.", self, verb, occupant, occupant.occupant)
+                return False
+            if self.floating:
+                _player_log.debug and _player_log.debug("{} can't {} space, it's occupied by {}, which *is* a platform, but we're floating.", self, verb, occupant)
+                return False
+            _player_log.debug and _player_log.debug("{} can {} space!  current occupant is {}, but it's an unoccupied platform so it's cool.", self, verb, occupant)
+            return occupant
+
+        tile = level.get_xy(x, y)
+        if not (tile.navigability & navigability_mask):
+            _player_log.debug and _player_log.debug("{} can't {} space!  it's not navigable, and current occupant is {}.", self, verb, occupant)
+            return False
+        _player_log.debug and _player_log.debug("{} can {} space!  it's navigable, and current occupant is {}.", self, verb, occupant)
+        return True
+
+    def on_key(self, k):
+        _player_log.debug and _player_log.debug("{} on key {}", self, key_repr(k))
+
+        # if k == key.ESCAPE:
+        #     # pause / unpause
+        #     if not world.game.paused:
+        #         world.level.pause()
+        #     return pyglet.event.EVENT_HANDLED
+
+        if k == key.L:
+            # log!  that's all L does.
+            return
+
+        if self.dead:
+            _player_log.debug and _player_log.debug("{} you're dead! you can't do {} while you're dead!", self, key_repr(k))
+            return
+
+        if k == key.E:
+            target_obj = world.level.top_entity(world.level.player.facing_pos())
+            if not target_obj:
+                return
+            target_obj.interact(world.level.player)
+            return
+
+        if k == key.T:
+            # trigger remote control bomb
+            if world.level.player.remote_control_bombs:
+                bomb = world.level.player.remote_control_bombs.pop(0)
+                _player_log.debug and _player_log.debug("{} detonating bomb {}", self, bomb)
+                bomb.detonate()
+            return
+
+        if k == key.B:
+            # if self.moving != PlayerAnimationState.STATIONARY:
+            #     log("can't drop a bomb, player is moving.")
+            #     return
+
+            # drop bomb
+            if not world.level.player.bombs:
+                _player_log.debug and _player_log.debug("can't drop a bomb, player is out of bombs.")
+                return
+            bomb_position = world.level.player.facing_pos()
+            result = self.can_move_to(bomb_position, OCCUPIABLE_BY_BOMB, "place bomb on")
+            _player_log.debug and _player_log.debug("{} can we drop a bomb at {}?  {}", self, bomb_position, result)
+            if not result:
+                return
+            cls = world.level.player.pop_bomb()
+            bomb = cls(bomb_position)
+            if bomb.floating:
+                snd = 'splash'
+            else:
+                snd = 'thud'
+
+            world.hooks.play_sound(snd, delay=0.3)
+            if isinstance(bomb, RemoteControlBomb):
+                world.level.player.remote_control_bombs.append(bomb)
+            if result is not True:
+                _player_log.debug and _player_log.debug("{} skipping bomb {} across other bomb {}", self, bomb, result)
+                delta = bomb_position - world.level.player.position
+                result = bomb.fling(delta)
+                _player_log.debug and _player_log.debug("{} flung bomb by {} result: {}", self, delta, result)
+            else:
+                _player_log.debug and _player_log.debug("{} bomb {} is fine where it is, not flinging/skipping.", self, bomb)
+            return
+
+        delta = key_to_movement_delta.get(k)
+        if not delta:
+            _player_log.debug and _player_log.debug("{} on key {}, isn't a movement key, ignoring", self, key_repr(k))
+            return
+
+        desired_orientation = key_to_orientation[k]
+
+        if self.moving == PlayerAnimationState.MOVING_COMMITTED:
+            if self.orientation == desired_orientation:
+                _player_log.debug and _player_log.debug("{} on key {}, we're committed to moving, ignoring keypress as we're already facing that way", self, key_repr(k))
+                self.queued_key = None
+                return
+            _player_log.debug and _player_log.debug("{} on key {}, we're committed to moving, when we finish we'll turn {!r}", self, key_repr(k), desired_orientation)
+            self.queued_key = k
+            return
+
+        if self.moving == PlayerAnimationState.MOVING_ABORTABLE:
+            if self.orientation == desired_orientation:
+                # ignore
+                _player_log.debug and _player_log.debug("{} on key {}, we're abortable-moving, you pressed a redundant key, ignoring", self, key_repr(k))
+                return
+            self.queued_key = k
+            # if we're quickly reversing direction,
+            # abort movement if possible
+            opposite_of_desired_orientation = key_to_orientation[key_to_opposite[k]]
+            _player_log.debug and _player_log.debug("{} on key {}, we're abortable-moving", self, key_repr(k))
+            if self.orientation == opposite_of_desired_orientation:
+                _player_log.debug and _player_log.debug("{} on key {}, aborting!", self, key_repr(k))
+                self.abort_movement()
+            return
+
+        if self.orientation != desired_orientation:
+            _player_log.debug and _player_log.debug("{} changing orientation to {!r}", self, desired_orientation)
+            self.orientation = desired_orientation
+            self.select_anim()
+            return
+
+        new_position = self.position + delta
+
+        stepping_onto_platform = None
+
+        result = self.can_move_to(new_position)
+        if not result:
+            _player_log.debug and _player_log.debug("{} can't move to {} because {}", self, new_position, result)
+            return
+        elif result is not True:
+            stepping_onto_platform = result
+
+        _player_log.debug and _player_log.debug("animating player, from {} by {} to {}", self.position, delta, new_position)
+        self.moving = PlayerAnimationState.MOVING_ABORTABLE
+        self.moving_to = new_position
+        self.new_position = new_position
+        self.starting_position = self.actor.position
+        self.select_anim()
+        self.animator.animate(
+            self.actor, 'position',
+            new_position,
+            player_movement_logics,
+            self._animation_finished,
+            self._animation_halfway)
+        if (not self.standing_on) and stepping_onto_platform:
+            _player_log.debug and _player_log.debug("{} hopping up", self)
+            stepping_onto_platform.occupant = self.claim
+            self.new_platform = stepping_onto_platform
+            world.hooks.tween(self.actor, 'hop_up', duration=typematic_interval, z=20)
+            self.move_action = MovementAction.EMBARK
+        elif self.standing_on and (not stepping_onto_platform):
+            _player_log.debug and _player_log.debug("{} hopping down", self)
+            world.hooks.tween(self.actor, 'hop_down', duration=typematic_interval, z=0)
+            self.move_action = MovementAction.DISEMBARK
+        else:
+            _player_log.debug and _player_log.debug("{} moving between two tiles of the same altitude", self)
+            self.move_action = MovementAction.MOVE
+
+    def _start_moving(self):
+        assert self.held_key
+        self.on_key(self.held_key)
+        self.start_moving_timer = None
+
+    def abort_movement(self):
+        if self.moving != PlayerAnimationState.MOVING_ABORTABLE:
+            return
+        self.move_action = None
+        self.halfway = False
+        self.moving = PlayerAnimationState.MOVING_COMMITTED
+        starting_position = self.animator.position
+        world.hooks.tween(self.actor, duration=0.1, z=20 if self.standing_on else 0)
+        self.animator.animate(
+            self.actor, 'position',
+            self.starting_position,
+            player_movement_logics / 3,
+            self._animation_finished)
+        self.moving_to = self.starting_position
+
+
+def enumerate_outside_in(iterable):
+    l = list(iterable)
+    offset = 0
+    while l:
+        o = l.pop(0)
+        yield offset, o
+        if not l:
+            break
+        o = l.pop(-1)
+        yield offset + len(l) + 1, o
+        offset += 1
+
+
+class BlastPattern:
+    def __init__(self, strength, pattern):
+        """
+        The blast pattern is always outside-in.
+        That ensures that when we push bombs,
+        if there are two bombs in a row,
+        the further-away one is processed first,
+        which means it vacates its tile first,
+        which means that its tile is available
+        for the nearer one to move there.
+        """
+        self.strength = strength
+
+        lines = [line.rstrip() for line in pattern.split("\n")]
+        while lines and not lines[0]:
+            lines.pop(0)
+        while lines and not lines[-1]:
+            lines.pop()
+
+        center = None
+        absolute_coordinates = []
+        for y, line in enumerate_outside_in(lines):
+            stripped_line = line.lstrip()
+            x_offset = len(line) - len(stripped_line)
+            for x, c in enumerate_outside_in(stripped_line):
+                coordinate = Vec2D(x + x_offset, y)
+                if c == "O":
+                    # center
+                    center = coordinate
+                    # fall through, allow the center
+                    # to be part of the blast pattern
+                    # (in case you have a bomb stacked
+                    # on top of another bomb)
+                if not c.isspace():
+                    absolute_coordinates.append(coordinate)
+        assert center and absolute_coordinates
+        self.coordinates = []
+        for coordinate in absolute_coordinates:
+            self.coordinates.append(coordinate - center)
+
+    def __repr__(self):
+        return f"BlastPattern({self.strength}, {self.coordinates})"
+
+blast_pattern_1 = BlastPattern(2,
+"""
+ X
+XOX
+ X
+""")
+
+blast_pattern_2 = BlastPattern(3,
+"""
+  X
+ XXX
+XXOXX
+ XXX
+  X
+""")
+
+
+class FloatingPlatform(Entity):
+
+    can_be_pushed_from_water_to_land = False
+
+    def __init__(self, position):
+        super().__init__(position)
+
+        self.animator = Animator(world.game.logics)
+        self.waiting_halfway = False
+        self.make_actor()
+        self.animate_if_on_moving_water()
+
+    def move_with_animation(self, position, logics):
+        _water_log.debug and _water_log.debug("{} animating movement to {}", self, position)
+        self.new_position = position
+        current_occupant = world.level.tile_occupant.get(position)
+        if current_occupant:
+            _water_log.debug and _water_log.debug("{} wants to move to new_position, but it's occupied.  start moving anyway.", self)
+            self.queue_for_tile(position)
+        else:
+            self.claim.position = position
+
+        self.animator.animate(
+            self.actor, 'position',
+            position,
+            logics,
+            self._animation_finished,
+            self._animation_halfway,
+            self._animation_tick)
+        self.moving = True
+        self.moving_to = self.new_position
+
+    def what_would_block_us_from_moving_to(self, position,
+            okay_if_occupant_is_floating_away=True):
+        x, y = position
+        level = world.level
+        tile = level.get_xy(x, y)
+        occupant = level.tile_occupant.get_xy(x, y)
+        if not tile.water:
+            _water_log.debug and _water_log.debug("{} should we start floating to {}? no! it's not water.", self, position)
+            return tile
+        # okay, it's water.
+        if not occupant:
+            _water_log.debug and _water_log.debug("{} should we start floating to {}? yes! it's unoccupied water.", self, position)
+            return None
+        if occupant == self.claim:
+            _water_log.debug and _water_log.debug("{} should we start floating to {}? yes!  we have claim to that space (occupant is {}).", self, position, occupant)
+            return None
+        if not okay_if_occupant_is_floating_away:
+            # it's occupied, and right now we don't care
+            # whether or not the occupant is floating away.
+            _water_log.debug and _water_log.debug("{} should we start floating to {}? no!  it's occupied by {} and we don't care if it's moving away.", self, position, occupant)
+            return occupant
+
+        # if the occupant is floating away from us,
+        # then they'll vacate by the time we get there,
+        # so maybe it'll all be fine.
+        assert occupant.position == position
+        if not occupant.moving:
+            _water_log.debug and _water_log.debug("{} should we start floating to {}? no!  it's occupied by {} and the occupant isn't moving.", self, position, occupant)
+            return occupant
+        if (occupant.moving
+            and occupant.moving_to == self.position):
+            _water_log.debug and _water_log.debug("{} should we start floating to {}? no! it's occupied by {} and the occupant is moving towards us.", self, position, occupant)
+            return occupant
+        _water_log.debug and _water_log.debug("{} should we start floating to {}? yes!  it's occupied by {}, but the occupant is moving out, and not towards us.", self, position, occupant)
+        return None
+
+    def animate_if_on_moving_water(self):
+
+        if self.standing_on:
+            self.platform = self.floating = self.moving = False
+            return
+
+        tile = world.level.get(self.position)
+        self.is_platform = self.floating = tile.water
+        self.on_position_changed()
+
+        _water_log.debug and _water_log.debug("{} placed at {}, tile is {}. is it moving water? {}", self, self.position, tile, tile.moving_water)
+
+        if not tile.moving_water:
+            return
+
+        new_position = self.position + tile.current
+
+        blocker = self.what_would_block_us_from_moving_to(new_position)
+        if blocker:
+            # okay, we're being pushed into something.
+            assert isinstance(blocker, (Entity, TileMeta)), f"blocker isn't an entity or map tile, it's {blocker}"
+            we_care = self.on_pushed_into_something(blocker)
+            if isinstance(blocker, Entity):
+                blocker.on_something_pushed_into_us(self)
+            if not we_care:
+                blocker = None
+
+        if not blocker:
+            self.move_with_animation(new_position, water_speed_logics)
+
+
+    def on_pushed_into_something(self, other):
+        v = isinstance(other, TileMeta)
+        _water_log.debug and _water_log.debug("{} pushed into {}. {}", self, other, "We disallow it because it's a tile" if v else "We allow it.")
+        return v
+
+    def on_something_pushed_into_us(self, other):
+        _water_log.debug and _water_log.debug("{} was pushed into by {}.  we don't really care.", self, other)
+        return False
+
+    def _animation_halfway(self):
+        current_occupant = world.level.tile_occupant[self.new_position]
+        if current_occupant and current_occupant != self.claim:
+            # we need to wait!
+            _water_log.debug and _water_log.debug("{} halfway... but we need to wait! occupied by {}.", self, current_occupant)
+            assert self.queued_tile == self.new_position, f"{self} queued_tile {self.queued_tile} != new_position {self.new_position} !!!"
+            self.waiting_halfway = True
+            self.animator.pause()
+            return
+
+        blocker = self.what_would_block_us_from_moving_to(self.new_position,
+            okay_if_occupant_is_floating_away=False)
+        if blocker:
+            _water_log.debug and _water_log.debug("{} we can't continue floating to {}! blocked by {}.", self, self.new_position, blocker)
+            self.on_pushed_into_something(blocker)
+            if isinstance(blocker, Entity):
+                blocker.on_something_pushed_into_us(self)
+            self.waiting_halfway = True
+            self.animator.pause()
+            return
+
+        _water_log.debug and _water_log.debug("{} halfway, proceeding.", self)
+        self.waiting_halfway = False
+        self.position = self.new_position
+        if self.occupant:
+            self.occupant.on_platform_moved(self)
+
+    def on_tile_available(self, entity, position):
+        assert self.queued_tile == position
+        assert world.level.tile_occupant[position] == None
+        _water_log.debug and _water_log.debug("{} was queued for {}, but it's now available! hooray!", self, position)
+        self.claim.position = position
+        self.unqueue_for_tile()
+        if self.waiting_halfway:
+            # we can proceed!
+            self.animator.unpause()
+            self._animation_halfway()
+
+    def _animation_finished(self):
+        _water_log.debug and _water_log.debug("{} finished moving", self)
+        self.moving = False
+        self.moving_to = None
+        self.animate_if_on_moving_water()
+
+    def _animation_tick(self):
+        if self.animator and self.occupant:
+            self.occupant.on_platform_animated(self.animator.position)
+
+    def on_blasted(self, bomb, position):
+        super().on_blasted(bomb, position)
+        if self._fling:
+            # can't be double-flung! if we're already flinging somewhere
+            # we ignore it.
+            return
+        self.pushed_by_explosion(position)
+
+    def pushed_by_explosion(self, position):
+        _water_log.debug and _water_log.debug("{} (current position {}) pushed by explosion from {}! existing fling {}", self, self.position, position, self._fling)
+        if self._fling:
+            return
+
+        delta = self.position - position
+        _water_log.debug and _water_log.debug("{} delta {} floating {} can_be_pushed_from_water_to_land {}", self, delta, self.floating, self.can_be_pushed_from_water_to_land)
+        for delta in walk_vec2d_back_to_zero(delta):
+            if not delta:
+                break
+            if self.floating:
+                position = self.position + delta
+                tile = world.level.get(position)
+                _water_log.debug and _water_log.debug("{} we're floating, tile at {} is {}.  water? {}", self, position, tile, tile.water)
+                if not (tile.water or self.can_be_pushed_from_water_to_land):
+                    _water_log.debug and _water_log.debug("can't use delta {}, it would push us up from water to land", delta)
+                    continue
+            break
+        if delta:
+            # if queued for tile, unqueue
+            _water_log.debug and _water_log.debug("{} explosion will fling us by {}", self, delta)
+            if self.fling(delta):
+                _water_log.debug and _water_log.debug("{} fling {} worked!  unqueue for current tile.", self, delta)
+                self.unqueue_for_tile()
+            else:
+                _water_log.debug and _water_log.debug("{} fling {} failed!  don't do anything.", self, delta)
+        else:
+            _water_log.debug and _water_log.debug("{} explosion delta is {} so we're not flinging", self, delta)
+
+    def on_fling_completed(self):
+        fling = self._fling
+        assert fling
+
+        # is our destination (what we flung to)
+        # a platform?  our claim would be standing on something.
+        standing_on = self.claim.standing_on
+        _water_log.debug and _water_log.debug("{} bomb fling completed.  did we land on a platform? {} {}", self, standing_on, self.standing_on)
+        self.on_fling_failed(fling) # cleanup!
+
+        super().on_fling_completed()
+        _water_log.debug and _water_log.debug("just checking! {} .fling is {}", self, self._fling)
+        if not standing_on:
+            _water_log.debug and _water_log.debug("{} was flung, and has now landed at {}.", self, fling.destination)
+            self.animate_if_on_moving_water()
+        else:
+            # re-fling!
+            result = self.fling(fling.original_delta)
+            _water_log.debug and _water_log.debug("{} was flung, but landed on {}, so we re-fling by original delta {}! result: {}", self, standing_on, fling.original_delta, result)
+
+    def on_platform_animated(self, position):
+        pass
+
+
+class Log(FloatingPlatform):
+
+    def __init__(self, position):
+        _water_log.debug and _water_log.debug("{} init, position is {}", type(self).__name__, position)
+        super().__init__(position)
+        assert world.level.get(position).water
+
+    def make_actor(self):
+        self.actor = world.scene.spawn_static(self.position, 'log')
+
+
+class DrowningPC(Log):
+    def __init__(self, position, frozen=False):
+        self.sprite_name = 'pc-frozen-floating' if frozen else 'pc-drowning'
+        super().__init__(position)
+
+    def make_actor(self):
+        self.actor = world.scene.spawn_player(self.position, self.sprite_name)
+
+
+class Bomb(FloatingPlatform):
+    blast_pattern = blast_pattern_1
+    detonated = False
+    can_be_pushed_from_water_to_land = True
+    actor = None
+
+    def __init__(self, position):
+        self.current_sprite_name = None
+        self.frozen = False
+
+        super().__init__(position)
+
+        self.actor.z = 50
+        world.hooks.tween(self.actor, 'accelerate', duration=0.2, on_finished=self.on_position_changed, z=0)
+
+    def make_actor(self):
+        self.actor = world.scene.spawn_bomb(self.position, self.sprite_name)
+
+    def on_position_changed(self):
+        _bomb_log.debug and _bomb_log.debug("{} on position changed", self)
+        suffix = "-float" if self.floating else ""
+        suffix += "-frozen" if self.frozen else ""
+        if self.actor:
+            sprite_name = f'{self.sprite_name}{suffix}'
+            if self.current_sprite_name != sprite_name:
+                _bomb_log.debug and _bomb_log.debug("{} now playing {}", self, sprite_name)
+                self.actor.play(sprite_name)
+                self.current_sprite_name = sprite_name
+
+    def interact(self, player):
+        """Allow the player to pick up the bomb.
+
+        Bombs that cannot be taken will override this method.
+        """
+        if self.floating:
+            return
+        taken = player.push_bomb(type(self))
+        if taken:
+            if isinstance(player, Player):
+                if self in player.remote_control_bombs:
+                    player.remote_control_bombs.remove(self)
+            self.actor.delete()
+            self.remove()
+
+    # def on_level_loaded(self):
+    #     # when a bomb spawns on moving water,
+    #     # if the space it wants to animate to is open,
+    #     # it stakes its "claim" there.
+    #     # but maybe next we spawn something on that space!
+    #     # so:
+    #     #   if our claim has a position set,
+    #     #     and that position now has something
+    #     #     on it besides our claim:
+    #     #     withdraw our claim and queue for the tile.
+    #     claim_position = self.claim.position
+    #     if not claim_position:
+    #         return
+    #     occupant_at_claim = world.level.tile_occupant[claim_position]
+    #     if occupant_at_claim != self.claim:
+    #         log(f"{self} withdrawing claim after level loaded, {claim_position} occupied by {occupant_at_claim}")
+    #         self.claim.superceded()
+
+    def detonate(self):
+        if self.detonated:
+            return
+        self.detonated = True
+        if self._fling:
+            assert self.position is None
+            position = self.animator.position
+            position = Vec2D(math.floor(position.x), math.floor(position.y))
+        else:
+            position = self.position
+
+        _bomb_log.debug and _bomb_log.debug("{} detonating at {}!", self, position)
+
+        if self.animator:
+            self.animator.cancel()
+        self.unqueue_for_tile()
+        self.actor.scene.spawn_explosion(self.actor.position)
+        self.detonation_effects()
+        self.actor.delete()
+        self.remove()  # Remove ourselves before processing on_blasted
+        # t = Timer(f"bomb {self} detonation", world.game.logics, exploding_bomb_interval, self.remove)
+        # log(f"WHAT THE HELL TIMER {t}")
+        x, y = position
+        tile_occupant = world.level.tile_occupant
+        for dx, dy in self.blast_pattern.coordinates:
+            e = tile_occupant.get_xy(x + dx, y + dy)
+            if e:
+                e.on_blasted(self, position)
+        if self.occupant:
+            self.occupant.on_blasted(self, position)
+
+    def remove(self):
+        _bomb_log.debug and _bomb_log.debug("{} bomb has exploded, removing self.", self)
+        self.position = None
+        self.claim.position = None
+
+    def on_blasted(self, bomb, position):
+        # explicitly pass over FloatingPlatform.on_blasted
+        super(FloatingPlatform, self).on_blasted(bomb, position)
+        if bomb == self:
+            return
+        if self._fling:
+            _bomb_log.debug and _bomb_log.debug("{} can't be double-flung!  we have to detonate.", self)
+            # can't be double-flung! if we're already flinging somewhere
+            # we just detonate.
+            self.detonate()
+            return
+        self.pushed_by_explosion(position)
+
+    def fling_destination_is_okay(self, fling, occupant):
+        if occupant.is_platform and not occupant.occupant:
+            _bomb_log.debug and _bomb_log.debug("{}: can we fling to {}? it has {} but we can stand there, so yes!", self, fling.destination, occupant)
+            occupant.occupant = self.claim
+            self.claim.standing_on = occupant
+            return True
+
+    def on_fling_failed(self, fling):
+        # all this does is unset on_standing_on
+        # so it's called from on_fling_completed too,
+        # just to clean up.
+        standing_on = self.standing_on
+        if standing_on:
+            standing_on.occupant = None
+            standing_on = None
+
+    def detonation_effects(self):
+        world.hooks.play_sound('explosion2')
+        world.hooks.screen_shake()
+
+
+
+class TimedBomb(Bomb):
+    sprite_name = 'timed-bomb'
+    interval = timed_bomb_interval
+
+    SPARK_COLOR = 0xff, 0xa9, 0x00
+
+    def __init__(self, position, lit=True):
+        super().__init__(position)
+
+        self.start_time = world.game.logics.counter
+        self.lit = False
+        if lit:
+            self.light_fuse()
+
+    def light_fuse(self):
+        if self.lit:
+            return
+        self.red_timer = Timer("bomb toggle red", world.game.logics, self.interval * 0.5, self.toggle_red)
+        self.detonate_timer = Timer("bomb detonate", world.game.logics, self.interval, self.detonate)
+        world.hooks.fuse_lit(self)
+        self.lit = True
+
+    def on_blasted(self, bomb, position):
+        """If blasted, the fuse get lit!"""
+        super().on_blasted(bomb, position)
+        self.light_fuse()
+
+    def interact(self, player):
+        if not self.lit:
+            taken = player.push_bomb(type(self))
+            if taken:
+                self.actor.delete()
+                self.remove()
+
+    def detonate(self):
+        world.hooks.fuse_out(self)
+        super().detonate()
+
+    def on_frozen(self, bomb, position):
+        super().on_frozen(bomb, position)
+        _bomb_log.debug and _bomb_log.debug("{} has been frozen!  pause the countdowns.", self)
+        self.set_freeze_timer(self.on_unfreeze)
+        self.frozen = True
+        if self.lit:
+            self.red_timer.pause()
+            self.detonate_timer.pause()
+        self.on_position_changed()
+
+    def on_unfreeze(self):
+        _bomb_log.debug and _bomb_log.debug("{} has unfrozen!  continue the countdowns.", self)
+        self.frozen = False
+        if self.lit:
+            self.red_timer.unpause()
+            self.detonate_timer.unpause()
+        self.on_position_changed()
+
+    def toggle_red(self):
+        elapsed = world.game.logics.counter - self.start_time
+        if self.actor.scene:
+            self.actor.toggle_red()
+            if elapsed < (timed_bomb_interval - logics_per_second):
+                next = 0.4 * logics_per_second
+            else:
+                next = 0.1 * logics_per_second
+            self.red_timer = Timer("bomb toggle red again", world.game.logics, next, self.toggle_red)
+
+
+class FreezeBomb(TimedBomb):
+    sprite_name = 'freeze-bomb'
+    interval = freeze_detonation_interval
+
+    SPARK_COLOR = 255, 255, 255
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def detonate(self):
+        if self.detonated:
+            return
+        self.detonated = True
+
+        world.hooks.fuse_out(self)
+
+        if self._fling:
+            assert self.position is None
+            position = self.animator.position
+            position = Vec2D(math.floor(position.x), math.floor(position.y))
+        else:
+            position = self.position
+
+        _bomb_log.debug and _bomb_log.debug("{} freeze-detonating at {}!", self, position)
+
+        if self.animator:
+            self.animator.cancel()
+        self.unqueue_for_tile()
+        self.actor.scene.spawn_explosion(self.actor.position, freeze=True)
+        self.detonation_effects()
+
+        self.actor.delete()
+        self.remove()  # Remove ourselves before processing on_blasted
+        # t = Timer(f"bomb {self} detonation", world.game.logics, exploding_bomb_interval, self.remove)
+        # log(f"WHAT THE HELL TIMER {t}")
+        x, y = position
+        tile_occupant = world.level.tile_occupant
+        for dx, dy in self.blast_pattern.coordinates:
+            e = tile_occupant.get_xy(x + dx, y + dy)
+            if e:
+                e.on_frozen(self, position)
+
+        if self.occupant:
+            self.occupant.on_frozen(self, position)
+
+
+class ContactBomb(Bomb):
+    sprite_name = 'contact-bomb'
+    frozen = False
+    detonation_timer = None
+
+    def on_blasted(self, bomb, position):
+        # explicitly pass over FloatingPlatform.on_blasted
+        super(FloatingPlatform, self).on_blasted(bomb, position)
+        self.detonate_after_delay()
+
+    def in_contact_with_entity(self, entity):
+        # ignore bumps while setting up the level
+        if world.level.loading:
+            return False
+        if self.frozen:
+            _bomb_log.debug and _bomb_log.debug("{} contact bomb and {} are pushed together! but we're frozen right now!  so ignore it.  FOR NOW", self, entity)
+            return False
+        _bomb_log.debug and _bomb_log.debug("{} contact bomb and {} are pushed together! kaboom!", self, entity)
+        self.detonate_after_delay()
+        return True
+
+    def detonate_after_delay(self):
+        if self.detonation_timer:
+            return
+        self.detonation_timer = Timer("ContactBomb detonation delay", world.game.logics, contact_bomb_detonation_interval, self.detonate)
+        if self.frozen:
+            self.detonation_timer.pause()
+
+    def on_pushed_into_something(self, other):
+        return self.in_contact_with_entity(other)
+
+    def on_something_pushed_into_us(self, other):
+        return self.in_contact_with_entity(other)
+
+    def on_frozen(self, bomb, position):
+        super().on_frozen(bomb, position)
+        _bomb_log.debug and _bomb_log.debug("{} has frozen!  desensitize to contact.", self)
+        self.set_freeze_timer(self.on_unfreeze)
+        if self.detonation_timer:
+            self.detonation_timer.pause()
+        self.frozen = True
+        self.on_position_changed()
+
+    def on_unfreeze(self):
+        _bomb_log.debug and _bomb_log.debug("{} has unfrozen!  become sensitive again.", self)
+        self.frozen = False
+        if self.detonation_timer:
+            self.detonation_timer.unpause()
+        self.animate_if_on_moving_water()
+        self.on_position_changed()
+
+
+
+class RemoteControlBomb(Bomb):
+    sprite_name = 'remote-bomb'
+
+
+class Scenery(Entity):
+    def __init__(self, position, sprite):
+        super().__init__(position)
+        self.actor = world.scene.spawn_static(position, sprite)
+
+    def remove(self, dt=None):
+        super().remove()
+        self.actor.delete()
+
+
+class Dispenser(Scenery):
+    """A dispenser for bombs."""
+
+    def __init__(self, position, bomb_type):
+        super().__init__(position, f'dispenser-{bomb_type.sprite_name}')
+        self.bomb_type = bomb_type
+
+    def interact(self, player):
+        player.push_bomb(self.bomb_type)
+
+
+class Bush(Scenery):
+    def __init__(self, position):
+        super().__init__(position, 'bush')
+
+    def on_blasted(self, bomb, position):
+        pos = self.position
+        self.remove()
+        world.scene.spawn_particles(
+            10,
+            sprite_name='leaf1',
+            position=pos,
+            speed=2,
+            zrange=(5, 50),
+            vzrange=(5, 100),
+            va=200,
+            drag=0.5
+        )
+        world.scene.spawn_particles(
+            8,
+            sprite_name='leaf2',
+            position=pos,
+            speed=2,
+            zrange=(5, 50),
+            vzrange=(5, 100),
+            va=100,
+            drag=0.7
+        )
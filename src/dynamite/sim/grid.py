@@ -0,0 +1,96 @@
+from ..vec2d import Vec2D
+
+
+class Grid:
+    """
+    A width x height grid of values, indexed by (x, y).
+
+    Stored as one flat list, so looking up a square is some
+    arithmetic and a list index, rather than hashing a Vec2D.
+    Reading anywhere off the map just returns default; nothing
+    gets added, unlike with a defaultdict.
+
+    If you pass factory, every square starts out with its own
+    factory() (like a defaultdict(factory)), instead of default.
+    Off the map, reading gives you a new factory() that isn't kept;
+    use setdefault() to get one that is.
+
+    Things can (very occasionally) end up off the map--say, a
+    bomb flung over the edge.  Values written out there are kept
+    in a dict on the side, so they still read back.
+
+    The hot paths should use get_xy() with plain ints.
+    """
+    def __init__(self, width, height, default=None, factory=None):
+        self.width = width
+        self.height = height
+        self.default = default
+        self.factory = factory
+        if factory:
+            self.cells = [factory() for _ in range(width * height)]
+        else:
+            self.cells = [default] * (width * height)
+        self.outside = {}
+
+    def __repr__(self):
+        return f"<Grid {self.width}x{self.height}>"
+
+    def get_xy(self, x, y):
+        if (0 <= x < self.width) and (0 <= y < self.height):
+            return self.cells[y * self.width + x]
+        value = self.outside.get((x, y), self.default)
+        if (value is None) and self.factory:
+            return self.factory()
+        return value
+
+    def set_xy(self, x, y, value):
+        if (0 <= x < self.width) and (0 <= y < self.height):
+            self.cells[y * self.width + x] = value
+        elif value is self.default:
+            self.outside.pop((x, y), None)
+        else:
+            self.outside[x, y] = value
+
+    def __getitem__(self, pos):
+        x, y = pos
+        return self.get_xy(x, y)
+
+    def __setitem__(self, pos, value):
+        x, y = pos
+        self.set_xy(x, y, value)
+
+    def setdefault(self, pos):
+        """
+        Like self[pos], except that off the map, the factory()
+        made for an empty square is kept there.  Use it when
+        you're going to change the value in place.
+        """
+        x, y = pos
+        if (0 <= x < self.width) and (0 <= y < self.height):
+            return self.cells[y * self.width + x]
+        value = self.outside.get((x, y))
+        if value is None:
+            value = self.outside[x, y] = self.factory()
+        return value
+
+    def get(self, pos, default=None):
+        value = self[pos]
+        if value is self.default:
+            return default
+        return value
+
+    def items(self):
+        """Iterate over ((x, y), value) for every square
+        that doesn't hold the default."""
+        default = self.default
+        width = self.width
+        for i, value in enumerate(self.cells):
+            if value is not default:
+                y, x = divmod(i, width)
+                yield Vec2D(x, y), value
+        for (x, y), value in self.outside.items():
+            yield Vec2D(x, y), value
+
+    def values(self):
+        for _, value in self.items():
+            yield value
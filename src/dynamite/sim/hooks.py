@@ -0,0 +1,102 @@
+"""Attachment points for rendering and audio.
+
+The simulation never draws or plays anything itself.  Instead it talks
+to a scene (which makes actors for entities) and a Hooks object (which
+hears about sounds, tweens and level events).  The defaults here do
+nothing at all, so the rules can run with no window, audio or GL.
+"""
+
+
+class Hooks:
+    """Receives presentation events from the simulation.
+
+    Subclass this and override the methods you care about.
+    """
+
+    def play_sound(self, name, delay=0):
+        pass
+
+    def tween(self, obj, tween='linear', duration=1, on_finished=None, **targets):
+        # no animation: jump straight to the end
+        for k, v in targets.items():
+            setattr(obj, k, v)
+        if on_finished:
+            on_finished()
+
+    def screen_shake(self):
+        pass
+
+    def bomb_picked_up(self, player, bomb_type):
+        pass
+
+    def bomb_dropped(self, player):
+        pass
+
+    def fuse_lit(self, bomb):
+        pass
+
+    def fuse_out(self, bomb):
+        pass
+
+    def player_killed(self, player):
+        pass
+
+    def dams_remaining_changed(self, level):
+        pass
+
+    def level_failed(self, level):
+        pass
+
+    def level_complete(self, level):
+        pass
+
+    def game_won(self, level):
+        pass
+
+    def level_paused(self, level):
+        pass
+
+
+class NullActor:
+    """Stands in for a dynamite.scene.Actor when there is no display.
+
+    Entities read back their actor's position (for example while
+    being flung), so we still have to remember it.
+    """
+    red = False
+
+    def __init__(self, scene, position, sprite_name='default'):
+        self.scene = scene
+        self.position = position
+        self.z = 0
+        self.anim = sprite_name
+        self.attached = []
+
+    def play(self, name):
+        if self.scene:
+            self.anim = name
+
+    def toggle_red(self):
+        self.red = not self.red
+
+    def delete(self):
+        self.scene = None
+
+
+class NullScene:
+    """A scene that doesn't draw anything."""
+
+    def spawn_static(self, position, sprite):
+        return NullActor(self, position, sprite)
+
+    def spawn_bomb(self, position, sprite='timed-bomb'):
+        return NullActor(self, position, sprite)
+
+    def spawn_player(self, position, sprite='pc-up'):
+        return NullActor(self, position, sprite)
+
+    def spawn_explosion(self, position, freeze=False):
+        pass
+
+    def spawn_particles(self, num, sprite_name, position, zrange, speed, vzrange, va, drag=1.0, gravity=-100):
+        pass
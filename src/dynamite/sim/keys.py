@@ -0,0 +1,65 @@
+"""Key codes understood by the simulation.
+
+The values are the same as pyglet's (pyglet.window.key), so the game can
+pass keyboard events straight through.  We don't import pyglet.window
+here because that needs a display.
+"""
+
+ESCAPE = 0xff1b
+ENTER = 0xff0d
+SPACE = 0x20
+
+UP = 0xff52
+DOWN = 0xff54
+LEFT = 0xff51
+RIGHT = 0xff53
+
+A = ord('a')
+B = ord('b')
+D = ord('d')
+E = ord('e')
+L = ord('l')
+S = ord('s')
+T = ord('t')
+W = ord('w')
+
+
+remapped_keys = {
+    ESCAPE: ESCAPE,
+    ENTER: ENTER,
+    SPACE: SPACE,
+
+    W: UP,
+    A: LEFT,
+    S: DOWN,
+    D: RIGHT,
+
+    UP: UP,
+    LEFT: LEFT,
+    DOWN: DOWN,
+    RIGHT: RIGHT,
+
+    B: B,
+    E: E,
+    L: L,
+    T: T,
+}
+
+interesting_key = remapped_keys.get
+
+_key_repr = {
+    ESCAPE: "Escape",
+    ENTER: "Enter",
+    SPACE: "Space",
+
+    UP: "Up",
+    LEFT: "Left",
+    DOWN: "Down",
+    RIGHT: "Right",
+
+    B: "B",
+    E: "E",
+    L: "L",
+    T: "T",
+    }
+key_repr = _key_repr.get
@@ -0,0 +1,316 @@
+import functools
+from pathlib import Path
+import time
+
+from ..maploader import load_map
+from ..vec2d import Vec2D
+from . import keys as key
+from . import world
+from .clock import Clock, Timer
+from .constants import logic_interval, typematic_interval, typematic_delay
+from .entities import Claim, Player
+from .grid import Grid
+from .hooks import Hooks, NullScene
+from .keys import interesting_key, key_repr
+from .log import channel
+from .tiles import MapOOB
+
+
+_log = channel('level')
+
+
+LEVEL_DIR = Path(__file__).parent.parent.parent / 'levels'
+
+
+def send_message(o, message, *a):
+    """
+    Safely calls a method on an object.
+    If the object doesn't have that method, returns None.
+    """
+    fn = getattr(o, message, None)
+    if not fn:
+        return None
+    return fn(*a)
+
+class Game:
+    # a replay.Recorder, if we're recording input
+    recorder = None
+
+    # should held movement keys repeat?
+    # replays turn this off: the recorded repeats are played back instead.
+    typematic = True
+
+    def __init__(self):
+        self.repeater = None
+
+        self.start = time.time()
+
+        # no callback: that way the clock can skip idle ticks
+        self.logics = Clock("logic", logic_interval)
+
+        self.key_handler = self
+
+        self.paused = False
+
+        self.repeaters = {}
+        for k in (
+            key.UP,
+            key.DOWN,
+            key.LEFT,
+            key.RIGHT,
+            ):
+            # a partial rather than a closure, so copy.deepcopy()
+            # of a game gives repeaters that call the copy
+            rk = functools.partial(self.on_key, k)
+            repeater = Clock(key_repr(k) + " repeater", typematic_interval, rk, delay=typematic_delay)
+            repeater.key = k
+            self.repeaters[k] = repeater
+
+    def timer(self, dt):
+        if self.repeater:
+            self.repeater.advance(dt)
+
+        if not self.paused:
+            # log(f"logics {self.logics} advance by dt {dt}")
+            self.logics.advance(dt)
+
+    def step(self, ticks=1):
+        """Advance the game by a whole number of logic ticks.
+
+        Unless a key is repeating, ticks where nothing happens
+        are skipped rather than simulated.
+        """
+        if self.repeater:
+            for _ in range(ticks):
+                self.timer(logic_interval)
+        elif not self.paused:
+            self.logics.run(ticks)
+
+    def transition_to(self, new_state):
+        self.state = new_state
+        _, _, name = str(new_state).rpartition(".")
+        send_message(self, "on_state_" + name)
+
+    def pause(self):
+        if self.paused:
+            return
+        self.paused = True
+        self.logics.paused = True
+
+    def unpause(self):
+        if not self.paused:
+            return
+        self.paused = False
+        self.logics.paused = False
+
+    def on_key_press(self, k, modifier):
+        k = interesting_key(k)
+        if k:
+            if self.recorder:
+                self.recorder.on_key_press(k)
+            # simulate typematic ourselves
+            # (we can't use pyglet's on_text_motion because we want this for WASD too)
+            repeater = self.typematic and self.repeaters.get(k)
+            if repeater:
+                repeater.reset()
+                self.repeater = repeater
+            r1 = send_message(self.key_handler, "on_key_press", k)
+            r2 = send_message(self.key_handler, "on_key", k)
+            return r1 or r2
+
+    def on_key_release(self, k, modifier):
+        k = interesting_key(k)
+        if k:
+            if self.recorder:
+                self.recorder.on_key_release(k)
+            if self.repeater and self.repeater.key == k:
+                self.repeater = None
+            return send_message(self.key_handler, "on_key_release", k)
+
+    def on_key(self, k):
+        k = interesting_key(k)
+        assert k
+        if k:
+            if self.recorder:
+                self.recorder.on_key_repeat(k)
+            return send_message(self.key_handler, "on_key", k)
+
+
+level_serial_number = 0
+
+class Level:
+    DEFAULT = MapOOB
+    loading = True
+    suppress_esc = False
+    level_finished = False
+
+    def set_map(self, map_data):
+        self.next = map_data.next
+        self.width = map_data.width
+        self.height = map_data.height
+        self.map = Grid(self.width, self.height, self.DEFAULT)
+        for coord, tile in map_data.tiles.items():
+            self.map[coord] = tile
+        self.tile_occupant = Grid(self.width, self.height)
+        self.tile_queue = Grid(self.width, self.height, factory=list)
+
+        for coord in self.coords():
+            tile = self.get(coord)
+            if tile.spawn_item:
+                occupant = self.tile_occupant[coord]
+                if occupant:
+                    assert isinstance(occupant, Claim)
+                    occupant.superceded()
+                o = tile.spawn_item(coord)
+                if isinstance(o, Player):
+                    if self.player:
+                        raise ValueError(f"Player set twice!  at {self.player.position} and {o.position}")
+                    self.player = o
+
+        if not self.player:
+            raise Exception("No player position set!")
+
+    def __init__(self):
+        global level_serial_number
+        self.serial_number = level_serial_number
+        level_serial_number += 1
+
+        self.start = time.time()
+        self.player = None
+        self.dams_remaining = 0
+
+    def __repr__(self):
+        return f'<Level #{self.serial_number}>'
+
+    def get(self, pos):
+        return self.map[pos]
+
+    def get_xy(self, x, y):
+        return self.map.get_xy(x, y)
+
+    def coords(self):
+        """Iterate over coordinates in the level."""
+        for y in range(self.height):
+            for x in range(self.width):
+                yield Vec2D(x, y)
+
+    def top_entity(self, coords):
+        """Get the top entity at the given coordinates, or None if empty."""
+        return self.tile_occupant[coords]
+
+    def on_dam_spawned(self, dam):
+        self.dams_remaining += 1
+        world.hooks.dams_remaining_changed(self)
+
+    def on_dam_destroyed(self, dam):
+        self.dams_remaining -= 1
+        world.hooks.dams_remaining_changed(self)
+        if not self.dams_remaining:
+            self.complete()
+
+    def player_died(self):
+        _log.info and _log.info("{} player was harmed", self)
+        if self.level_finished:
+            return
+        self.level_finished = True
+        world.game.pause()
+        self.suppress_esc = True
+        world.hooks.level_failed(self)
+
+    def complete(self):
+        Timer("on_complete", world.game.logics, 1, self.on_complete_timer)
+
+    def on_complete_timer(self):
+        if self.level_finished:
+            return
+        self.level_finished = True
+
+        if self.next == "finished":
+            return self.game_won()
+
+        _log.info and _log.info("{} level finished", self)
+        world.game.pause()
+        self.suppress_esc = True
+        world.hooks.level_complete(self)
+
+    def game_won(self):
+        if self.level_finished:
+            return
+        self.level_finished = True
+
+        _log.info and _log.info("{} you win!", self)
+        world.game.pause()
+        self.suppress_esc = True
+        world.hooks.game_won(self)
+
+    def pause(self):
+        if self.suppress_esc:
+            return
+        if world.game.paused:
+            return
+        _log.info and _log.info("{} Pausing game.", self)
+        world.game.pause()
+        world.hooks.level_paused(self)
+
+    def unpause(self):
+        if not world.game.paused:
+            return
+        world.game.unpause()
+
+
+def load_level(filename, scene=None, hooks=None, directory=None, any_size=False):
+    """Load a level and make it the current simulation.
+
+    scene and hooks attach the simulation to a display; leave
+    them out to run headless.  directory is where to find level
+    files; it defaults to LEVEL_DIR.  any_size allows maps that
+    aren't the size of the screen (see maploader.load_map).
+
+    Returns the new Level.  world.game has the logic clock.
+    """
+    game = Game()
+    level = Level()
+    level.loading = True
+    world.install(game, level, scene or NullScene(), hooks or Hooks())
+
+    _log.info and _log.info("loading level {}", filename)
+
+    map = load_map(filename, LEGEND_NAMESPACE, directory=str(directory or LEVEL_DIR), any_size=any_size)
+
+    level.set_map(map)
+    level.name = filename
+    level.mtime = map.mtime
+    level.legend_mtime = map.legend_mtime
+    level.map_data = map
+
+    # last-minute level fixups... it's complicated.
+    for entity in list(level.tile_occupant.values()):
+        if entity:
+            entity.on_level_loaded()
+
+    level.loading = False
+    return level
+
+
+def level_names(directory=None):
+    """The names of all the levels in directory (LEVEL_DIR by default)."""
+    directory = Path(directory or LEVEL_DIR)
+    return sorted(
+        path.stem
+        for path in directory.glob('*.txt')
+        if path.stem != 'legend'
+        )
+
+
+def _legend_namespace():
+    from . import entities, tiles
+    namespace = {}
+    for module in (tiles, entities):
+        namespace.update(
+            (k, v) for k, v in vars(module).items()
+            if not k.startswith('_')
+        )
+    return namespace
+
+# the names level legends are evaluated against
+LEGEND_NAMESPACE = _legend_namespace()
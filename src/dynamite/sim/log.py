@@ -0,0 +1,244 @@
+"""Tracing: what the simulation was thinking, when it's wanted.
+
+Messages go to channels, one per subsystem ("entity", "player",
+"bomb" and so on).  Each channel has its own level, and has a
+debug, info and warning attribute for each level of message.
+Those are None when that level is turned off, so a call site
+looks like this:
+
+    _log = channel('bomb')
+    ...
+    _log.debug and _log.debug("{} detonating at {}!", self, position)
+
+When it's off, that's one attribute check; the arguments aren't
+even evaluated.  When it's on, the message isn't formatted yet,
+it's recorded: the format string and arguments go in a ring
+buffer of the most recent messages (see recent()), and on to
+the log file, if there is one.  Formatting and writing the log
+file happen on a background thread.
+
+Arguments are formatted later, so anything mutable is turned
+into its repr() when it's recorded; otherwise an entity would
+show up with wherever it had got to by the time it was written.
+"""
+
+import atexit
+import collections
+from enum import Enum
+import queue
+import sys
+import threading
+import time
+
+from ..vec2d import Vec2D
+from . import world
+
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+OFF = 100
+
+LEVELS = {
+    'debug': DEBUG,
+    'info': INFO,
+    'warning': WARNING,
+    'off': OFF,
+    }
+_level_names = {v: k for k, v in LEVELS.items()}
+
+# how many of the most recent records recent() remembers
+RING_SIZE = 10000
+
+log_start_time = time.time()
+
+# a record is:
+#     (time, logic tick, channel name, level, function, line number, format, args)
+_ring = collections.deque(maxlen=RING_SIZE)
+
+# every channel, by name
+_channels = {}
+# the level for channels we haven't heard of yet
+_default_level = OFF
+
+_writer = None
+
+
+class Channel:
+    """Messages about one part of the simulation.
+
+    Get one with channel(); don't make these yourself.
+    """
+
+    def __init__(self, name, level):
+        self.name = name
+        self.set_level(level)
+
+    def __repr__(self):
+        return f"<Channel {self.name} {_level_names.get(self.level, self.level)}>"
+
+    def set_level(self, level):
+        """Record messages at level and above."""
+        self.level = level
+        self.debug = self._emitter(DEBUG)
+        self.info = self._emitter(INFO)
+        self.warning = self._emitter(WARNING)
+
+    def _emitter(self, level):
+        if level < self.level:
+            return None
+        name = self.name
+
+        def emit(format, *args):
+            caller = sys._getframe(1)
+            game = world.game
+            record = (
+                time.time(),
+                game.logics.counter if game else 0,
+                name,
+                level,
+                caller.f_code.co_name,
+                caller.f_lineno,
+                format,
+                tuple(_freeze(a) for a in args),
+                )
+            _ring.append(record)
+            if _writer:
+                _writer.queue.put(record)
+        return emit
+
+
+_immutable = {int, float, bool, str, type(None), Vec2D, type}
+
+
+class _Frozen(str):
+    """An argument's repr(), taken when it was logged.
+    Formats the same with {} or {!r}."""
+    __slots__ = ()
+
+    def __repr__(self):
+        return str(self)
+
+
+def _freeze(o):
+    if (type(o) in _immutable) or isinstance(o, Enum):
+        return o
+    return _Frozen(repr(o))
+
+
+def channel(name):
+    """Get the channel called name, making it if need be."""
+    c = _channels.get(name)
+    if c is None:
+        c = _channels[name] = Channel(name, _default_level)
+    return c
+
+
+def set_level(level, *names):
+    """
+    Set the level for the named channels.  With no names,
+    set it for every channel, including ones made later.
+
+    level can be DEBUG, INFO, WARNING or OFF, or its name.
+    """
+    global _default_level
+    if isinstance(level, str):
+        level = LEVELS[level.lower()]
+    if not names:
+        _default_level = level
+        names = _channels
+    for name in names:
+        channel(name).set_level(level)
+
+
+def configure(spec):
+    """
+    Set levels from a string like "info,player=debug,clock=off":
+    a bare level sets every channel, name=level sets just one.
+    """
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, level = item.rpartition('=')
+        if name:
+            set_level(level, name)
+        else:
+            set_level(level)
+
+
+def format_record(record):
+    t, counter, name, level, fn, lineno, format, args = record
+    try:
+        message = format.format(*args)
+    except Exception as e:
+        message = f"{format!r} % {args!r} (couldn't format: {e})"
+    return f"[{t - log_start_time:07.3f}:{counter:5}] {name} {fn}()@{lineno} {message}"
+
+
+def recent(n=None):
+    """The most recent n records (all we have, by default), formatted."""
+    records = list(_ring)
+    if n is not None:
+        records = records[-n:]
+    return [format_record(r) for r in records]
+
+
+def clear():
+    """Forget the records in the ring buffer."""
+    _ring.clear()
+
+
+class _Writer(threading.Thread):
+    """Formats records and writes them to the log file, off the main thread."""
+
+    def __init__(self, path):
+        super().__init__(name='dynamite log writer', daemon=True)
+        self.file = open(path, "wt")
+        self.queue = queue.SimpleQueue()
+
+    def run(self):
+        get = self.queue.get
+        running = True
+        while running:
+            records = [get()]
+            # write whatever's piled up in one go
+            while not self.queue.empty():
+                records.append(get())
+            if None in records:
+                records = records[:records.index(None)]
+                running = False
+            self.file.write(''.join(format_record(r) + '\n' for r in records))
+            self.file.flush()
+        self.file.close()
+
+    def stop(self):
+        self.queue.put(None)
+        self.join()
+
+
+def set_logfile(path, level=DEBUG if __debug__ else WARNING):
+    """Start writing the log to path, with every channel at level.
+
+    Without a log file, nothing is recorded (unless you turn
+    channels on with set_level() yourself); headless runs don't
+    want to pay for it.  Call set_level() or configure() after
+    this to pick different levels.  Pass None to stop.
+    """
+    global _writer
+    if _writer:
+        _writer.stop()
+        _writer = None
+    if not path:
+        set_level(OFF)
+        return
+    _writer = _Writer(path)
+    _writer.start()
+    set_level(level)
+
+
+@atexit.register
+def _close_logfile():
+    if _writer:
+        _writer.stop()
+
@@ -0,0 +1,281 @@
+"""Record keyboard input, and play it back as fast as possible.
+
+A recording is the level name plus every key event the Game saw,
+each tagged with the logic tick (game.logics.counter) it happened
+on.  The simulation only changes state on logic ticks, so replaying
+the events on the same ticks reproduces the playthrough exactly,
+however fast or slow the original machine was.
+
+The file format is tiny:
+
+    b'DVR1'
+    level name length (uint16) and the name, utf-8
+    then one 7-byte record per event:
+        tick (uint32)  kind (uint8)  key (uint16)
+
+Run this module to replay a recording and time it:
+
+    python -m dynamite.sim.replay recordings/level3-1.dvr
+"""
+
+import copy
+import math
+import struct
+import sys
+import time
+
+from . import world
+from .constants import logics_per_second
+from .level import load_level
+
+
+MAGIC = b'DVR1'
+
+KEY_PRESS = 0
+KEY_RELEASE = 1
+KEY_REPEAT = 2
+# recording stopped (the level ended or was restarted)
+END = 3
+
+_header = struct.Struct('<H')
+_event = struct.Struct('<IBH')
+
+
+class ReplayFormatError(Exception):
+    """The recording was in a bad format."""
+
+
+class Recording:
+    """The input events for one attempt at a level."""
+
+    def __init__(self, level_name, events=None):
+        self.level_name = level_name
+        # a list of (tick, kind, key)
+        self.events = events if events is not None else []
+
+    def __repr__(self):
+        return f'<Recording {self.level_name} {len(self.events)} events>'
+
+    @property
+    def last_tick(self):
+        return self.events[-1][0] if self.events else 0
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            _write_header(f, self.level_name)
+            for event in self.events:
+                f.write(_event.pack(*event))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if data[:len(MAGIC)] != MAGIC:
+            raise ReplayFormatError(f"{path} isn't a Dynamite Valley recording.")
+        offset = len(MAGIC)
+        length, = _header.unpack_from(data, offset)
+        offset += _header.size
+        level_name = data[offset:offset + length].decode('utf-8')
+        offset += length
+        body = data[offset:]
+        if len(body) % _event.size:
+            raise ReplayFormatError(f"{path} is truncated.")
+        return cls(level_name, list(_event.iter_unpack(body)))
+
+
+def _write_header(f, level_name):
+    name = level_name.encode('utf-8')
+    f.write(MAGIC)
+    f.write(_header.pack(len(name)))
+    f.write(name)
+
+
+class Recorder:
+    """Captures the input events that reach a Game.
+
+    Attach it with game.recorder = Recorder(game, level_name).
+    If you give it a path, every event is written out as it
+    happens, so a crash still leaves a usable recording.
+    """
+
+    def __init__(self, game, level_name, path=None):
+        self.game = game
+        self.recording = Recording(level_name)
+        self.file = None
+        if path:
+            self.file = open(path, 'wb')
+            _write_header(self.file, level_name)
+            self.file.flush()
+
+    def record(self, kind, k):
+        event = (self.game.logics.counter, kind, k)
+        self.recording.events.append(event)
+        if self.file:
+            self.file.write(_event.pack(*event))
+            self.file.flush()
+
+    def on_key_press(self, k):
+        self.record(KEY_PRESS, k)
+
+    def on_key_release(self, k):
+        self.record(KEY_RELEASE, k)
+
+    def on_key_repeat(self, k):
+        self.record(KEY_REPEAT, k)
+
+    def close(self):
+        """Stop recording."""
+        self.record(END, 0)
+        if self.game.recorder is self:
+            self.game.recorder = None
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class ReplayPlayer:
+    """Feeds a Recording back into a fresh copy of its level.
+
+    Every keyframe_interval ticks the player keeps a copy of the
+    whole simulation, so seek() only has to replay from the nearest
+    keyframe rather than from the start.
+    """
+
+    def __init__(self, recording, keyframe_interval=10 * logics_per_second, directory=None):
+        self.recording = recording
+        self.keyframe_interval = keyframe_interval
+        load_level(recording.level_name, directory=directory)
+        self.game.typematic = False
+        self.next_event = 0
+        # tick -> (index of next event, copy of the world)
+        self.keyframes = {}
+        self._keyframe()
+
+    @property
+    def game(self):
+        return world.game
+
+    @property
+    def level(self):
+        return world.level
+
+    @property
+    def tick(self):
+        return world.game.logics.counter
+
+    @property
+    def finished(self):
+        """True when we've run out of input.
+
+        A recording ends with an END event on the tick the game
+        stopped at, so we run exactly as many ticks as it did, even
+        when the level finished in the middle of a frame.
+        """
+        return self.next_event >= len(self.recording.events)
+
+    def _keyframe(self):
+        self.keyframes[self.tick] = (
+            self.next_event,
+            copy.deepcopy(world.current()),
+        )
+
+    def _dispatch(self):
+        events = self.recording.events
+        game = world.game
+        tick = game.logics.counter
+        while self.next_event < len(events):
+            event_tick, kind, k = events[self.next_event]
+            if event_tick > tick:
+                break
+            self.next_event += 1
+            if kind == KEY_PRESS:
+                game.on_key_press(k, 0)
+            elif kind == KEY_RELEASE:
+                game.on_key_release(k, 0)
+            elif kind == KEY_REPEAT:
+                game.on_key(k)
+
+    def _ticks_to_next_event(self, limit):
+        """How many ticks we can run before we have input to deliver.
+
+        Never runs past tick limit.
+        """
+        tick = limit
+        if not self.finished:
+            tick = min(tick, self.recording.events[self.next_event][0])
+        return tick - self.tick
+
+    def _advance(self, ticks=1):
+        """Run up to ticks logic ticks, skipping any idle ones.
+
+        Stops at the next keyframe, so it can be saved.
+        Returns the number of ticks run.
+        """
+        interval = self.keyframe_interval
+        ticks = min(ticks, interval - self.tick % interval)
+        ran = world.game.logics.run(ticks)
+        if not self.tick % interval and self.tick not in self.keyframes:
+            self._keyframe()
+        return ran
+
+    def step(self):
+        """Deliver this tick's input, then advance one logic tick."""
+        self._dispatch()
+        self._advance()
+
+    def play(self, ticks=None):
+        """Run until the input runs out.
+
+        If ticks is given, stop after at most that many ticks.
+        Returns the number of ticks run.
+        """
+        start = self.tick
+        limit = math.inf if ticks is None else start + ticks
+        while True:
+            self._dispatch()
+            if self.finished or self.tick >= limit:
+                break
+            # stretches with no input and no timers due cost nothing
+            if not self._advance(self._ticks_to_next_event(limit)):
+                # the game's paused, and no input will unpause it
+                break
+        return self.tick - start
+
+    def seek(self, tick):
+        """Put the simulation in the state it had at the given tick."""
+        best = max(t for t in self.keyframes if t <= tick)
+        if not (best <= self.tick <= tick):
+            next_event, state = self.keyframes[best]
+            world.install(*copy.deepcopy(state))
+            self.next_event = next_event
+        while self.tick < tick:
+            self._dispatch()
+            if not self._advance(self._ticks_to_next_event(tick)):
+                break
+
+
+def main(argv):
+    if not argv:
+        sys.exit("usage: python -m dynamite.sim.replay <recording> [<recording> ...]")
+    for path in argv:
+        recording = Recording.load(path)
+        start = time.perf_counter()
+        player = ReplayPlayer(recording)
+        ticks = player.play()
+        elapsed = time.perf_counter() - start
+        level = player.level
+        if level.player.dead:
+            outcome = 'died'
+        elif level.level_finished:
+            outcome = 'complete'
+        else:
+            outcome = f'{level.dams_remaining} dams remaining'
+        print(
+            f"{path}: {recording.level_name} {ticks} ticks "
+            f"({ticks / logics_per_second:.1f}s game time) in {elapsed:.3f}s, "
+            f"{ticks / elapsed:.0f} ticks/s, {outcome}"
+        )
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,393 @@
+"""Look for a solution to a level, by brute force.
+
+The search runs the real simulation.  Each step is one thing
+the player can do while standing still:
+
+    move <direction>   turn that way if need be, then walk a tile
+    take <direction>   turn that way, then "E" (pick up a bomb)
+    drop <direction>   turn that way, then "B" (drop a bomb)
+    trigger            "T" (set off the oldest remote control bomb)
+    wait               stand there until something happens
+
+and every step but waiting counts as a move.  After each step we
+let the game run until the player stops moving, and carry on from
+there.  A wait runs the game until the signature (see signature())
+changes: a bomb goes off, something drifts into the next tile, a
+fuse gets frozen.  So however long a fuse is, burning it down is
+one wait, not one step for every tick of it.
+
+States with the same signature are only explored once.  The search
+is over the whole level, cheapest-first, so the first win it finds
+takes the fewest moves there are (for the states it can tell apart).
+
+This is only a check for small levels.  It finishes most of the
+tutorials in seconds to a minute or so, but the states multiply
+with every bomb the player could drop in the water, and on the real
+levels it gives up long before it finds anything.  Giving up says
+nothing either way about whether a level can be won.
+
+Run this module to try it:
+
+    python -m dynamite.sim.solver              (every level)
+    python -m dynamite.sim.solver tutorial1 tutorial4
+
+It exits with status 1 if it couldn't solve one of them, or if
+the simulation raised an exception (it prints the traceback and
+goes on to the next level).
+"""
+
+import heapq
+import pickle
+import sys
+import time
+import traceback
+
+from . import keys as key
+from . import world
+from .clock import Timer
+from .constants import logics_per_second
+from .entities import Claim, Entity, PlayerAnimationState, key_to_movement_delta, key_to_orientation
+from .level import level_names, load_level
+from .tiles import OCCUPIABLE_BY_BOMB
+
+
+# the longest "wait" waits for something to happen
+MAX_WAIT_TICKS = 10 * logics_per_second
+
+DIRECTIONS = {
+    key.UP: 'up',
+    key.DOWN: 'down',
+    key.LEFT: 'left',
+    key.RIGHT: 'right',
+    }
+
+
+class Solution:
+    """The steps that beat a level, and what they cost.
+
+    If the search gave up, steps is None.
+    """
+
+    def __init__(self, level_name, steps, states, elapsed, ticks=None):
+        self.level_name = level_name
+        # a list of (verb, key) pairs; key is None for wait and trigger
+        self.steps = steps
+        # how many logic ticks playing the steps takes
+        self.ticks = ticks
+        # how many different states the search found
+        self.states = states
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        if not self.solved:
+            return f'<Solution {self.level_name} unsolved>'
+        return f'<Solution {self.level_name} {self.moves} moves>'
+
+    @property
+    def solved(self):
+        return self.steps is not None
+
+    @property
+    def moves(self):
+        return sum(1 for verb, k in self.steps if verb != 'wait')
+
+    @property
+    def duration(self):
+        """How long playing the solution takes, in seconds."""
+        return self.ticks / logics_per_second
+
+    def describe(self):
+        """The steps as a short string, like 'take down, move right, wait x20'."""
+        words = []
+        waits = 0
+        for verb, k in self.steps + [(None, None)]:
+            if verb == 'wait':
+                waits += 1
+                continue
+            if waits:
+                words.append('wait' if waits == 1 else f'wait x{waits}')
+                waits = 0
+            if verb:
+                words.append(f'{verb} {DIRECTIONS[k]}' if k else verb)
+        return ', '.join(words)
+
+
+class Snapshots:
+    """
+    Pickles the whole simulation, and puts it back.
+
+    The map never changes, and some of it (the legend's
+    factory lambdas) can't be pickled anyway, so it's left
+    out of the pickle and shared between all the copies.
+    """
+
+    def __init__(self, level):
+        self.map = level.map
+        self.map_data = level.map_data
+
+    def save(self):
+        state = world.current()
+        level = state[1]
+        level.map = level.map_data = None
+        try:
+            return pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+        finally:
+            level.map = self.map
+            level.map_data = self.map_data
+
+    def restore(self, data):
+        state = pickle.loads(data)
+        level = state[1]
+        level.map = self.map
+        level.map_data = self.map_data
+        world.install(*state)
+
+
+def _timer_owner(timer):
+    """Something that says whose timer this is, but not when it started."""
+    owner = getattr(timer.callback, '__self__', None)
+    if owner is None:
+        return None
+    if hasattr(owner, 'end'):
+        # an Animator
+        return owner.start, owner.end
+    return getattr(owner, 'position', None)
+
+
+def signature(game, level):
+    """
+    Boil the simulation down to the things that matter for the
+    rest of the level.
+
+    This is deliberately coarse.  It has what's where, and the
+    order the running timers will go off in, but not how long
+    any of them has left (nor the logic counter, nor which way
+    the player's facing).  So a bomb dropped now and the same
+    bomb dropped a few steps later look the same, and so do a
+    fuse before and after a wait.  Two states with the same
+    signature don't always play out the same way; the search
+    treats them as if they do.
+    """
+    occupants = []
+    for position, e in level.tile_occupant.items():
+        occupants.append((position, type(e).__name__))
+        if isinstance(e, Claim):
+            continue
+        # a frozen bomb's fuse is paused, so it's not on the clock
+        for value in vars(e).values():
+            if isinstance(value, Timer) and value.paused:
+                occupants.append((position, value.name))
+    timers = sorted(
+        (t.due, getattr(t.callback, '__qualname__', ''), repr(_timer_owner(t)))
+        for t in game.logics.timers
+        if t.due is not None
+        )
+    player = level.player
+    return (
+        tuple(occupants),
+        tuple(timer[1:] for timer in timers),
+        tuple(bomb.__name__ for bomb in player.bombs),
+        len(player.remote_control_bombs),
+        type(player.standing_on).__name__,
+        level.dams_remaining,
+        )
+
+
+def _press(game, k):
+    game.on_key_press(k, 0)
+    game.on_key_release(k, 0)
+
+
+def _face(game, player, k):
+    if player.orientation != key_to_orientation[k]:
+        _press(game, k)
+
+
+def _reacts_to_bombs(e):
+    cls = type(e)
+    return (cls.on_blasted is not Entity.on_blasted) or (cls.on_frozen is not Entity.on_frozen)
+
+
+def _worth_dropping(level, bomb_type, position):
+    """
+    Could a bomb dropped here do anything?
+
+    Bombs in the water drift and get skipped about, so
+    they're always worth a try.  On dry land, a bomb that
+    can't reach anything but the player is just a way to
+    waste time (or die).
+    """
+    if level.get(position).water:
+        return True
+    x, y = position
+    for dx, dy in bomb_type.blast_pattern.coordinates:
+        e = level.tile_occupant.get_xy(x + dx, y + dy)
+        if e and (e is not level.player) and _reacts_to_bombs(e):
+            return True
+    return False
+
+
+def possible_steps(level):
+    """The steps that could do anything, for a player standing still."""
+    player = level.player
+    can_carry = len(player.bombs) < player.MAX_BOMBS
+    steps = []
+    for k, delta in key_to_movement_delta.items():
+        position = player.position + delta
+        if player.can_move_to(position):
+            steps.append(('move', k))
+        if (player.bombs
+            and player.can_move_to(position, OCCUPIABLE_BY_BOMB)
+            and _worth_dropping(level, player.bombs[-1], position)):
+            steps.append(('drop', k))
+        occupant = level.top_entity(position)
+        if (can_carry
+            and occupant
+            and (type(occupant).interact is not Entity.interact)):
+            steps.append(('take', k))
+    if player.remote_control_bombs:
+        steps.append(('trigger', None))
+    steps.append(('wait', None))
+    return steps
+
+
+def _wait(game, level):
+    """
+    Run the game until the signature changes, skipping straight
+    over the ticks where nothing's due.  Returns False if nothing
+    happened (or nothing could).
+    """
+    clock = game.logics
+    before = signature(game, level)
+    limit = clock.counter + MAX_WAIT_TICKS
+    while (clock.counter < limit) and not game.paused:
+        due = clock.next_due()
+        if due is None:
+            return False
+        game.step(max(1, min(due, limit) - clock.counter))
+        if signature(game, level) != before:
+            return True
+    return False
+
+
+def take_step(game, level, step):
+    """
+    Do step, then run the game until the player is standing still
+    (and, if that was the last dam, until the level notices).
+
+    Returns False if it was a wait and there was nothing to wait for.
+    """
+    verb, k = step
+    player = level.player
+    if verb == 'wait':
+        if not _wait(game, level):
+            return False
+    elif verb == 'trigger':
+        _press(game, key.T)
+    else:
+        _face(game, player, k)
+        if verb == 'move':
+            _press(game, k)
+        elif verb == 'take':
+            _press(game, key.E)
+        elif verb == 'drop':
+            _press(game, key.B)
+    while (player.moving != PlayerAnimationState.STATIONARY) and not game.paused:
+        game.step()
+    if not level.dams_remaining:
+        game.step(2)
+    return True
+
+
+def _alive(player):
+    # (stepping onto a floating bomb as it drifts off can leave
+    # the player nowhere at all; that's no better than dead)
+    return not (player.dead or (player.position is None))
+
+
+def solve(level_name, max_states=20000, directory=None):
+    """
+    Look for the fewest moves that win a level.
+
+    Only the states we explore get pickled.  The rest are kept as
+    the pickled state they came from and the step that got there,
+    and replayed if we get round to them; most never are.
+
+    Gives up after finding max_states different states.
+    Exceptions in the simulation aren't caught.
+    """
+    start = time.perf_counter()
+    level = load_level(level_name, directory=directory)
+    world.game.typematic = False
+    snapshots = Snapshots(level)
+    root = signature(world.game, level)
+    # signature -> (moves, the signature we got here from, the step we took)
+    best = {root: (0, None, None)}
+    # signature -> (pickled simulation, step), for the ones we haven't explored yet
+    pending = {root: (snapshots.save(), None)}
+    heap = [(0, 0, root, False)]
+    serial = 0
+
+    while heap and (len(best) < max_states):
+        moves, _, sig, won = heapq.heappop(heap)
+        if moves > best[sig][0]:
+            continue
+        data, step = pending.pop(sig)
+        snapshots.restore(data)
+        if step:
+            take_step(world.game, world.level, step)
+        if won:
+            ticks = world.game.logics.counter
+            steps = []
+            while best[sig][1] is not None:
+                _, sig, step = best[sig]
+                steps.append(step)
+            steps.reverse()
+            return Solution(level_name, steps, len(best), time.perf_counter() - start, ticks)
+        data = snapshots.save()
+
+        for i, step in enumerate(possible_steps(world.level)):
+            if i:
+                snapshots.restore(data)
+            game, level = world.game, world.level
+            if not (take_step(game, level, step) and _alive(level.player)):
+                continue
+            new_sig = signature(game, level)
+            new_moves = moves + (step[0] != 'wait')
+            if new_moves < best.get(new_sig, (new_moves + 1,))[0]:
+                best[new_sig] = (new_moves, sig, step)
+                pending[new_sig] = (data, step)
+                serial += 1
+                heapq.heappush(heap, (new_moves, serial, new_sig, level.level_finished))
+    return Solution(level_name, None, len(best), time.perf_counter() - start)
+
+
+def main(argv):
+    max_states = 20000
+    if argv and argv[0].startswith('--max-states='):
+        max_states = int(argv.pop(0).partition('=')[2])
+    names = argv or level_names()
+    failed = False
+    for name in names:
+        try:
+            solution = solve(name, max_states=max_states)
+        except Exception:
+            failed = True
+            print(f"{name}: the simulation raised an exception")
+            traceback.print_exc()
+            continue
+        if not solution.solved:
+            failed = True
+            print(f"{name}: gave up after {solution.states} states ({solution.elapsed:.1f}s)")
+            continue
+        print(
+            f"{name}: {solution.moves} moves, {solution.duration:.1f}s of play, "
+            f"{solution.states} states ({solution.elapsed:.1f}s)\n"
+            f"    {solution.describe()}"
+        )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,158 @@
+"""Make up huge levels, to see how the simulation scales.
+
+The real levels are all one screen, 12 x 13.  These can be any
+size: the map is tiled with cells, each a loop of current going
+round clockwise with an island in the middle.  A fraction of the
+current carries logs (hundreds of them, on a big map), and the
+islands have contact bombs and dams in ponds, at whatever
+densities you ask for.  Anything left over at the right and
+bottom edges is still water.  The player starts on the first
+island.
+
+They're meant for the simulation and the benchmarks, not for
+playing: they need load_level(any_size=True), and the game
+can't show anything bigger than a screen.  Run this module to
+write one:
+
+    python -m dynamite.sim.stress stress                (48x52)
+    python -m dynamite.sim.stress --size=96x104 --logs=0.5 --seed=3 huge
+
+The level goes in the current directory (or --directory), with
+a copy of legend.txt if there isn't one there already.
+"""
+
+import os
+import random
+import shutil
+import sys
+
+from ..coords import TILES_W, TILES_H
+from ..maploader import LEGEND_FILENAME
+from .level import LEVEL_DIR
+
+
+# how big a cell is, current and all
+CELL = 6
+
+# the default densities: of the current, and of the islands
+LOGS = 0.3
+BOMBS = 0.1
+DAMS = 0.05
+
+# the symbols for the current going round a cell, and for
+# the same with a log on it
+LOG_ON = {'>': '}', 'v': 'V', '<': '{', '^': 'A'}
+
+LEGEND = """\
+} MapWaterCurrentRight + Log
+V MapWaterCurrentDown + Log
+{ MapWaterCurrentLeft + Log
+A MapWaterCurrentUp + Log
+! MapGrass + ContactBomb
+D MapWater + Dam
+"""
+
+
+def _ring(cell):
+    """The edge of a cell going round clockwise, as (x, y, current) tuples."""
+    last = cell - 1
+    for x in range(last):
+        yield x, 0, '>'
+    for y in range(last):
+        yield last, y, 'v'
+    for x in range(last, 0, -1):
+        yield x, last, '<'
+    for y in range(last, 0, -1):
+        yield 0, y, '^'
+
+
+def generate(width, height, logs=LOGS, bombs=BOMBS, dams=DAMS, cell=CELL, seed=0):
+    """Return the text of a width x height stress level.
+
+    logs is the fraction of the current with a log on it;
+    bombs and dams are the fractions of the island squares
+    with a contact bomb, or a dam.  The same arguments always
+    make the same level.
+    """
+    if cell < 3:
+        raise ValueError(f"cells must be at least 3 squares across (not {cell})")
+    if (width < cell) or (height < cell):
+        raise ValueError(f"a stress level must be at least {cell}x{cell} (not {width}x{height})")
+    rng = random.Random(seed)
+    rows = [['.'] * width for _ in range(height)]
+    for top in range(0, height - cell + 1, cell):
+        for left in range(0, width - cell + 1, cell):
+            for x, y, current in _ring(cell):
+                if rng.random() < logs:
+                    current = LOG_ON[current]
+                rows[top + y][left + x] = current
+            for y in range(top + 1, top + cell - 1):
+                for x in range(left + 1, left + cell - 1):
+                    r = rng.random()
+                    if r < dams:
+                        rows[y][x] = 'D'
+                    elif r < dams + bombs:
+                        rows[y][x] = '!'
+                    else:
+                        rows[y][x] = '#'
+    rows[1][1] = 'S'
+    # (a level with no dams is over as soon as it starts)
+    if not any('D' in row for row in rows):
+        rows[cell - 2][cell - 2] = 'D'
+
+    lines = [''.join(row) for row in rows]
+    lines += [
+        '',
+        'Legend',
+        LEGEND,
+        f':title: Stress test, {width}x{height}',
+        f':seed: {seed}',
+        ':next: finished',
+        '',
+    ]
+    return '\n'.join(lines)
+
+
+def write_level(directory, name, width, height, **kwargs):
+    """Write a stress level to directory/name.txt.
+
+    Copies the legend there too, if there isn't one.  kwargs
+    are passed to generate().  Returns the path written.
+    """
+    if not os.path.exists(os.path.join(directory, LEGEND_FILENAME)):
+        shutil.copy(LEVEL_DIR / LEGEND_FILENAME, directory)
+    path = os.path.join(directory, f'{name}.txt')
+    with open(path, 'w') as f:
+        f.write(generate(width, height, **kwargs))
+    return path
+
+
+def main(argv):
+    width, height = TILES_W * 4, TILES_H * 4
+    directory = '.'
+    kwargs = {}
+    usage = "usage: python -m dynamite.sim.stress [--size=WxH] [--logs=F] [--bombs=F] [--dams=F] [--cell=N] [--seed=N] [--directory=PATH] name"
+    while argv and argv[0].startswith('--'):
+        option, _, value = argv.pop(0).partition('=')
+        if option == '--size':
+            width, _, height = value.partition('x')
+            width, height = int(width), int(height)
+        elif option in ('--logs', '--bombs', '--dams'):
+            kwargs[option[2:]] = float(value)
+        elif option in ('--cell', '--seed'):
+            kwargs[option[2:]] = int(value)
+        elif option == '--directory':
+            directory = value
+        else:
+            sys.exit(usage)
+    if len(argv) != 1:
+        sys.exit(usage)
+    try:
+        path = write_level(directory, argv[0], width, height, **kwargs)
+    except ValueError as e:
+        sys.exit(str(e))
+    print(f"wrote {path}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,86 @@
+import copy
+
+from ..vec2d import Vec2D
+
+
+OCCUPIABLE_BY_PLAYER = 1
+OCCUPIABLE_BY_BOMB   = 2
+
+
+class TileMeta(type):
+    def __add__(self, ano):
+        return self() + ano
+
+
+class MapTile(metaclass=TileMeta):
+    water = False
+    moving_water = False
+    spawn_item = None
+    navigability = OCCUPIABLE_BY_PLAYER | OCCUPIABLE_BY_BOMB
+    obj_factory = None
+
+    def spawn_item(self, pos=None):
+        if pos is None:
+            return None
+        if self.obj_factory:
+            return self.obj_factory(pos)
+
+    def __add__(self, ano):
+        if self.obj_factory:
+            raise TypeError(f"{self} already has an obj_factory")
+        o = copy.copy(self)
+        o.obj_factory = ano
+        return o
+
+class MapOOB(MapTile):
+    water = False
+    moving_water = False
+    spawn_item = None
+    obj_factory = None
+    navigability = 0
+
+
+class MapWater(MapTile):
+    current = Vec2D(0, 0)
+    water = True
+    navigability = OCCUPIABLE_BY_BOMB
+
+
+class MapMovingWater(MapWater):
+    moving_water = True
+
+class MapWaterCurrentUp(MapMovingWater):
+    current = Vec2D(0, -1)
+
+class MapWaterCurrentLeft(MapMovingWater):
+    current = Vec2D(-1, 0)
+
+class MapWaterCurrentRight(MapMovingWater):
+    current = Vec2D(1, 0)
+
+class MapWaterCurrentDown(MapMovingWater):
+    current = Vec2D(0, 1)
+
+
+
+class MapGrass(MapTile):
+    navigability = OCCUPIABLE_BY_PLAYER | OCCUPIABLE_BY_BOMB
+
+
+class LandSpawn(MapGrass):
+    def __init__(self, entity_type, *args, **kwargs):
+        self.type = entity_type
+        self.args = args
+        self.kwargs = kwargs
+
+    def spawn_item(self, pos):
+        return self.type(pos, *self.args, **self.kwargs)
+
+
+class MapScenery(MapGrass):
+    def __init__(self, sprite):
+        self.sprite = sprite
+
+    def spawn_item(self, pos):
+        from .entities import Scenery
+        return Scenery(pos, self.sprite)
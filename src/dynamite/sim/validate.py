@@ -0,0 +1,172 @@
+"""Check every level file for mistakes, without opening the game.
+
+Each level is loaded just the way the game loads it (so all its
+entities get spawned), then left alone for a while so anything in
+the water drifts about.  Most levels have nothing drifting until
+the player drops a bomb, so we drop one for them: an unlit bomb
+in the current, if there is one.  Along the way we check that:
+
+    there's exactly one player
+    there's at least one dam, and dams_remaining agrees
+    tile_occupant is consistent: everything in it is where it
+        thinks it is, and nothing is in it twice
+
+Levels are checked in parallel, one per process.  Run this module:
+
+    python -m dynamite.sim.validate              (every level)
+    python -m dynamite.sim.validate level3 tutorial1
+    python -m dynamite.sim.validate --seconds=30 --jobs=4 --directory=mylevels
+    python -m dynamite.sim.validate --any-size --directory=/tmp/stress
+
+It exits with status 1 if any level had a problem.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import os
+import sys
+import time
+
+from . import world
+from .constants import logics_per_second
+from .entities import Claim, Dam, Player, TimedBomb
+from .level import level_names, load_level
+
+
+def check_level(level):
+    """Return a list of the things wrong with level right now."""
+    problems = []
+    seen = {}
+    players = []
+    dams = 0
+
+    def found(e, where):
+        if e in seen:
+            problems.append(f"{e} is in tile_occupant at {seen[e]} and {where}")
+        seen[e] = where
+
+    for position, e in level.tile_occupant.items():
+        found(e, position)
+        if isinstance(e, Claim):
+            if e.position != position:
+                problems.append(f"{e} is at {position} but thinks it's at {e.position}")
+            if e.owner.claim is not e:
+                problems.append(f"{e} at {position} isn't its owner's claim")
+            continue
+        if e.position != position:
+            problems.append(f"{e} is at {position} but thinks it's at {e.position}")
+        if isinstance(e, Dam):
+            dams += 1
+        rider = e.occupant
+        if isinstance(e, Player):
+            players.append(e)
+        elif rider and not isinstance(rider, Claim):
+            found(rider, position)
+            if rider.standing_on is not e:
+                problems.append(f"{rider} is on {e} at {position}, but thinks it's standing on {rider.standing_on}")
+            if isinstance(rider, Player):
+                players.append(rider)
+
+    if len(players) != 1:
+        problems.append(f"there should be one player, found {len(players)}")
+    elif players[0] is not level.player:
+        problems.append(f"level.player is {level.player}, but the player on the map is {players[0]}")
+    if dams != level.dams_remaining:
+        problems.append(f"found {dams} dams, but dams_remaining is {level.dams_remaining}")
+    return problems
+
+
+def seed_bomb(level):
+    """
+    Drop an unlit bomb on the first free square of moving water
+    that flows into more water, so the current has something to
+    carry.  Returns the bomb, or None if there's nowhere to put it.
+    """
+    for position in level.coords():
+        tile = level.get(position)
+        if (tile.moving_water
+            and level.get(position + tile.current).water
+            and not level.tile_occupant[position]
+            and not level.tile_queue[position]):
+            return TimedBomb(position, lit=False)
+    return None
+
+
+def validate_level(name, seconds=10, directory=None, any_size=False):
+    """
+    Load the level called name, let it run for seconds (of
+    game time) with nobody touching the keyboard, and return
+    a list of everything wrong with it.  any_size allows
+    levels of any size, like the ones dynamite.sim.stress makes.
+
+    The level is checked straight after loading; then we seed
+    a drifting bomb (see seed_bomb()), and check it once a
+    second.  We stop at the first second with any problems.
+    """
+    try:
+        level = load_level(name, directory=directory, any_size=any_size)
+    except Exception as e:
+        return [f"couldn't load: {type(e).__name__}: {e}"]
+
+    problems = check_level(level)
+    if not level.dams_remaining:
+        problems.append("there are no dams")
+    if not problems:
+        seed_bomb(level)
+    game = world.game
+    for second in range(int(seconds)):
+        if problems:
+            break
+        try:
+            game.step(logics_per_second)
+        except Exception as e:
+            return problems + [f"crashed after {second}s: {type(e).__name__}: {e}"]
+        problems = [f"after {second + 1}s: {problem}" for problem in check_level(level)]
+    return problems
+
+
+def validate_levels(names, seconds=10, directory=None, jobs=None, any_size=False):
+    """
+    Validate the levels called names, spread over jobs processes
+    (one per CPU by default).  Yields (name, problems) in order.
+    """
+    validate = functools.partial(validate_level, seconds=seconds, directory=directory, any_size=any_size)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from zip(names, executor.map(validate, names))
+
+
+def main(argv):
+    seconds = 10
+    directory = jobs = None
+    any_size = False
+    while argv and argv[0].startswith('--'):
+        option, _, value = argv.pop(0).partition('=')
+        if option == '--seconds':
+            seconds = int(value)
+        elif option == '--jobs':
+            jobs = int(value)
+        elif option == '--directory':
+            directory = value
+        elif option == '--any-size':
+            any_size = True
+        else:
+            sys.exit("usage: python -m dynamite.sim.validate [--seconds=N] [--jobs=N] [--directory=PATH] [--any-size] [level ...]")
+    names = argv or level_names(directory)
+    start = time.perf_counter()
+    failed = 0
+    for name, problems in validate_levels(names, seconds, directory, jobs, any_size):
+        if not problems:
+            print(f"{name}: ok")
+            continue
+        failed += 1
+        print(f"{name}:")
+        for problem in problems:
+            print(f"    {problem}")
+    elapsed = time.perf_counter() - start
+    print(f"{len(names)} levels, {failed} with problems, in {elapsed:.2f}s ({jobs or os.cpu_count()} processes)")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
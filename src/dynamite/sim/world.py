@@ -0,0 +1,24 @@
+"""The simulation currently being run.
+
+Entities find the game, level, scene and hooks they belong to here,
+the same way game.py used to keep them in module globals.
+"""
+
+game = None
+level = None
+scene = None
+hooks = None
+
+
+def install(new_game, new_level, new_scene, new_hooks):
+    """Make these the current simulation objects."""
+    global game, level, scene, hooks
+    game = new_game
+    level = new_level
+    scene = new_scene
+    hooks = new_hooks
+
+
+def current():
+    """Return the current (game, level, scene, hooks)."""
+    return game, level, scene, hooks
@@ -10,6 +10,7 @@ from pyglet.text import Label
 import pyglet.window.key as key
 
 from . import animation
+from . import atlas
 from .scene import AnchoredImg
 from .ninepatch import NinePatch
 
@@ -110,7 +111,7 @@ class Screen:
             if isinstance(spr, AnchoredImg):
                 s = self.sprites[spr.name] = spr.load()
             else:
-                s = self.sprites[spr] = pyglet.resource.image(f'{spr}.png')
+                s = self.sprites[spr] = atlas.image(f'{spr}.png')
                 s.anchor_x = s.width // 2
                 s.anchor_y = 10
 
@@ -233,25 +234,21 @@ class IntroScreen(Screen):
     def __init__(self, window, map, on_finished=None):
         self.map = map
         super().__init__(window, on_finished=on_finished)
+        savefile_save(self.map.name)
+
+    def start(self):
         self.box_bg = NinePatch(
             self.sprites['box-background'],
-            border_size=10
+            border_size=10,
+            batch=self.batch,
+            group=pyglet.graphics.OrderedGroup(-1),
         )
-        savefile_save(self.map.name)
-
-    def on_draw(self):
-        gl.glClearColor(*self.BGCOLOR, 0)
-        self.window.clear()
-        self.box_bg.draw(
+        self.box_bg.place(
             80,
             80,
             self.window.width - 160,
             self.window.height - 160
         )
-        self.batch.draw()
-        return EVENT_HANDLED
-
-    def start(self):
         self.title = pyglet.sprite.Sprite(
             self.sprites['dynamite-valley'],
             x=self.window.width // 2 - 120,
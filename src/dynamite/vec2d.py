@@ -1,65 +1,74 @@
+from collections import namedtuple
 
-class Vec2D:
-    __slots__ = ('x', 'y')
 
-    def __init__(self, x, y=None):
+_new = tuple.__new__
+
+
+class Vec2D(namedtuple('_Vec2D', 'x y')):
+    """
+    A 2D vector.
+
+    It's a tuple underneath, so hashing, comparing, unpacking and
+    reading .x and .y all happen in C, and it can be used anywhere
+    an (x, y) tuple can.  That also means it's immutable: v += d
+    makes a new one.
+    """
+    __slots__ = ()
+
+    def __new__(cls, x, y=None):
         if x is None:
             raise ValueError("can't make Vec2D from None")
         if y is None:
+            if type(x) is cls:
+                return x
             x, y = x
-        self.x = x
-        self.y = y
+        return _new(cls, (x, y))
 
     def __add__(self, o):
-        x, y = Vec2D(o)
-        return type(self)(self.x + x, self.y + y)
+        x, y = self
+        ox, oy = o
+        return _new(type(self), (x + ox, y + oy))
+
+    __radd__ = __add__
 
     def __sub__(self, o):
-        x, y = Vec2D(o)
-        return type(self)(self.x - x, self.y - y)
+        x, y = self
+        ox, oy = o
+        return _new(type(self), (x - ox, y - oy))
+
+    def __rsub__(self, o):
+        x, y = self
+        ox, oy = o
+        return _new(type(self), (ox - x, oy - y))
 
     def __mul__(self, o):
-        if isinstance(o, (tuple, list, Vec2D)):
-            x, y = o
-        else:
-            x = o
-            y = o
-        return Vec2D(self.x * x, self.y * y)
-
-    def __getitem__(self, idx):
-        if idx == 0:
-            return self.x
-        elif idx == 1:
-            return self.y
+        if isinstance(o, (tuple, list)):
+            ox, oy = o
         else:
-            raise IndexError(f'Index {idx} out of range for {type(self)}')
-
-    def __iter__(self):
-        yield self.x
-        yield self.y
+            ox = oy = o
+        x, y = self
+        return _new(Vec2D, (x * ox, y * oy))
 
-    def __len__(self):
-        return 2
+    __rmul__ = __mul__
 
-    def __eq__(self, o):
-        try:
-            ox, oy = o
-        except Exception:
-            return False
+    def __bool__(self):
         x, y = self
-        return ox == x and oy == y
+        return bool(x or y)
 
-    def __bool__(self):
-        return bool(self.x or self.y)
+    # they're immutable, so a copy may as well be the same object
+    def __copy__(self):
+        return self
 
-    def __hash__(self):
-        return hash(tuple(self))
+    def __deepcopy__(self, memo):
+        return self
 
     def __repr__(self):
-        return f"Vec2D({self.x}, {self.y})"
+        x, y = self
+        return f"Vec2D({x}, {y})"
 
     def __str__(self):
         return self.__repr__()
 
     def manhattan_distance(self):
-        return abs(self.x) + abs(self.y)
\ No newline at end of file
+        x, y = self
+        return abs(x) + abs(y)
@@ -0,0 +1,75 @@
+"""The atlas is built when it's missing, and again when the images change.
+
+    % python3 -m unittest discover tests
+"""
+
+import os.path
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from dynamite import drawstats
+
+
+def setUpModule():
+    global atlas, png
+    drawstats.use_stub_gl()
+    drawstats.use_stub_images()
+    from dynamite import atlas
+    from pyglet.extlibs import png
+
+
+def write_png(path, width, height, value=255):
+    rows = [[value] * (width * 4)] * height
+    with open(path, 'wb') as f:
+        png.Writer(width, height, alpha=True).write(f, rows)
+
+
+class AtlasTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.images = Path(tmp.name)
+        self.atlas = self.images / 'atlas'
+        write_png(self.images / 'a.png', 8, 8)
+        write_png(self.images / 'b.png', 4, 6)
+        # too big for a page
+        write_png(self.images / 'big.png', 80, 4)
+
+    def build(self):
+        return atlas.build(self.images, self.atlas, page_size=64)
+
+    def test_up_to_date(self):
+        self.assertFalse(atlas.up_to_date(self.images, self.atlas))
+        manifest = self.build()
+        self.assertEqual(sorted(manifest['images']), ['a.png', 'b.png'])
+        self.assertTrue(atlas.up_to_date(self.images, self.atlas))
+
+    def test_changed_images_are_out_of_date(self):
+        self.build()
+        write_png(self.images / 'b.png', 5, 6)
+        self.assertFalse(atlas.up_to_date(self.images, self.atlas))
+        self.build()
+        write_png(self.images / 'c.png', 2, 2)
+        self.assertFalse(atlas.up_to_date(self.images, self.atlas))
+        self.build()
+        (self.images / 'big.png').unlink()
+        self.assertFalse(atlas.up_to_date(self.images, self.atlas))
+
+    def test_load_builds_if_needed(self):
+        self.addCleanup(setattr, atlas, '_regions', None)
+        atlas.load(self.images, self.atlas, build_if_needed=False)
+        self.assertEqual(atlas._regions, {})
+        atlas.load(self.images, self.atlas)
+        self.assertTrue(atlas.up_to_date(self.images, self.atlas))
+        # (on a full-size page, even big.png fits)
+        self.assertEqual(sorted(atlas._regions), ['a.png', 'b.png', 'big.png'])
+        self.assertEqual((atlas._regions['b.png'].width, atlas._regions['b.png'].height), (4, 6))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+"""Timers tick in the order they were started, one turn each per tick.
+
+    % python3 -m unittest discover tests
+"""
+
+import os.path
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from dynamite import sim
+from dynamite.sim import keys
+from dynamite.sim.replay import KEY_PRESS, KEY_RELEASE, END, Recording, ReplayPlayer
+
+
+# walk down, take a bomb, walk up, drop it, walk up: all on tick 0.
+# the player's animator gets rerouted on the tick its timer is due,
+# before that timer's turn.
+REROUTE_KEYS = (keys.DOWN, keys.E, keys.UP, keys.B, keys.UP)
+REROUTE_TICKS = 200
+
+
+def run(clock, ticks):
+    for _ in range(ticks):
+        clock.advance(1)
+
+
+class TimerTurnTest(unittest.TestCase):
+
+    def test_elapsed_counts_tick_once_turn_has_come(self):
+        clock = sim.Clock('test', 1)
+        seen = []
+        first = sim.Timer('first', clock, 3, lambda: seen.append(second.elapsed))
+        second = sim.Timer('second', clock, 3, lambda: seen.append(first.elapsed))
+        run(clock, 3)
+        # first ran before second's turn; second ran after first's
+        self.assertEqual(seen, [2, 3])
+        self.assertTrue(first.finished and second.finished)
+
+    def test_started_mid_tick_counts_this_tick(self):
+        clock = sim.Clock('test', 1)
+        started = {}
+        seen = []
+
+        def start():
+            started['short'] = sim.Timer('short', clock, 1, lambda: seen.append(clock.counter))
+            started['long'] = sim.Timer('long', clock, 3)
+            # their turns in this tick are still to come
+            seen.append(started['long'].elapsed)
+
+        sim.Timer('starter', clock, 2, start)
+        run(clock, 2)
+        # the one-tick timer went off in the tick it was started in
+        self.assertEqual(seen, [0, 2])
+        self.assertTrue(started['short'].finished)
+        self.assertEqual(started['long'].elapsed, 1)
+        run(clock, 2)
+        self.assertTrue(started['long'].finished)
+        self.assertEqual(clock.counter, 4)
+
+    def test_unpaused_before_turn_gets_this_tick(self):
+        clock = sim.Clock('test', 1)
+        sim.Timer('unpauser', clock, 2, lambda: paused.unpause())
+        paused = sim.Timer('paused', clock, 3)
+        paused.pause()
+        run(clock, 2)
+        self.assertEqual(paused.elapsed, 1)
+        run(clock, 2)
+        self.assertTrue(paused.finished)
+        self.assertEqual(clock.counter, 4)
+
+    def test_unpaused_after_turn_misses_this_tick(self):
+        clock = sim.Clock('test', 1)
+        paused = sim.Timer('paused', clock, 3)
+        paused.pause()
+        sim.Timer('unpauser', clock, 2, lambda: paused.unpause())
+        run(clock, 2)
+        self.assertEqual(paused.elapsed, 0)
+        run(clock, 2)
+        self.assertFalse(paused.finished)
+        run(clock, 1)
+        self.assertTrue(paused.finished)
+
+    def test_cancelled_while_paused_stays_cancelled(self):
+        clock = sim.Clock('test', 1)
+        fired = []
+        timer = sim.Timer('timer', clock, 2, lambda: fired.append(True))
+        timer.pause()
+        timer.cancel()
+        timer.unpause()
+        run(clock, 5)
+        self.assertEqual(fired, [])
+
+
+    def test_reset_while_running_is_filed_once(self):
+        clock = sim.Clock('test', 1)
+        fired = []
+        timer = sim.Timer('timer', clock, 5, lambda: fired.append(clock.counter))
+        run(clock, 2)
+        timer.reset()
+        self.assertEqual(len(clock.timers), 1)
+        run(clock, 10)
+        self.assertEqual(fired, [7])
+        self.assertEqual(len(clock.wheel), 0)
+
+
+class RerouteTest(unittest.TestCase):
+
+    def test_reroute_on_due_tick_live(self):
+        level = sim.load_level('level1')
+        game = sim.world.game
+        game.typematic = False
+        for k in REROUTE_KEYS:
+            game.on_key_press(k, 0)
+            game.on_key_release(k, 0)
+        for _ in range(REROUTE_TICKS):
+            game.timer(sim.logic_interval)
+        self.assertFalse(level.player.dead)
+
+    def test_reroute_on_due_tick_replayed(self):
+        events = []
+        for k in REROUTE_KEYS:
+            events += [(0, KEY_PRESS, k), (0, KEY_RELEASE, k)]
+        events.append((REROUTE_TICKS, END, 0))
+        player = ReplayPlayer(Recording('level1', events))
+        self.assertEqual(player.play(), REROUTE_TICKS)
+        self.assertFalse(player.level.player.dead)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""drawstats counts what a frame draws, on the stub GL.
+
+    % python3 -m unittest discover tests
+"""
+
+import os.path
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from dynamite import drawstats
+
+
+def setUpModule():
+    drawstats.use_stub_gl()
+    drawstats.install()
+
+
+def draw_frame(batch):
+    """Draw batch as the 'test' section of a frame, and return its counts."""
+    drawstats.begin_frame()
+    drawstats.section('test')
+    batch.draw()
+    drawstats.begin_frame()
+    return drawstats.last_frame['test']
+
+
+class DrawStatsTest(unittest.TestCase):
+
+    def setUp(self):
+        import pyglet
+        self.pyglet = pyglet
+        self.batch = pyglet.graphics.Batch()
+        self.texture = pyglet.image.Texture.create(16, 16)
+
+    def sprites(self, texture, n):
+        # (hang on to them: a sprite deletes its vertices when it goes)
+        Sprite = self.pyglet.sprite.Sprite
+        return [Sprite(texture, x=i * 16, batch=self.batch) for i in range(n)]
+
+    def test_one_texture_draws_once(self):
+        sprites = self.sprites(self.texture, 3)
+        counts = draw_frame(self.batch)
+        self.assertEqual(counts.batches, 1)
+        self.assertEqual(counts.state_changes, 1)
+        self.assertEqual(counts.texture_binds, 1)
+        self.assertEqual(counts.draw_calls, 1)
+        # a quad per sprite
+        self.assertEqual(counts.vertices, 4 * len(sprites))
+
+    def test_each_texture_binds_and_draws(self):
+        sprites = self.sprites(self.texture, 3)
+        sprites += self.sprites(self.pyglet.image.Texture.create(8, 8), 1)
+        counts = draw_frame(self.batch)
+        self.assertEqual(counts.batches, 1)
+        self.assertEqual(counts.state_changes, 2)
+        self.assertEqual(counts.texture_binds, 2)
+        self.assertEqual(counts.draw_calls, 2)
+        self.assertEqual(counts.vertices, 16)
+
+    def test_counts_are_per_frame_and_section(self):
+        sprites = self.sprites(self.texture, 2)
+        draw_frame(self.batch)
+        counts = draw_frame(self.batch)
+        self.assertEqual((counts.batches, counts.draw_calls, counts.vertices), (1, 1, 8))
+        # nothing was drawn outside the section
+        other = drawstats.last_frame['other']
+        self.assertEqual((other.batches, other.draw_calls), (0, 0))
+        self.assertIn('test', drawstats.format_frame())
+
+    def test_stubbing_again_keeps_counting(self):
+        sprites = self.sprites(self.texture, 1)
+        drawstats.use_stub_gl()
+        counts = draw_frame(self.batch)
+        self.assertEqual((counts.draw_calls, counts.vertices), (1, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""The profiler's frame times and costs, and its overlay, on the stub GL.
+
+    % python3 -m unittest discover tests
+"""
+
+import os.path
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from dynamite import drawstats
+
+
+def setUpModule():
+    global profiler
+    drawstats.use_stub_gl()
+    drawstats.install()
+    from dynamite import profiler
+
+
+class FakeTime:
+    """Stands in for the time module: the time only moves when we say."""
+    def __init__(self):
+        self.now = 100.0
+
+    def perf_counter(self):
+        return self.now
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.time = FakeTime()
+        patcher = mock.patch.object(profiler, 'time', self.time)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(profiler.enable, False)
+
+    def frame(self, flow, scene, logic=0.0):
+        """Spend flow and scene seconds drawing a frame, and logic after it."""
+        profiler.begin_frame()
+        profiler.section('flow')
+        self.time.now += flow
+        profiler.section('scene')
+        self.time.now += scene
+        profiler.end_frame()
+        profiler.add('logic', logic)
+        self.time.now += logic
+
+    def test_disabled_records_nothing(self):
+        profiler.enable(False)
+        for _ in range(5):
+            self.frame(0.002, 0.005, logic=0.001)
+            with profiler.timing('flow update'):
+                self.time.now += 0.001
+        self.assertEqual(profiler.frames, 0)
+        self.assertEqual(profiler.costs, {})
+        self.assertFalse(profiler.frame_times.any())
+
+    def test_slow_frame_shows_up(self):
+        profiler.enable()
+        for _ in range(50):
+            self.frame(0.002, 0.005, logic=0.001)
+        self.frame(0.002, 0.030, logic=0.001)
+        # (the next frame ends the slow one)
+        self.frame(0.002, 0.005)
+        self.assertEqual(profiler.frames, 51)
+        text = profiler.Overlay(0, 0).text({})
+        self.assertIn('p50 8.0', text)
+        self.assertIn('max 33.0', text)
+        p99 = float(text.split('p99 ')[1].split()[0])
+        self.assertGreater(p99, 20)
+        scene = next(line for line in text.splitlines() if line.startswith('scene'))
+        mean, worst = map(float, scene.split()[1:])
+        self.assertEqual(worst, 30.0)
+        self.assertLess(mean, 6.0)
+
+    def test_overlay_draws_in_one_batch(self):
+        profiler.enable()
+        for _ in range(10):
+            self.frame(0.002, 0.005)
+        overlay = profiler.Overlay(0, 0)
+        overlay.update({'actors': 25})
+        drawstats.begin_frame()
+        drawstats.section('overlay')
+        overlay.draw()
+        drawstats.begin_frame()
+        counts = drawstats.last_frame['overlay']
+        self.assertEqual(counts.batches, 1)
+        # background, bars, lines and text
+        self.assertEqual(counts.draw_calls, 4)
+        overlay.delete()
+
+
+if __name__ == '__main__':
+    unittest.main()
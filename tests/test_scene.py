@@ -0,0 +1,71 @@
+"""Scene particles sort among the actors, on the stub GL.
+
+    % python3 -m unittest discover tests
+"""
+
+import os.path
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from dynamite import drawstats
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+
+def setUpModule():
+    global pyglet, scene, sim, Vec2D
+    drawstats.use_stub_gl()
+    drawstats.use_stub_images()
+    import pyglet.resource
+    pyglet.resource.path = [os.path.join(SRC_DIR, 'images')]
+    pyglet.resource.reindex()
+    from dynamite import scene
+    from dynamite import sim
+    from dynamite.vec2d import Vec2D
+
+
+class ParticleDepthTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scene = scene.Scene()
+        sim.load_level('level5', scene=self.scene)
+        self.particles = self.scene.particles
+        self.addCleanup(self.particles.delete)
+
+    def keys(self):
+        """(kind, depth key) for every particle."""
+        p = self.particles
+        return {
+            (int(kind), scene.depth_key(Vec2D(*position), z))
+            for kind, position, z in zip(p.kind, p.position, p.z)
+        }
+
+    def test_particles_draw_at_their_depth(self):
+        self.scene.spawn_particles(20, 'leaf1', Vec2D(5, 4), (5, 20), 2, (50, 100), 90)
+        self.scene.spawn_particles(5, 'twig', Vec2D(8, 7.5), (5, 20), 2, (50, 100), 90)
+        for _ in range(10):
+            self.particles.update(1 / 60)
+            self.assertEqual(set(self.particles.vertex_lists), self.keys())
+        depth = self.scene.depth
+        for kind, key in self.particles.vertex_lists:
+            group = self.particles.groups[kind, key]
+            # after the actors at the same depth, before the ones further down
+            self.assertIs(group.parent, depth.particles(key))
+            self.assertIs(group.parent.parent, depth.group(key))
+
+    def test_vertex_lists_go_with_the_particles(self):
+        self.scene.spawn_particles(10, 'leaf2', Vec2D(3, 3), (5, 10), 1, (10, 20), 90)
+        self.particles.update(1 / 60)
+        self.assertTrue(self.particles.vertex_lists)
+        for _ in range(600):
+            self.particles.update(1 / 60)
+            if not len(self.particles):
+                break
+        self.assertEqual(len(self.particles), 0)
+        self.assertEqual(self.particles.vertex_lists, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
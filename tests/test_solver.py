@@ -0,0 +1,60 @@
+"""The brute-force solver, on the first tutorial.
+
+    % python3 -m unittest discover tests
+"""
+
+import os.path
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from dynamite.sim import keys as key
+from dynamite.sim import world
+from dynamite.sim.level import load_level
+from dynamite.sim.solver import Snapshots, signature, solve, take_step
+
+
+class SolverTest(unittest.TestCase):
+
+    def test_tutorial1(self):
+        solution = solve('tutorial1')
+        self.assertTrue(solution.solved)
+        self.assertEqual(solution.moves, 4)
+        self.assertEqual(solution.describe(), 'move right, take down, drop right, move up, wait x2')
+
+        # and playing it back wins
+        load_level('tutorial1')
+        world.game.typematic = False
+        for step in solution.steps:
+            take_step(world.game, world.level, step)
+        self.assertTrue(world.level.level_finished)
+        self.assertFalse(world.level.player.dead)
+        self.assertEqual(world.game.logics.counter, solution.ticks)
+
+    def test_gives_up(self):
+        solution = solve('tutorial1', max_states=10)
+        self.assertFalse(solution.solved)
+        self.assertEqual(repr(solution), '<Solution tutorial1 unsolved>')
+
+    def test_fuse_is_one_wait(self):
+        # a bomb dropped in the water burns down in one wait,
+        # and the signature doesn't care how long it had left
+        level = load_level('tutorial1')
+        world.game.typematic = False
+        for step in [('move', key.RIGHT), ('take', key.DOWN), ('drop', key.RIGHT)]:
+            take_step(world.game, world.level, step)
+        dropped = signature(world.game, world.level)
+        data = Snapshots(level).save()
+        world.game.step(60)
+        self.assertEqual(signature(world.game, world.level), dropped)
+
+        Snapshots(level).restore(data)
+        counter = world.game.logics.counter
+        self.assertTrue(take_step(world.game, world.level, ('wait', None)))
+        self.assertNotEqual(signature(world.game, world.level), dropped)
+        self.assertGreater(world.game.logics.counter - counter, 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+"""The level validator, on a broken level of our own.
+
+    % python3 -m unittest discover tests
+"""
+
+import os.path
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from dynamite import sim
+from dynamite.sim.validate import validate_level
+
+
+class ValidateTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = Path(tmp.name)
+        shutil.copy(sim.LEVEL_DIR / 'legend.txt', self.directory)
+        shutil.copy(sim.LEVEL_DIR / 'tutorial1.txt', self.directory)
+
+    def test_shipped_level_passes(self):
+        self.assertEqual(validate_level('tutorial1', seconds=2, directory=self.directory), [])
+
+    def test_two_players(self):
+        text = (self.directory / 'tutorial1.txt').read_text()
+        text = text.replace('..#####.....\n..##S##D', '..##S##.....\n..##S##D', 1)
+        (self.directory / 'two_players.txt').write_text(text)
+        problems = validate_level('two_players', seconds=2, directory=self.directory)
+        self.assertEqual(len(problems), 1)
+        self.assertTrue(problems[0].startswith("couldn't load: ValueError: Player set twice!"), problems)
+
+
+if __name__ == '__main__':
+    unittest.main()